@@ -0,0 +1,140 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+from .config import *
+
+class AnswerCache:
+    """In-process LRU/TTL cache of answers per (scope, filename, normalized question).
+    
+    scope is the username (or a shared-document scope). With an embeddings
+    model and a similarity threshold, near-duplicate phrasings of a cached
+    question for the same file are also served from the cache. Entries are
+    invalidated explicitly when their file is re-uploaded or deleted; the TTL
+    bounds staleness for changes made by other processes.
+    """
+    
+    def __init__(self, embeddings=None, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold: Optional[float] = ANSWER_CACHE_SIMILARITY_THRESHOLD):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._keys_by_file = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation"""
+        question = re.sub(r"\s+", " ", question.strip().lower())
+        return question.rstrip(" ?!.")
+    
+    def _embed(self, question: str):
+        """Embed a question as a unit vector, or None when similarity matching is off"""
+        if self.embeddings is None or self.similarity_threshold is None:
+            return None
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+    
+    def _remove(self, key):
+        """Drop one entry and its file index reference (lock must be held)"""
+        self._entries.pop(key, None)
+        keys = self._keys_by_file.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_file[key[:2]]
+    
+    def _is_expired(self, entry) -> bool:
+        return time.time() - entry['created_at'] > self.ttl_seconds
+    
+    def get(self, scope: str, filename: str, question: str) -> Optional[dict]:
+        """Get a cached {'answer', 'source_documents'} for the question, if any"""
+        key = (scope, filename, self.normalize_question(question))
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            candidates = [
+                (candidate, self._entries[candidate]['vector'])
+                for candidate in self._keys_by_file.get(key[:2], ())
+                if self._entries[candidate]['vector'] is not None
+            ]
+        
+        if candidates:
+            vector = self._embed(question)
+            if vector is not None:
+                # Compare against every cached phrasing for this file in one product
+                scores = np.stack([candidate_vector for _, candidate_vector in candidates]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    with self._lock:
+                        match_key = candidates[best][0]
+                        entry = self._entries.get(match_key)
+                        if entry is not None and not self._is_expired(entry):
+                            self._entries.move_to_end(match_key)
+                            self.hits += 1
+                            return entry
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, scope: str, filename: str, question: str, answer: str, source_documents: List):
+        """Cache an answer and evict the least recently used overflow"""
+        key = (scope, filename, self.normalize_question(question))
+        entry = {
+            'answer': answer,
+            'source_documents': source_documents,
+            'vector': self._embed(question),
+            'created_at': time.time()
+        }
+        
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._keys_by_file.setdefault(key[:2], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+    
+    def invalidate(self, scope: Optional[str] = None, filename: Optional[str] = None) -> int:
+        """Drop cached answers for a file, a whole scope, or everything"""
+        with self._lock:
+            if scope is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._keys_by_file.clear()
+                return removed
+            
+            keys = [
+                key for file_key, file_keys in self._keys_by_file.items()
+                if file_key[0] == scope and (filename is None or file_key[1] == filename)
+                for key in file_keys
+            ]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+    
+    def get_stats(self) -> dict:
+        """Get hit/miss counters and the number of cached answers"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries
+        }
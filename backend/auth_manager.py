@@ -1,23 +1,38 @@
 import sqlite3
 import hashlib
+import hmac
 import os
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from typing import Optional, Tuple
+from .config import *
+from .db import ConnectionPool, WriteBehindQueue
+from .metrics import timed
 
 class AuthManager:
-    def __init__(self, db_path: str = "users.db"):
+    def __init__(self, db_path: str = "users.db", scrypt_n: int = PASSWORD_SCRYPT_N,
+                 scrypt_r: int = PASSWORD_SCRYPT_R, scrypt_p: int = PASSWORD_SCRYPT_P,
+                 hash_workers: int = PASSWORD_HASH_WORKERS):
         self.db_path = db_path
+        self.scrypt_params = (scrypt_n, scrypt_r, scrypt_p)
+        # scrypt releases the GIL but holds 128 * n * r bytes while it runs, so
+        # a burst of logins queues here instead of exhausting CPU and memory
+        self._hash_pool = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="password-hash")
+        self._dummy_hash = self.hash_password(os.urandom(16).hex())
+        self.pool = ConnectionPool(db_path)
         self.init_database()
+        # last_login is informational, so logins don't wait on a write lock for it
+        self.last_login_writer = WriteBehindQueue(
+            self.pool, "UPDATE users SET last_login = ? WHERE id = ?"
+        )
         self.create_admin_user()
     
     def init_database(self):
         """Initialize the SQLite database with users table"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create users table with admin field
-            cursor.execute('''
+            # Create users table with admin field (the UNIQUE constraints index
+            # both username and email, which login looks users up by)
+            self.pool.execute('''
                 CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     username TEXT UNIQUE NOT NULL,
@@ -28,9 +43,6 @@ class AuthManager:
                     last_login TIMESTAMP
                 )
             ''')
-            
-            conn.commit()
-            conn.close()
         except Exception as e:
             raise Exception(f"Database initialization failed: {str(e)}")
     
@@ -53,9 +65,39 @@ class AuthManager:
             print(f"Error creating admin user: {str(e)}")
     
     def hash_password(self, password: str) -> str:
-        """Hash password using SHA-256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash a password with salted scrypt, encoded as scrypt$n$r$p$salt$hash"""
+        n, r, p = self.scrypt_params
+        salt = os.urandom(PASSWORD_SALT_BYTES)
+        digest = self._scrypt(password, salt, n, r, p)
+        return f"scrypt${n}${r}${p}${salt.hex()}${digest.hex()}"
+    
+    @staticmethod
+    def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(
+            password.encode(), salt=salt, n=n, r=r, p=p,
+            maxmem=2 * 128 * n * r * p + 1024 * 1024, dklen=PASSWORD_HASH_BYTES
+        )
     
+    def verify_password(self, password: str, stored_hash: str) -> Tuple[bool, bool]:
+        """Check a password against a stored hash.
+        
+        Returns (matches, needs_rehash). Legacy unsalted SHA-256 hashes and
+        scrypt hashes with other cost parameters need rehashing.
+        """
+        if not stored_hash.startswith("scrypt$"):
+            legacy_hash = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy_hash, stored_hash), True
+        
+        _, n, r, p, salt, digest = stored_hash.split("$")
+        n, r, p = int(n), int(r), int(p)
+        matches = hmac.compare_digest(self._scrypt(password, bytes.fromhex(salt), n, r, p), bytes.fromhex(digest))
+        return matches, (n, r, p) != self.scrypt_params
+    
+    def _run_hashing(self, func, *args):
+        """Run a hashing call on the bounded pool and wait for it"""
+        return self._hash_pool.submit(func, *args).result()
+    
+    @timed("auth.register")
     def register_user(self, username: str, email: str, password: str, is_admin: bool = False) -> Tuple[bool, str]:
         """Register a new user"""
         try:
@@ -74,52 +116,55 @@ class AuthManager:
                 return False, "Username or email already exists"
             
             # Hash password and store user
-            password_hash = self.hash_password(password)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            password_hash = self._run_hashing(self.hash_password, password)
             
-            cursor.execute('''
+            self.pool.execute('''
                 INSERT INTO users (username, email, password_hash, is_admin)
                 VALUES (?, ?, ?, ?)
             ''', (username, email, password_hash, is_admin))
             
-            conn.commit()
-            conn.close()
-            
             return True, "User registered successfully"
             
+        except sqlite3.IntegrityError:
+            # Another session registered the same name between the check and the insert
+            return False, "Username or email already exists"
         except Exception as e:
             return False, f"Registration failed: {str(e)}"
     
+    @timed("auth.login")
     def login_user(self, username: str, password: str) -> Tuple[bool, str, Optional[dict]]:
         """Login a user"""
         try:
             if not username or not password:
                 return False, "Username and password are required", None
             
-            password_hash = self.hash_password(password)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT id, username, email, is_admin, created_at
+            candidates = self.pool.fetchall('''
+                SELECT id, username, email, is_admin, created_at, password_hash
                 FROM users 
-                WHERE (username = ? OR email = ?) AND password_hash = ?
-            ''', (username, username, password_hash))
+                WHERE username = ? OR email = ?
+            ''', (username, username))
             
-            user = cursor.fetchone()
+            user = None
+            if not candidates:
+                # Spend the same time as a real check so unknown usernames can't be probed
+                self._run_hashing(self.verify_password, password, self._dummy_hash)
+            for candidate in candidates:
+                matches, needs_rehash = self._run_hashing(self.verify_password, password, candidate[5])
+                if matches:
+                    user = candidate
+                    break
             
             if user:
-                # Update last login
-                cursor.execute('''
-                    UPDATE users SET last_login = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (user[0],))
+                if needs_rehash:
+                    # Upgrade legacy SHA-256 and outdated scrypt hashes while the password is at hand
+                    self.pool.execute(
+                        'UPDATE users SET password_hash = ? WHERE id = ?',
+                        (self._run_hashing(self.hash_password, password), user[0])
+                    )
                 
-                conn.commit()
-                conn.close()
+                # Update last login in the background, in the CURRENT_TIMESTAMP format
+                now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                self.last_login_writer.put(user[0], (now, user[0]))
                 
                 user_data = {
                     'id': user[0],
@@ -131,45 +176,35 @@ class AuthManager:
                 
                 return True, "Login successful", user_data
             else:
-                conn.close()
                 return False, "Invalid username or password", None
                 
         except Exception as e:
             return False, f"Login failed: {str(e)}", None
     
+    @timed("auth.user_exists")
     def user_exists(self, username: str, email: str) -> bool:
         """Check if user already exists"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            count = self.pool.fetchone('''
                 SELECT COUNT(*) FROM users 
                 WHERE username = ? OR email = ?
-            ''', (username, email))
-            
-            count = cursor.fetchone()[0]
-            conn.close()
+            ''', (username, email))[0]
             
             return count > 0
             
         except Exception:
             return False
     
+    @timed("auth.get_user")
     def get_user_by_id(self, user_id: int) -> Optional[dict]:
         """Get user data by ID"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            self.last_login_writer.flush()
+            user = self.pool.fetchone('''
                 SELECT id, username, email, is_admin, created_at, last_login
                 FROM users WHERE id = ?
             ''', (user_id,))
             
-            user = cursor.fetchone()
-            conn.close()
-            
             if user:
                 return {
                     'id': user[0],
@@ -184,19 +219,16 @@ class AuthManager:
         except Exception:
             return None
     
-    def get_all_users(self) -> list:
-        """Get all users (admin only)"""
+    @timed("auth.get_all_users")
+    def get_all_users(self, limit: Optional[int] = None, offset: int = 0) -> list:
+        """Get users newest first, one page at a time when a limit is given (admin only)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            self.last_login_writer.flush()
+            # IDs increase with creation time, and ordering by the rowid needs no sort
+            users = self.pool.fetchall('''
                 SELECT id, username, email, is_admin, created_at, last_login
-                FROM users ORDER BY created_at DESC
-            ''')
-            
-            users = cursor.fetchall()
-            conn.close()
+                FROM users ORDER BY id DESC LIMIT ? OFFSET ?
+            ''', (-1 if limit is None else limit, offset))
             
             return [
                 {
@@ -213,20 +245,24 @@ class AuthManager:
         except Exception:
             return []
     
+    @timed("auth.count_users")
+    def get_user_counts(self) -> dict:
+        """Get the number of users and of admins"""
+        try:
+            total, admins = self.pool.fetchone('SELECT COUNT(*), SUM(is_admin) FROM users')
+            return {'total': total, 'admins': admins or 0}
+        except Exception:
+            return {'total': 0, 'admins': 0}
+    
+    @timed("auth.delete_user")
     def delete_user(self, user_id: int) -> Tuple[bool, str]:
         """Delete a user (admin only)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+            cursor = self.pool.execute('DELETE FROM users WHERE id = ?', (user_id,))
             
             if cursor.rowcount > 0:
-                conn.commit()
-                conn.close()
                 return True, "User deleted successfully"
             else:
-                conn.close()
                 return False, "User not found"
                 
         except Exception as e:
@@ -0,0 +1,113 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Optional, Set
+from .config import *
+from .db import ConnectionPool
+from .metrics import get_metrics
+
+class BulkWriter:
+    """Idempotent bulk upserts of precomputed vectors into a vector backend.
+    
+    Records carry deterministic IDs, so writing a batch twice is harmless.
+    Records are split into batches of batch_size, written by a pool of
+    parallel writers, and each batch is retried with exponential backoff and
+    jitter. When a checkpoint key is given, the IDs of every batch that
+    reached the index are recorded in SQLite, so an ingest that failed or was
+    killed can skip them when it runs again.
+    """
+    
+    def __init__(self, backend, checkpoint_db: str = BULK_CHECKPOINT_DB_PATH,
+                 batch_size: int = UPSERT_BATCH_SIZE, writers: int = UPSERT_CONCURRENCY,
+                 max_retries: int = UPSERT_MAX_RETRIES, backoff_seconds: float = UPSERT_BACKOFF_SECONDS):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.pool = ConnectionPool(checkpoint_db)
+        self.executor = ThreadPoolExecutor(max_workers=writers, thread_name_prefix="bulk-writer")
+        self.init_database()
+    
+    def init_database(self):
+        """Initialize the SQLite database with checkpoints table"""
+        try:
+            self.pool.execute('''
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    checkpoint_key TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    PRIMARY KEY (checkpoint_key, chunk_id)
+                ) WITHOUT ROWID
+            ''')
+        except Exception as e:
+            raise Exception(f"Bulk writer initialization failed: {str(e)}")
+    
+    def get_checkpoint(self, checkpoint_key: str) -> Set[str]:
+        """Get the IDs already written under a checkpoint key"""
+        rows = self.pool.fetchall(
+            'SELECT chunk_id FROM checkpoints WHERE checkpoint_key = ?', (checkpoint_key,)
+        )
+        return {row[0] for row in rows}
+    
+    def clear_checkpoint(self, checkpoint_key: str):
+        """Forget a checkpoint once its ingest has been recorded as complete"""
+        self.pool.execute('DELETE FROM checkpoints WHERE checkpoint_key = ?', (checkpoint_key,))
+    
+    def pop_checkpoints(self, key_prefix: str = "") -> Set[str]:
+        """Forget every checkpoint whose key starts with key_prefix and return their IDs"""
+        # Range bounds instead of LIKE, so the prefix needs no escaping
+        bounds = (key_prefix, key_prefix + "\U0010ffff")
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                'SELECT chunk_id FROM checkpoints WHERE checkpoint_key >= ? AND checkpoint_key < ?', bounds
+            ).fetchall()
+            conn.execute('DELETE FROM checkpoints WHERE checkpoint_key >= ? AND checkpoint_key < ?', bounds)
+        return {row[0] for row in rows}
+    
+    def _write_batch(self, records: List[dict], checkpoint_key: Optional[str],
+                     namespace: Optional[str] = None) -> List[str]:
+        """Upsert one batch, retrying transient failures, then checkpoint it"""
+        metrics = get_metrics()
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.span("vector_store.upsert_batch"):
+                    self.backend.upsert(records, namespace=namespace)
+                break
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                metrics.increment("upsert_retries")
+                # Full jitter keeps parallel writers from retrying in lockstep
+                time.sleep(random.uniform(0, self.backoff_seconds * 2 ** attempt))
+        
+        ids = [record["id"] for record in records]
+        if checkpoint_key is not None:
+            self.pool.executemany(
+                'INSERT OR IGNORE INTO checkpoints (checkpoint_key, chunk_id) VALUES (?, ?)',
+                [(checkpoint_key, chunk_id) for chunk_id in ids]
+            )
+        metrics.increment("vectors_upserted", len(ids))
+        return ids
+    
+    def _write_batches(self, records: List[dict], checkpoint_key: Optional[str],
+                       namespace: Optional[str] = None) -> List[str]:
+        ids = []
+        for i in range(0, len(records), self.batch_size):
+            ids.extend(self._write_batch(records[i:i + self.batch_size], checkpoint_key, namespace))
+        return ids
+    
+    def submit(self, records: List[dict], checkpoint_key: Optional[str] = None,
+               namespace: Optional[str] = None) -> Future:
+        """Queue records on one writer and return a future of their IDs"""
+        return self.executor.submit(self._write_batches, records, checkpoint_key, namespace)
+    
+    def upsert(self, records: List[dict], checkpoint_key: Optional[str] = None,
+               namespace: Optional[str] = None) -> List[str]:
+        """Write records with every batch spread across the writers, and wait for all of them"""
+        futures = [
+            self.executor.submit(self._write_batch, records[i:i + self.batch_size], checkpoint_key, namespace)
+            for i in range(0, len(records), self.batch_size)
+        ]
+        ids = []
+        for future in futures:
+            ids.extend(future.result())
+        return ids
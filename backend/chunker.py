@@ -0,0 +1,210 @@
+import re
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Iterable, Iterator
+from langchain_core.documents import Document
+from .config import *
+from .metrics import get_metrics
+
+# Break strengths: 3 paragraph or page, 2 end of sentence, 1 line wrap, 0 between words
+SENTENCE_ENDINGS = ".!?:"
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+WORD_PATTERN = re.compile(r"\S+")
+PAGE_SEPARATOR = "\n\n"
+
+class TokenChunker:
+    """Splits a stream of pages into token-sized chunks in a single pass.
+    
+    Pages are joined with a blank line, so chunks run across page breaks.
+    The text is read once as lines, each with a token count and the
+    strength of the break after it (paragraph or page, sentence end, line
+    wrap, word). A chunk is cut at the strongest break in its second half,
+    and the next one starts with up to overlap_tokens of the previous one.
+    Lines longer than a chunk are cut at sentences, words and fixed-size
+    pieces up front, so text without separators costs linear time. Every chunk
+    records the page and character offset where it starts and the page
+    where it ends.
+    """
+    
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                 encoding_name: str = CHUNK_TOKENIZER_ENCODING):
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoding = self._load_encoding(encoding_name)
+        self._token_counts = {}
+    
+    def _load_encoding(self, encoding_name: str):
+        """Load the tiktoken encoding, or None to fall back to a character estimate"""
+        try:
+            import tiktoken
+            return tiktoken.get_encoding(encoding_name)
+        except Exception:
+            return None
+    
+    def count_tokens(self, word: str) -> float:
+        """Token count of one word, memoized since most words repeat"""
+        count = self._token_counts.get(word)
+        if count is None:
+            if self.encoding is None:
+                count = len(word) / 4
+            else:
+                count = len(self.encoding.encode_ordinary(word))
+            if len(self._token_counts) >= CHUNK_TOKEN_CACHE_SIZE:
+                self._token_counts.clear()
+            self._token_counts[word] = count
+        return count
+    
+    def _count_many(self, texts):
+        if self.encoding is None:
+            return [len(text) / 4 for text in texts]
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+    
+    def _split_words(self, content: str, start: int, end: int, strength: int):
+        """Cut a sentence longer than a chunk into words, and words longer than a chunk into pieces"""
+        words = [(word.start(), word.end()) for word in WORD_PATTERN.finditer(content, start, end)]
+        for index, (word_start, word_end) in enumerate(words):
+            word_strength = strength if index == len(words) - 1 else 0
+            word = content[word_start:word_end]
+            word_tokens = self.count_tokens(word) if len(word) <= self.chunk_tokens else self.chunk_tokens + 1
+            if word_tokens <= self.chunk_tokens:
+                yield word_start, word_end, word_strength, word_tokens
+                continue
+            # A run without spaces is cut into pieces of half a chunk's worth of characters
+            piece_size = max(1, self.chunk_tokens // 2)
+            for piece_start in range(word_start, word_end, piece_size):
+                piece_end = min(piece_start + piece_size, word_end)
+                yield (piece_start, piece_end, word_strength if piece_end == word_end else 0,
+                       min(self.count_tokens(content[piece_start:piece_end]), self.chunk_tokens))
+    
+    def _split_long(self, content: str, start: int, end: int, strength: int):
+        """Cut a line longer than a chunk at sentence ends, then at words"""
+        sentence_starts = [start] + [match.end() for match in SENTENCE_PATTERN.finditer(content, start, end)]
+        sentence_ends = [match.start() for match in SENTENCE_PATTERN.finditer(content, start, end)] + [end]
+        counts = self._count_many([content[s:e] for s, e in zip(sentence_starts, sentence_ends)])
+        for index, (sentence_start, sentence_end, tokens) in enumerate(zip(sentence_starts, sentence_ends, counts)):
+            sentence_strength = strength if index == len(counts) - 1 else 2
+            if tokens <= self.chunk_tokens:
+                yield sentence_start, sentence_end, sentence_strength, tokens
+            else:
+                yield from self._split_words(content, sentence_start, sentence_end, sentence_strength)
+    
+    def segment(self, content: str):
+        """Split a page into lines, the units chunks are cut between.
+        
+        Returns parallel lists of line starts, ends, break strengths and
+        token counts. Lines longer than a chunk are split further, so every
+        unit fits in one chunk.
+        """
+        lines = content.split("\n")
+        positions = list(accumulate([len(line) + 1 for line in lines], initial=0))
+        stripped = [line.rstrip() for line in lines]
+        kept = [i for i, line in enumerate(stripped) if line]
+        if not kept:
+            return [], [], [], []
+        
+        run_starts = [positions[i] + len(lines[i]) - len(lines[i].lstrip()) for i in kept]
+        run_ends = [positions[i] + len(stripped[i]) for i in kept]
+        # A blank line after a line ends a paragraph, and the last line ends at the page break
+        stripped.append("")
+        strengths = [
+            3 if not stripped[i + 1] else 2 if stripped[i][-1] in SENTENCE_ENDINGS else 1
+            for i in kept
+        ]
+        
+        tokens = self._count_many([content[start:end] for start, end in zip(run_starts, run_ends)])
+        if max(tokens, default=0) <= self.chunk_tokens:
+            return run_starts, run_ends, strengths, tokens
+        
+        runs = []
+        for run in zip(run_starts, run_ends, strengths, tokens):
+            if run[3] <= self.chunk_tokens:
+                runs.append(run)
+            else:
+                runs.extend(self._split_long(content, *run[:3]))
+        return [list(column) for column in zip(*runs)]
+    
+    def iter_chunks(self, pages: Iterable[Document]) -> Iterator[Document]:
+        """Yield chunks of pages with page, start_index and end_page metadata"""
+        metrics = get_metrics()
+        # Parallel lists over the runs not yet fully emitted; offsets are
+        # into the joined text, cumulative token counts include the run
+        starts, ends, cumulative, strengths = [], [], [], []
+        page_starts, page_docs = [], []
+        text, text_offset = "", 0
+        first = 0
+        trimmed_tokens = 0.0
+        
+        def make_chunk(begin, end):
+            start, stop = starts[begin], ends[end - 1]
+            page_index = bisect_right(page_starts, start) - 1
+            end_index = bisect_right(page_starts, stop - 1) - 1
+            page_doc = page_docs[page_index]
+            metadata = dict(page_doc.metadata)
+            metadata[METADATA_START_INDEX_KEY] = start - page_starts[page_index]
+            metadata[METADATA_END_PAGE_KEY] = page_docs[end_index].metadata.get(METADATA_PAGE_KEY)
+            return Document(page_content=text[start - text_offset:stop - text_offset], metadata=metadata)
+        
+        def next_cut(begin):
+            """End of the chunk starting at run begin, or None if more runs are needed"""
+            base = cumulative[begin - 1] if begin else trimmed_tokens
+            limit = bisect_right(cumulative, base + self.chunk_tokens, begin)
+            if limit >= len(cumulative):
+                return None
+            # Every run fits in a chunk, so limit > begin; cut at the last strongest break in the second half
+            half = bisect_left(cumulative, base + self.chunk_tokens / 2, begin)
+            best = limit
+            for end in range(limit, max(half + 1, begin + 1) - 1, -1):
+                if strengths[end - 1] > strengths[best - 1]:
+                    best = end
+                    if strengths[end - 1] == 3:
+                        break
+            return best
+        
+        def next_start(begin, end):
+            """First run of the chunk after [begin, end), overlapping it by up to overlap_tokens"""
+            overlap_start = bisect_left(cumulative, cumulative[end - 1] - self.overlap_tokens, begin)
+            return min(max(overlap_start + 1, begin + 1), end)
+        
+        def emit():
+            nonlocal first
+            while True:
+                end = next_cut(first)
+                if end is None:
+                    return
+                yield make_chunk(first, end)
+                first = next_start(first, end)
+        
+        for page in pages:
+            with metrics.span("document.split"):
+                content = page.page_content
+                page_start = text_offset + len(text)
+                page_starts.append(page_start)
+                page_docs.append(page)
+                text += content + PAGE_SEPARATOR
+                total = cumulative[-1] if cumulative else trimmed_tokens
+                
+                run_starts, run_ends, run_strengths, run_tokens = self.segment(content)
+                starts.extend([page_start + start for start in run_starts])
+                ends.extend([page_start + end for end in run_ends])
+                strengths.extend(run_strengths)
+                cumulative.extend(list(accumulate(run_tokens, initial=total))[1:])
+                
+                chunks = list(emit())
+                
+                # Forget the runs, text and pages before the next chunk
+                if first > len(starts) // 2:
+                    trimmed_tokens = cumulative[first - 1]
+                    del starts[:first], ends[:first], cumulative[:first], strengths[:first]
+                    first = 0
+                keep_from = starts[first] if first < len(starts) else text_offset + len(text)
+                keep_page = max(0, bisect_right(page_starts, keep_from) - 1)
+                if keep_page:
+                    del page_starts[:keep_page], page_docs[:keep_page]
+                if keep_from - text_offset > len(text) // 2:
+                    text = text[keep_from - text_offset:]
+                    text_offset = keep_from
+            
+            yield from chunks
+        
+        if first < len(starts):
+            yield make_chunk(first, len(starts))
@@ -9,22 +9,154 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX = os.getenv("PINECONE_INDEX")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Vector store settings ("pinecone" or "local")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+EMBEDDING_DIMENSION = 1536
+# Every user's vectors live in their own namespace with this prefix
+NAMESPACE_PREFIX = "user-"
+
+# Local vector store settings
+LOCAL_VECTOR_DIR = "vector_data"
+LOCAL_IVF_MIN_VECTORS = 50000
+LOCAL_IVF_NPROBE = 8
+
 # Pinecone settings
-PINECONE_DIMENSION = 1536
+PINECONE_DIMENSION = EMBEDDING_DIMENSION
 PINECONE_METRIC = "cosine"
 PINECONE_CLOUD = "aws"
 PINECONE_REGION = "us-east-1"
 
 # Document processing settings
-CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 200
+CHUNK_TOKENS = 250
+CHUNK_OVERLAP_TOKENS = 50
+CHUNK_TOKENIZER_ENCODING = "cl100k_base"
+CHUNK_TOKEN_CACHE_SIZE = 200000
+# Rough character length of the overlap, for merging neighbouring chunks
+CHUNK_OVERLAP = CHUNK_OVERLAP_TOKENS * 4
 MAX_FILE_SIZE_MB = 200
+# "plain", or "layout" to keep the columns of tables and multi-column pages
+PDF_EXTRACTION_MODE = "plain"
+
+# Page text cache settings
+PAGE_CACHE_DB_PATH = "page_cache.db"
+PAGE_CACHE_MAX_PAGES = 100000
+
+# Ingestion pipeline settings
+PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+PARSE_PAGES_PER_TASK = 16
+EMBED_BATCH_SIZE = 64
+EMBED_CONCURRENCY = 4
+UPSERT_CONCURRENCY = 2
+
+# Bulk upsert settings (batches are retried with exponential backoff and checkpointed)
+UPSERT_BATCH_SIZE = 100
+UPSERT_MAX_RETRIES = 5
+UPSERT_BACKOFF_SECONDS = 0.5
+BULK_CHECKPOINT_DB_PATH = "bulk_checkpoints.db"
+
+# Background ingestion queue settings
+JOB_QUEUE_DB_PATH = "jobs.db"
+UPLOAD_DIR = "uploads"
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_ATTEMPTS = 3
+INGEST_RETRY_BACKOFF_SECONDS = 2
+JOB_STALE_SECONDS = 300
+JOB_PROGRESS_INTERVAL_SECONDS = 0.5
+JOB_POLL_INTERVAL_SECONDS = 2
 
 # Model settings
 TEMPERATURE = 0
+MAX_CONCURRENT_QUESTIONS = 32
+
+# Prompt context settings
+CONTEXT_TOKEN_BUDGET = 2000
+CONTEXT_TOKENIZER_ENCODING = "cl100k_base"
+MIN_MERGE_OVERLAP = 20
+MIN_TRUNCATED_TOKENS = 50
+
+# Conversation memory settings
+MEMORY_WINDOW_TURNS = 3
+MIN_SELF_CONTAINED_WORDS = 4
+
+# SQLite access settings
+DB_POOL_SIZE = 8
+DB_BUSY_TIMEOUT_SECONDS = 5
+DB_STATEMENT_CACHE_SIZE = 128
+DB_WRITE_FLUSH_INTERVAL_SECONDS = 1.0
+DB_WRITE_BATCH_SIZE = 500
+
+# Password hashing settings (scrypt; tune with benchmarks/password_hashing.py)
+PASSWORD_SCRYPT_N = 2 ** 14
+PASSWORD_SCRYPT_R = 8
+PASSWORD_SCRYPT_P = 1
+PASSWORD_SALT_BYTES = 16
+PASSWORD_HASH_BYTES = 32
+PASSWORD_HASH_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# Session settings (set SESSION_SECRET to the same value on every replica)
+SESSION_DB_PATH = "sessions.db"
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+SESSION_TIMEOUT_SECONDS = 600
+SESSION_CACHE_SIZE = 10000
+SESSION_CACHE_SECONDS = 30
+SESSION_TOUCH_INTERVAL_SECONDS = 60
+SESSION_SWEEP_INTERVAL_SECONDS = 300
+SESSION_COOKIE_NAME = "rag_session"
+# Query parameter that held the token in earlier versions; it is stripped, never trusted
+SESSION_QUERY_PARAM = "session"
 
 # File tracking settings
 METADATA_FILENAME_KEY = "filename"
 METADATA_UPLOAD_TIME_KEY = "upload_time"
 METADATA_USERNAME_KEY = "username"
 METADATA_USER_ID_KEY = "user_id"
+METADATA_CONTENT_HASH_KEY = "content_hash"
+METADATA_CHUNK_ID_KEY = "chunk_id"
+METADATA_PAGE_KEY = "page"
+METADATA_START_INDEX_KEY = "start_index"
+METADATA_END_PAGE_KEY = "end_page"
+
+# File manifest settings (SQLite database next to users.db)
+MANIFEST_DB_PATH = "manifest.db"
+DELETE_BATCH_SIZE = 1000
+
+# Embedding cache settings
+EMBEDDING_CACHE_DB_PATH = "embedding_cache.db"
+EMBEDDING_CACHE_MAX_ENTRIES = 200000
+
+# Answer cache settings (set the threshold to None to disable near-duplicate matching)
+ANSWER_CACHE_MAX_ENTRIES = 1000
+ANSWER_CACHE_TTL_SECONDS = 24 * 60 * 60
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95
+
+# Admin panel settings
+ADMIN_USERS_PAGE_SIZE = 25
+ADMIN_FILES_PAGE_SIZE = 50
+
+# Retrieval settings
+RETRIEVER_K = 4
+
+# Hybrid (BM25 + vector) retrieval settings
+HYBRID_RETRIEVAL = True
+HYBRID_CANDIDATES = 10
+RRF_K = 60
+KEYWORD_INDEX_DB_PATH = "keyword_index.db"
+
+# Reranking settings: over-fetch RERANK_CANDIDATES chunks and keep the best RERANK_K
+RERANK_ENABLED = True
+RERANK_SCORER = "lexical"  # "lexical", "vector" or "cross_encoder"
+RERANK_CANDIDATES = 20
+RERANK_K = 3
+RERANK_RETRIEVER_WEIGHT = 0.3
+RERANK_MMR_LAMBDA = 0.7  # None to rank by relevance alone
+RERANK_CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_BATCH_SIZE = 32
+# Metadata key that carries a candidate's stored vector from the vector query to the reranker
+RERANK_VECTOR_KEY = "_vector"
+
+# Metrics settings (set METRICS_PORT to serve Prometheus text at /metrics)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = "0.0.0.0"
+METRICS_PREFIX = "rag"
+METRICS_WINDOW_SIZE = 1000
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
@@ -0,0 +1,136 @@
+from typing import List, Optional
+from langchain_core.documents import Document
+from .config import *
+
+class ContextPacker:
+    """Assembles retrieved chunks into a prompt context that fits a token budget.
+    
+    Chunks of the same file on the same or neighbouring pages that overlap
+    (the chunker repeats about CHUNK_OVERLAP characters between neighbours,
+    also across page breaks) or contain one another are merged into one
+    span that covers the pages of both. Spans are then packed in relevance
+    order until the budget is used up, truncating the last one if enough
+    room is left.
+    """
+    
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, encoding_name: str = CONTEXT_TOKENIZER_ENCODING):
+        self.token_budget = token_budget
+        self.encoding = self._load_encoding(encoding_name)
+    
+    def _load_encoding(self, encoding_name: str):
+        """Load the tiktoken encoding, or None to fall back to a character estimate"""
+        try:
+            import tiktoken
+            return tiktoken.get_encoding(encoding_name)
+        except Exception:
+            return None
+    
+    def count_tokens(self, text: str) -> int:
+        if self.encoding is None:
+            return len(text) // 4 + 1
+        return len(self.encoding.encode(text, disallowed_special=()))
+    
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoding is None:
+            return text[:max_tokens * 4]
+        return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
+    
+    @staticmethod
+    def overlap_length(left: str, right: str, max_overlap: int = 2 * CHUNK_OVERLAP) -> int:
+        """Length of the longest suffix of left that is a prefix of right"""
+        for length in range(min(len(left), len(right), max_overlap), MIN_MERGE_OVERLAP - 1, -1):
+            if left.endswith(right[:length]):
+                return length
+        return 0
+    
+    def _merge(self, left: str, right: str) -> Optional[str]:
+        """Merge two chunk texts if one contains the other or they overlap"""
+        if right in left:
+            return left
+        if left in right:
+            return right
+        overlap = self.overlap_length(left, right)
+        if overlap:
+            return left + right[overlap:]
+        overlap = self.overlap_length(right, left)
+        if overlap:
+            return right + left[overlap:]
+        return None
+    
+    @staticmethod
+    def _page_range(metadata: dict):
+        page = metadata.get(METADATA_PAGE_KEY)
+        return page, metadata.get(METADATA_END_PAGE_KEY, page)
+    
+    def _near(self, left: dict, right: dict) -> bool:
+        """Whether two chunks' page ranges overlap or touch, so their texts can overlap"""
+        left_start, left_end = self._page_range(left)
+        right_start, right_end = self._page_range(right)
+        if None in (left_start, left_end, right_start, right_end):
+            return True
+        return left_start <= right_end + 1 and right_start <= left_end + 1
+    
+    def _merge_metadata(self, left: dict, right: dict) -> dict:
+        """Metadata of the earlier chunk, with the end page widened to cover both"""
+        def position(metadata):
+            return metadata.get(METADATA_PAGE_KEY) or 0, metadata.get(METADATA_START_INDEX_KEY) or 0
+        metadata = dict(min(left, right, key=position))
+        end_pages = [page for page in (self._page_range(left)[1], self._page_range(right)[1]) if page is not None]
+        if end_pages:
+            metadata[METADATA_END_PAGE_KEY] = max(end_pages)
+        return metadata
+    
+    def _merge_into(self, span: dict, text: str, metadata: dict) -> bool:
+        """Merge a chunk into a span of the same file if they are on nearby pages and overlap"""
+        if span['file'] != metadata.get(METADATA_FILENAME_KEY) or not self._near(span['metadata'], metadata):
+            return False
+        merged = self._merge(span['text'], text)
+        if merged is None:
+            return False
+        span['text'] = merged
+        span['metadata'] = self._merge_metadata(span['metadata'], metadata)
+        return True
+    
+    def merge_spans(self, documents: List[Document]) -> List[Document]:
+        """Merge overlapping chunks of the same file, keeping the best rank of each span"""
+        spans = []
+        for doc in documents:
+            if not any(self._merge_into(span, doc.page_content, doc.metadata) for span in spans):
+                spans.append({
+                    'file': doc.metadata.get(METADATA_FILENAME_KEY),
+                    'text': doc.page_content,
+                    'metadata': doc.metadata
+                })
+        
+        # A merged span can now overlap another span of the same file
+        changed = True
+        while changed:
+            changed = False
+            for i, span in enumerate(spans):
+                for other in spans[i + 1:]:
+                    if self._merge_into(span, other['text'], other['metadata']):
+                        spans.remove(other)
+                        changed = True
+                        break
+                if changed:
+                    break
+        
+        return [Document(page_content=span['text'], metadata=span['metadata']) for span in spans]
+    
+    def pack(self, documents: List[Document]) -> List[Document]:
+        """Deduplicate and merge chunks, then keep the most relevant ones within the budget"""
+        packed = []
+        remaining = self.token_budget
+        for doc in self.merge_spans(documents):
+            tokens = self.count_tokens(doc.page_content)
+            if tokens <= remaining:
+                packed.append(doc)
+                remaining -= tokens
+                continue
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                packed.append(Document(page_content=self.truncate(doc.page_content, remaining), metadata=doc.metadata))
+            break
+        return packed
+    
+    def build_context(self, documents: List[Document]) -> str:
+        return "\n\n".join(doc.page_content for doc in self.pack(documents))
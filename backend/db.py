@@ -0,0 +1,143 @@
+import atexit
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from .config import *
+
+class ConnectionPool:
+    """A fixed-size pool of WAL-mode SQLite connections shared across threads.
+    
+    Connections are reused, so each one keeps its compiled statements in
+    sqlite3's per-connection statement cache. WAL lets readers run while a
+    write is in progress, and busy_timeout waits out short write locks
+    instead of failing with "database is locked".
+    """
+    
+    def __init__(self, db_path: str, size: int = DB_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DB_BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE_SIZE
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        
+        if not create:
+            return self._idle.get()
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; the transaction is committed on success and rolled back on error"""
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+    
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        """Run one statement in its own transaction"""
+        with self.connection() as conn:
+            return conn.execute(sql, params)
+    
+    def executemany(self, sql: str, rows) -> sqlite3.Cursor:
+        """Run one statement for many parameter rows in a single transaction"""
+        with self.connection() as conn:
+            return conn.executemany(sql, rows)
+    
+    def fetchone(self, sql: str, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+    
+    def fetchall(self, sql: str, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+    
+    def close(self):
+        """Close the idle connections"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+
+class WriteBehindQueue:
+    """Coalesces non-critical writes and applies them in batches from a daemon thread.
+    
+    Each put() replaces any pending parameters for the same key, so a user
+    who logs in repeatedly between flushes costs one UPDATE.
+    """
+    
+    def __init__(self, pool: ConnectionPool, sql: str,
+                 flush_interval: float = DB_WRITE_FLUSH_INTERVAL_SECONDS,
+                 max_pending: int = DB_WRITE_BATCH_SIZE):
+        self.pool = pool
+        self.sql = sql
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sqlite-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+    
+    def put(self, key, params):
+        with self._lock:
+            self._pending[key] = params
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+    
+    def flush(self):
+        """Apply every pending write now"""
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._pending.values())
+                self._pending.clear()
+            if rows:
+                self.pool.executemany(self.sql, rows)
+    
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Deferred write failed: {e}")
@@ -1,41 +1,96 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
 from datetime import datetime
+import hashlib
+from .chunker import TokenChunker
 from .config import *
+from .metrics import get_metrics, timed
+from .pdf_extractor import PdfExtractor
 
 class DocumentProcessor:
-    def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len
-        )
+    def __init__(self, extractor=None, chunker=None):
+        self.chunker = chunker or TokenChunker()
+        self.extractor = extractor or PdfExtractor()
+    
+    @timed("document.count_pages")
+    def count_pages(self, file_path):
+        """Get the number of pages in a PDF"""
+        return self.extractor.count_pages(file_path)
+    
+    def iter_pages(self, file_path, content_hash=None):
+        """Yield pages in order as documents with PyPDFLoader-style metadata.
+        
+        With the file's content hash, pages extracted before come from the
+        page cache instead of being parsed again.
+        """
+        metrics = get_metrics()
+        for page_number, text in self.extractor.iter_pages(file_path, content_hash):
+            metrics.increment("pages_parsed")
+            yield Document(page_content=text, metadata={"source": file_path, METADATA_PAGE_KEY: page_number})
+    
+    def iter_chunks(self, file_path, filename, username, user_id, on_page=None):
+        """Yield chunks with metadata as pages are parsed"""
+        upload_time = datetime.now().isoformat()
+        content_hash = self.compute_file_hash(file_path)
+        
+        occurrences = {}
+        metrics = get_metrics()
+        
+        def pages():
+            for page in self.iter_pages(file_path, content_hash):
+                if on_page:
+                    on_page(page)
+                yield page
+        
+        # Chunks run across page breaks, so they come out as the pages stream in
+        for chunk in self.chunker.iter_chunks(pages()):
+            metrics.increment("chunks_created")
+            
+            # Add metadata to each chunk
+            text_hash = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()
+            occurrence = occurrences.get(text_hash, 0)
+            occurrences[text_hash] = occurrence + 1
+            
+            chunk.metadata[METADATA_CHUNK_ID_KEY] = self.make_chunk_id(
+                username, filename, text_hash, occurrence
+            )
+            chunk.metadata[METADATA_FILENAME_KEY] = filename
+            chunk.metadata[METADATA_UPLOAD_TIME_KEY] = upload_time
+            chunk.metadata[METADATA_USERNAME_KEY] = username
+            chunk.metadata[METADATA_USER_ID_KEY] = user_id
+            chunk.metadata[METADATA_CONTENT_HASH_KEY] = content_hash
+            yield chunk
+    
+    def make_chunk_id(self, username, filename, text_hash, occurrence=0):
+        """Build a stable chunk ID from the file identity and the chunk's content hash.
+        
+        The same text in the same file always maps to the same ID, so a
+        re-upload can be diffed against the IDs already stored. occurrence
+        tells apart identical chunks repeated within one document.
+        """
+        key = f"{username}\x00{filename}\x00{text_hash}\x00{occurrence}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
     
     def process_pdf(self, file_path, filename, username, user_id):
         """Process PDF file and return chunks with metadata"""
         try:
-            # Load PDF
-            loader = PyPDFLoader(file_path)
-            pages = loader.load()
+            chunks = list(self.iter_chunks(file_path, filename, username, user_id))
             
-            if not pages:
+            if not chunks:
                 raise ValueError("No content found in PDF")
             
-            # Split text into chunks
-            chunks = self.text_splitter.split_documents(pages)
-            
-            # Add metadata to each chunk
-            upload_time = datetime.now().isoformat()
-            for chunk in chunks:
-                chunk.metadata[METADATA_FILENAME_KEY] = filename
-                chunk.metadata[METADATA_UPLOAD_TIME_KEY] = upload_time
-                chunk.metadata[METADATA_USERNAME_KEY] = username
-                chunk.metadata[METADATA_USER_ID_KEY] = user_id
-            
             return chunks
         except Exception as e:
             raise Exception(f"Error processing PDF: {str(e)}")
     
+    @timed("document.hash")
+    def compute_file_hash(self, file_path):
+        """Compute the SHA-256 hash of a file's content"""
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+    
     def validate_file_size(self, file_size_bytes):
         """Validate file size"""
         file_size_mb = file_size_bytes / (1024 * 1024)
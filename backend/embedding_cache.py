@@ -0,0 +1,185 @@
+import sqlite3
+import hashlib
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from .config import *
+from .metrics import get_metrics
+
+class EmbeddingCache:
+    """Disk-backed embedding store keyed by (model, hash of text) with LRU eviction"""
+    
+    def __init__(self, db_path: str = EMBEDDING_CACHE_DB_PATH,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.init_database()
+    
+    def init_database(self):
+        """Initialize the SQLite database with embeddings table"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_embeddings_last_used
+                ON embeddings (last_used)
+            ''')
+            
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            raise Exception(f"Embedding cache initialization failed: {str(e)}")
+    
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Hash chunk text into a cache key"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    
+    def get_many(self, model: str, text_hashes: List[str]) -> Dict[str, List[float]]:
+        """Look up cached vectors and mark them as recently used"""
+        found = {}
+        if not text_hashes:
+            return found
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        unique_hashes = list(dict.fromkeys(text_hashes))
+        # Stay below SQLite's bound-parameter limit
+        for i in range(0, len(unique_hashes), 500):
+            batch = unique_hashes[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            cursor.execute(f'''
+                SELECT text_hash, vector FROM embeddings
+                WHERE model = ? AND text_hash IN ({placeholders})
+            ''', (model, *batch))
+            for text_hash, blob in cursor.fetchall():
+                found[text_hash] = array("f", blob).tolist()
+        
+        if found:
+            now = time.time()
+            cursor.executemany('''
+                UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?
+            ''', [(now, model, text_hash) for text_hash in found])
+            conn.commit()
+        conn.close()
+        
+        with self._lock:
+            self.hits += sum(1 for text_hash in text_hashes if text_hash in found)
+            self.misses += sum(1 for text_hash in text_hashes if text_hash not in found)
+        return found
+    
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        """Store vectors as float32 blobs and evict the least recently used overflow"""
+        if not vectors:
+            return
+        
+        now = time.time()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used)
+            VALUES (?, ?, ?, ?)
+        ''', [
+            (model, text_hash, array("f", vector).tobytes(), now)
+            for text_hash, vector in vectors.items()
+        ])
+        
+        cursor.execute('SELECT COUNT(*) FROM embeddings')
+        overflow = cursor.fetchone()[0] - self.max_entries
+        if overflow > 0:
+            cursor.execute('''
+                DELETE FROM embeddings WHERE rowid IN (
+                    SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?
+                )
+            ''', (overflow,))
+        
+        conn.commit()
+        conn.close()
+    
+    def get_stats(self) -> dict:
+        """Get hit/miss counters and the number of cached vectors"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM embeddings')
+        entries = cursor.fetchone()[0]
+        conn.close()
+        
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'max_entries': self.max_entries
+        }
+    
+    def clear(self):
+        """Remove every cached vector"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DELETE FROM embeddings')
+        conn.commit()
+        conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only calls the underlying model for unseen texts"""
+    
+    def __init__(self, embeddings: Embeddings, cache: Optional[EmbeddingCache] = None,
+                 model: Optional[str] = None):
+        self.embeddings = embeddings
+        self.cache = cache or EmbeddingCache()
+        self.model = model or getattr(embeddings, "model", type(embeddings).__name__)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed chunk texts, serving repeats from the cache"""
+        text_hashes = [self.cache.hash_text(text) for text in texts]
+        vectors = self.cache.get_many(self.model, text_hashes)
+        
+        # Embed each missing text once, even if it repeats within the batch
+        missing = {}
+        for text_hash, text in zip(text_hashes, texts):
+            if text_hash not in vectors and text_hash not in missing:
+                missing[text_hash] = text
+        
+        metrics = get_metrics()
+        metrics.increment("embedding_cache_hits", len(texts) - len(missing))
+        metrics.increment("embedding_cache_misses", len(missing))
+        if missing:
+            with metrics.span("embeddings.embed_documents"):
+                new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            self.cache.put_many(self.model, computed)
+            vectors.update(computed)
+        
+        return [vectors[text_hash] for text_hash in text_hashes]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a question, serving repeats from the cache"""
+        text_hash = self.cache.hash_text(text)
+        vector = self.cache.get_many(self.model, [text_hash]).get(text_hash)
+        
+        metrics = get_metrics()
+        metrics.increment("embedding_cache_misses" if vector is None else "embedding_cache_hits")
+        if vector is None:
+            with metrics.span("embeddings.embed_query"):
+                vector = self.embeddings.embed_query(text)
+            self.cache.put_many(self.model, {text_hash: vector})
+        
+        return vector
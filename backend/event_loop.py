@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+class EventLoopThread:
+    """One asyncio event loop in a daemon thread, shared by every Streamlit session.
+    
+    Synchronous callers submit coroutines to it, so concurrent sessions are
+    multiplexed over the same loop and the same async HTTP connection pools.
+    """
+    
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="qa-event-loop", daemon=True)
+        self.thread.start()
+    
+    def run(self, coroutine):
+        """Run a coroutine on the loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+    
+    def iterate(self, async_iterator):
+        """Consume an async generator from synchronous code"""
+        try:
+            while True:
+                try:
+                    yield self.run(async_iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            # Release the generator if the caller stops early
+            self.run(async_iterator.aclose())
+
+
+_event_loop_thread = None
+_event_loop_lock = threading.Lock()
+
+def get_event_loop_thread() -> EventLoopThread:
+    """Get the process-wide event loop thread, starting it on first use"""
+    global _event_loop_thread
+    if _event_loop_thread is None:
+        with _event_loop_lock:
+            if _event_loop_thread is None:
+                _event_loop_thread = EventLoopThread()
+    return _event_loop_thread
@@ -0,0 +1,269 @@
+import sqlite3
+import json
+from typing import List, Optional
+from .config import *
+
+class FileManifest:
+    """Local record of every uploaded file and the vector IDs of its chunks.
+    
+    Per-user totals (files, vectors, bytes) are kept in a user_stats table
+    by triggers on the files table, so they are updated in the same
+    transaction as every upload and delete and can be read without a scan.
+    """
+    
+    def __init__(self, db_path: str = MANIFEST_DB_PATH):
+        self.db_path = db_path
+        self.init_database()
+    
+    def init_database(self):
+        """Initialize the SQLite database with files table"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS files (
+                    username TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    chunk_ids TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    upload_time TEXT,
+                    content_hash TEXT,
+                    size_bytes INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (username, filename)
+                )
+            ''')
+            
+            # Manifests created before size tracking lack the column
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(files)')]
+            if 'size_bytes' not in columns:
+                cursor.execute('ALTER TABLE files ADD COLUMN size_bytes INTEGER NOT NULL DEFAULT 0')
+            
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'")
+            backfill = cursor.fetchone() is None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_stats (
+                    username TEXT PRIMARY KEY,
+                    file_count INTEGER NOT NULL DEFAULT 0,
+                    vector_count INTEGER NOT NULL DEFAULT 0,
+                    size_bytes INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            if backfill:
+                cursor.execute('''
+                    INSERT INTO user_stats (username, file_count, vector_count, size_bytes)
+                    SELECT username, COUNT(*), SUM(chunk_count), SUM(size_bytes)
+                    FROM files GROUP BY username
+                ''')
+            
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS files_stats_insert AFTER INSERT ON files BEGIN
+                    INSERT INTO user_stats (username) VALUES (NEW.username)
+                        ON CONFLICT (username) DO NOTHING;
+                    UPDATE user_stats SET
+                        file_count = file_count + 1,
+                        vector_count = vector_count + NEW.chunk_count,
+                        size_bytes = size_bytes + NEW.size_bytes
+                    WHERE username = NEW.username;
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS files_stats_update AFTER UPDATE ON files BEGIN
+                    UPDATE user_stats SET
+                        vector_count = vector_count - OLD.chunk_count + NEW.chunk_count,
+                        size_bytes = size_bytes - OLD.size_bytes + NEW.size_bytes
+                    WHERE username = NEW.username;
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS files_stats_delete AFTER DELETE ON files BEGIN
+                    UPDATE user_stats SET
+                        file_count = file_count - 1,
+                        vector_count = vector_count - OLD.chunk_count,
+                        size_bytes = size_bytes - OLD.size_bytes
+                    WHERE username = OLD.username;
+                    DELETE FROM user_stats WHERE username = OLD.username AND file_count <= 0;
+                END
+            ''')
+            
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            raise Exception(f"Manifest initialization failed: {str(e)}")
+    
+    def record_file(self, username: str, filename: str, chunk_ids: List[str],
+                    upload_time: Optional[str] = None, content_hash: Optional[str] = None,
+                    replace: bool = False, size_bytes: Optional[int] = None):
+        """Record the chunk IDs of an upload.
+        
+        By default the IDs are added to the file's existing entry; with
+        replace=True they become the file's complete chunk set. size_bytes
+        keeps its previous value when not given.
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            all_ids = []
+            if not replace:
+                cursor.execute('''
+                    SELECT chunk_ids FROM files WHERE username = ? AND filename = ?
+                ''', (username, filename))
+                row = cursor.fetchone()
+                all_ids = json.loads(row[0]) if row else []
+            
+            known = set(all_ids)
+            for chunk_id in chunk_ids:
+                if chunk_id not in known:
+                    known.add(chunk_id)
+                    all_ids.append(chunk_id)
+            
+            # An upsert rather than INSERT OR REPLACE, so the stats triggers see an UPDATE
+            cursor.execute('''
+                INSERT INTO files
+                    (username, filename, chunk_ids, chunk_count, upload_time, content_hash, size_bytes)
+                VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, 0))
+                ON CONFLICT (username, filename) DO UPDATE SET
+                    chunk_ids = excluded.chunk_ids,
+                    chunk_count = excluded.chunk_count,
+                    upload_time = excluded.upload_time,
+                    content_hash = excluded.content_hash,
+                    size_bytes = COALESCE(?, files.size_bytes)
+            ''', (username, filename, json.dumps(all_ids), len(all_ids), upload_time, content_hash,
+                  size_bytes, size_bytes))
+            
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            raise Exception(f"Error recording file in manifest: {str(e)}")
+    
+    def get_file(self, username: str, filename: str) -> Optional[dict]:
+        """Get the manifest entry of a single file"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT username, filename, chunk_ids, chunk_count, upload_time, content_hash
+            FROM files WHERE username = ? AND filename = ?
+        ''', (username, filename))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            return {
+                'username': row[0],
+                'filename': row[1],
+                'chunk_ids': json.loads(row[2]),
+                'chunk_count': row[3],
+                'upload_time': row[4],
+                'content_hash': row[5]
+            }
+        return None
+    
+    def list_files(self, username: Optional[str] = None) -> List[str]:
+        """List filenames, optionally for a single user"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        if username:
+            cursor.execute('''
+                SELECT filename FROM files WHERE username = ? ORDER BY filename
+            ''', (username,))
+        else:
+            cursor.execute('SELECT DISTINCT filename FROM files ORDER BY filename')
+        
+        files = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return files
+    
+    def has_files(self, username: Optional[str] = None) -> bool:
+        """Check if any file has been recorded, optionally for a single user"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        if username:
+            cursor.execute('SELECT 1 FROM files WHERE username = ? LIMIT 1', (username,))
+        else:
+            cursor.execute('SELECT 1 FROM files LIMIT 1')
+        
+        found = cursor.fetchone() is not None
+        conn.close()
+        return found
+    
+    def get_chunk_ids(self, username: Optional[str] = None, filename: Optional[str] = None) -> List[str]:
+        """Get the vector IDs of a user's files, or of every file when no user is given"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        if username and filename:
+            cursor.execute('''
+                SELECT chunk_ids FROM files WHERE username = ? AND filename = ?
+            ''', (username, filename))
+        elif username:
+            cursor.execute('SELECT chunk_ids FROM files WHERE username = ?', (username,))
+        else:
+            cursor.execute('SELECT chunk_ids FROM files')
+        
+        chunk_ids = []
+        for row in cursor.fetchall():
+            chunk_ids.extend(json.loads(row[0]))
+        conn.close()
+        return chunk_ids
+    
+    def get_user_stats(self) -> dict:
+        """Get the file, vector and byte totals per user from the stats table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT username, file_count, vector_count, size_bytes
+            FROM user_stats ORDER BY username
+        ''')
+        
+        stats = {
+            row[0]: {'files': row[1], 'vectors': row[2], 'bytes': row[3]}
+            for row in cursor.fetchall()
+        }
+        conn.close()
+        return stats
+    
+    def get_file_stats(self, username: str, limit: int = 50, offset: int = 0) -> List[dict]:
+        """Get one page of a user's files with their vector counts and sizes"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT filename, chunk_count, size_bytes, upload_time
+            FROM files WHERE username = ?
+            ORDER BY filename LIMIT ? OFFSET ?
+        ''', (username, limit, offset))
+        
+        files = [
+            {'filename': row[0], 'vectors': row[1], 'bytes': row[2], 'upload_time': row[3]}
+            for row in cursor.fetchall()
+        ]
+        conn.close()
+        return files
+    
+    def delete_files(self, username: str, filename: Optional[str] = None) -> int:
+        """Remove a user's files from the manifest and return how many were removed"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        if filename:
+            cursor.execute('DELETE FROM files WHERE username = ? AND filename = ?', (username, filename))
+        else:
+            cursor.execute('DELETE FROM files WHERE username = ?', (username,))
+        
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    def clear(self):
+        """Remove every file from the manifest"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DELETE FROM files')
+        conn.commit()
+        conn.close()
@@ -0,0 +1,170 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from itertools import islice
+from .config import *
+
+class IngestionPipeline:
+    """Streams a PDF through parse -> split -> embed -> upsert with bounded batches.
+    
+    Pages are parsed in a process pool and split by a generator. Embedding
+    batches run concurrently and upserts are pipelined behind them on the
+    vector store's bulk writer, so at most (EMBED_CONCURRENCY +
+    UPSERT_CONCURRENCY) batches are held in memory.
+    
+    Chunk IDs are stable, so re-uploading a filename only embeds chunks that
+    are not stored yet and deletes the ones that disappeared. Every stored
+    batch is checkpointed, so a retry after a failure or crash resumes where
+    the previous attempt stopped. The file's BM25 keyword index is built from
+    the same chunk stream.
+    """
+    
+    def __init__(self, document_processor, vector_store_manager):
+        self.document_processor = document_processor
+        self.vector_store_manager = vector_store_manager
+    
+    def run(self, file_path, filename, username, user_id, progress_callback=None):
+        """Ingest a PDF and return the final progress counters.
+        
+        progress_callback, if given, is called from the calling thread with a
+        dict of per-stage counters every time a stage advances.
+        """
+        progress = {
+            'stage': 'parsing',
+            'pages_total': self.document_processor.count_pages(file_path),
+            'pages_parsed': 0,
+            'chunks': 0,
+            'unchanged': 0,
+            'embedded': 0,
+            'upserted': 0,
+            'deleted': 0
+        }
+        
+        stage_names = {
+            'pages_parsed': 'parsing',
+            'chunks': 'splitting',
+            'unchanged': 'splitting',
+            'embedded': 'embedding',
+            'upserted': 'storing',
+            'deleted': 'cleaning up'
+        }
+        
+        def advance(stage, count):
+            progress[stage] += count
+            progress['stage'] = stage_names[stage]
+            if progress_callback:
+                progress_callback(dict(progress))
+        
+        self.vector_store_manager.ensure_index_exists()
+        manifest = self.vector_store_manager.manifest
+        previous = manifest.get_file(username, filename)
+        checkpoint_key = self.vector_store_manager.get_checkpoint_key(username, filename)
+        bulk_writer = self.vector_store_manager.bulk_writer
+        # Chunks written by an earlier attempt that did not finish are stored too
+        existing_ids = set(previous['chunk_ids']) if previous else set()
+        existing_ids |= bulk_writer.get_checkpoint(checkpoint_key)
+        
+        chunks = self.document_processor.iter_chunks(
+            file_path, filename, username, user_id,
+            on_page=lambda page: advance('pages_parsed', 1)
+        )
+        embeddings = self.vector_store_manager.embeddings
+        keyword_index = self.vector_store_manager.keyword_index
+        keywords = keyword_index.builder(username, filename)
+        current_ids = []
+        file_metadata = {}
+        stored_ids = []
+        stored_documents = []
+        completed = False
+        
+        embed_pool = ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY)
+        embedding = deque()
+        upserting = deque()
+        
+        def finish_upsert():
+            batch, future = upserting.popleft()
+            stored_ids.extend(future.result())
+            stored_documents.extend(batch)
+            advance('upserted', len(batch))
+        
+        def finish_embed():
+            batch, future = embedding.popleft()
+            vectors = future.result()
+            advance('embedded', len(batch))
+            upserting.append((batch, self.vector_store_manager.submit_embedded(
+                batch, vectors, username, checkpoint_key
+            )))
+            if len(upserting) >= UPSERT_CONCURRENCY:
+                finish_upsert()
+        
+        try:
+            while True:
+                batch = list(islice(chunks, EMBED_BATCH_SIZE))
+                if not batch:
+                    break
+                advance('chunks', len(batch))
+                file_metadata = file_metadata or batch[0].metadata
+                
+                # Only chunks whose content is new need an embedding
+                keywords.add_documents(batch)
+                new_batch = []
+                for doc in batch:
+                    chunk_id = doc.metadata[METADATA_CHUNK_ID_KEY]
+                    current_ids.append(chunk_id)
+                    if chunk_id not in existing_ids:
+                        new_batch.append(doc)
+                if len(new_batch) < len(batch):
+                    advance('unchanged', len(batch) - len(new_batch))
+                if not new_batch:
+                    continue
+                
+                embedding.append((new_batch, embed_pool.submit(
+                    embeddings.embed_documents, [doc.page_content for doc in new_batch]
+                )))
+                if len(embedding) >= EMBED_CONCURRENCY:
+                    finish_embed()
+            
+            while embedding:
+                finish_embed()
+            while upserting:
+                finish_upsert()
+            
+            if not progress['chunks']:
+                raise ValueError("No content found in PDF")
+            
+            # Remove chunks that are not part of the new version
+            current = set(current_ids)
+            vanished_ids = [chunk_id for chunk_id in existing_ids if chunk_id not in current]
+            if vanished_ids:
+                self.vector_store_manager.delete_vectors(vanished_ids, username)
+                advance('deleted', len(vanished_ids))
+            
+            manifest.record_file(
+                username,
+                filename,
+                current_ids,
+                upload_time=file_metadata.get(METADATA_UPLOAD_TIME_KEY),
+                content_hash=file_metadata.get(METADATA_CONTENT_HASH_KEY),
+                replace=True,
+                size_bytes=os.path.getsize(file_path)
+            )
+            bulk_writer.clear_checkpoint(checkpoint_key)
+            keyword_index.save(keywords)
+            self.vector_store_manager.invalidate_answers(username, filename)
+            completed = True
+            
+            return progress
+        except Exception as e:
+            raise Exception(f"Ingestion failed: {str(e)}")
+        finally:
+            embed_pool.shutdown(wait=True, cancel_futures=True)
+            if not completed:
+                keyword_index.discard(keywords)
+                for batch, future in upserting:
+                    # Writes that already started finish and are checkpointed
+                    if not future.cancel() and future.exception() is None:
+                        stored_ids.extend(future.result())
+                        stored_documents.extend(batch)
+                # Record whatever reached the index so it can still be listed and deleted
+                if stored_ids:
+                    self.vector_store_manager.record_documents(stored_ids, stored_documents)
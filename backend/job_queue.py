@@ -0,0 +1,252 @@
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from .config import *
+
+class IngestionJobQueue:
+    """SQLite-backed queue of upload ingestion jobs run by a pool of worker threads.
+    
+    Submitting copies the upload to UPLOAD_DIR and returns a job ID right
+    away, so the job survives Streamlit reruns and page navigation. The jobs
+    table records status, per-stage progress, attempts and the last error.
+    Jobs left queued or stalled by a previous process are picked up again
+    when a queue starts. Jobs for the same user and filename run one at a
+    time in submission order, since they share a manifest entry and an
+    upsert checkpoint. A failed attempt goes back to queued with a
+    not_before time and a timer resubmits it, so the backoff does not hold
+    a worker.
+    """
+    
+    def __init__(self, pipeline, db_path: str = JOB_QUEUE_DB_PATH, workers: int = INGEST_WORKERS,
+                 upload_dir: str = UPLOAD_DIR, max_attempts: int = INGEST_MAX_ATTEMPTS):
+        self.pipeline = pipeline
+        self.db_path = db_path
+        self.upload_dir = upload_dir
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        os.makedirs(upload_dir, exist_ok=True)
+        self.init_database()
+        self.recover_jobs()
+    
+    def init_database(self):
+        """Initialize the SQLite database with jobs table"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    user_id TEXT,
+                    filename TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    error TEXT,
+                    worker TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    not_before REAL
+                )
+            ''')
+            
+            # Queues created before retries were scheduled lack the column
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(jobs)')]
+            if 'not_before' not in columns:
+                cursor.execute('ALTER TABLE jobs ADD COLUMN not_before REAL')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_jobs_username ON jobs (username, created_at)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_jobs_file ON jobs (username, filename, status)
+            ''')
+            
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            raise Exception(f"Job queue initialization failed: {str(e)}")
+    
+    def submit(self, source, filename: str, username: str, user_id) -> str:
+        """Copy an uploaded file-like object into the upload directory and queue it"""
+        job_id = uuid.uuid4().hex
+        file_path = os.path.join(self.upload_dir, f"{job_id}.pdf")
+        with open(file_path, "wb") as f:
+            shutil.copyfileobj(source, f)
+        
+        now = time.time()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            INSERT INTO jobs (id, username, user_id, filename, file_path, status, stage, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, 'queued', 'queued', ?, ?)
+        ''', (job_id, username, str(user_id), filename, file_path, now, now))
+        conn.commit()
+        conn.close()
+        
+        self.executor.submit(self._run, job_id)
+        return job_id
+    
+    def recover_jobs(self):
+        """Requeue jobs that are waiting or whose worker stopped updating them"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE jobs SET status = 'queued', worker = NULL
+            WHERE status = 'running' AND updated_at < ?
+        ''', (time.time() - JOB_STALE_SECONDS,))
+        cursor.execute("SELECT id, not_before FROM jobs WHERE status = 'queued' ORDER BY created_at")
+        rows = cursor.fetchall()
+        conn.commit()
+        conn.close()
+        
+        for job_id, not_before in rows:
+            self._schedule(job_id, not_before)
+    
+    def _schedule(self, job_id: str, not_before: Optional[float] = None):
+        """Submit a job to the workers now, or from a timer once not_before has passed"""
+        delay = (not_before or 0) - time.time()
+        if delay <= 0:
+            self.executor.submit(self._run, job_id)
+            return
+        timer = threading.Timer(delay, self.executor.submit, (self._run, job_id))
+        timer.daemon = True
+        timer.start()
+    
+    def _claim(self, job_id: str) -> Optional[dict]:
+        """Atomically move a queued job to running, so only one worker gets it.
+        
+        A job is not claimed before its not_before time, or while another
+        job for the same file is running or an older one is still queued;
+        the job that finishes first dispatches it again.
+        """
+        now = time.time()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, updated_at = ?
+            WHERE id = ? AND status = 'queued' AND (not_before IS NULL OR not_before <= ?) AND NOT EXISTS (
+                SELECT 1 FROM jobs AS other
+                WHERE other.username = jobs.username AND other.filename = jobs.filename
+                  AND other.id != jobs.id
+                  AND ((other.status = 'running' AND other.updated_at >= ?)
+                       OR (other.status = 'queued' AND other.created_at < jobs.created_at))
+            )
+        ''', (self.worker_id, now, job_id, now, now - JOB_STALE_SECONDS))
+        claimed = cursor.rowcount == 1
+        conn.commit()
+        conn.close()
+        return self.get_job(job_id) if claimed else None
+    
+    def _update(self, job_id: str, **fields):
+        fields['updated_at'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+        conn.commit()
+        conn.close()
+    
+    def _run(self, job_id: str):
+        """Run one attempt of a job, and schedule a retry with backoff if it fails"""
+        job = self._claim(job_id)
+        if job is None:
+            return
+        
+        last_write = [0.0, None]
+        
+        def record_progress(progress):
+            # Throttle writes, but always record a stage change
+            now = time.time()
+            if progress['stage'] != last_write[1] or now - last_write[0] >= JOB_PROGRESS_INTERVAL_SECONDS:
+                last_write[0], last_write[1] = now, progress['stage']
+                self._update(job_id, stage=progress['stage'], progress=json.dumps(progress))
+        
+        try:
+            progress = self.pipeline.run(
+                job['file_path'],
+                job['filename'],
+                job['username'],
+                job['user_id'],
+                progress_callback=record_progress
+            )
+            self._update(job_id, status='succeeded', stage='done', progress=json.dumps(progress), error=None)
+        except Exception as e:
+            if job['attempts'] < self.max_attempts:
+                # The job keeps its turn for the file while it waits
+                not_before = time.time() + INGEST_RETRY_BACKOFF_SECONDS * 2 ** (job['attempts'] - 1)
+                self._update(job_id, status='queued', stage='retrying', error=str(e), worker=None,
+                             not_before=not_before)
+                self._schedule(job_id, not_before)
+                return
+            self._update(job_id, status='failed', stage='failed', error=str(e))
+        
+        self._remove_file(job['file_path'])
+        self._dispatch_next(job['username'], job['filename'])
+    
+    def _dispatch_next(self, username: str, filename: str):
+        """Run the oldest job still queued for a file once the one before it has finished"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id FROM jobs WHERE username = ? AND filename = ? AND status = 'queued'
+            ORDER BY created_at LIMIT 1
+        ''', (username, filename))
+        row = cursor.fetchone()
+        conn.close()
+        if row:
+            self.executor.submit(self._run, row[0])
+    
+    def _remove_file(self, file_path: str):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    
+    def _row_to_job(self, row) -> dict:
+        return {
+            'id': row[0],
+            'username': row[1],
+            'user_id': row[2],
+            'filename': row[3],
+            'file_path': row[4],
+            'status': row[5],
+            'stage': row[6],
+            'progress': json.loads(row[7]) if row[7] else {},
+            'attempts': row[8],
+            'error': row[9],
+            'created_at': row[10],
+            'updated_at': row[11]
+        }
+    
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """Get a job's current status"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, username, user_id, filename, file_path, status, stage, progress,
+                   attempts, error, created_at, updated_at
+            FROM jobs WHERE id = ?
+        ''', (job_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return self._row_to_job(row) if row else None
+    
+    def list_jobs(self, username: str, limit: int = 10) -> List[dict]:
+        """Get a user's most recent jobs, newest first"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, username, user_id, filename, file_path, status, stage, progress,
+                   attempts, error, created_at, updated_at
+            FROM jobs WHERE username = ? ORDER BY created_at DESC LIMIT ?
+        ''', (username, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        return [self._row_to_job(row) for row in rows]
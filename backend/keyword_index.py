@@ -0,0 +1,293 @@
+import json
+import re
+import time
+import zlib
+from collections import Counter
+from typing import Any, List, Optional
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from .config import *
+from .db import ConnectionPool
+from .metrics import get_metrics
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[\-\._/][a-z0-9]+)*")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens that keep part numbers and codes like E-1234 or 3.2.1 whole.
+    
+    Compound tokens also emit their parts, so "E-1234" matches "1234" too.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(re.split(r"[\-\._/]", token))
+    return tokens
+
+def reciprocal_rank_fusion(ranked_lists, k: int, rrf_k: int = RRF_K) -> List[Document]:
+    """Fuse ranked document lists by reciprocal rank and keep the best k.
+    
+    Documents are matched by ID, then chunk ID, then text, and the first
+    copy seen is kept.
+    """
+    scores = {}
+    documents = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked):
+            doc_id = doc.id or doc.metadata.get(METADATA_CHUNK_ID_KEY) or doc.page_content
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(doc_id, doc)
+    ranked_ids = sorted(scores, key=scores.get, reverse=True)
+    return [documents[doc_id] for doc_id in ranked_ids[:k]]
+
+class KeywordIndexBuilder:
+    """Writes one file's BM25 postings and chunk texts to SQLite as its chunks stream in.
+    
+    Each batch is written under a new build ID as one row per chunk and one
+    packed postings row per term, so nothing but counters stays in memory,
+    and the file's previous index keeps serving searches until
+    KeywordIndex.save makes this build the current one.
+    """
+    
+    def __init__(self, pool: ConnectionPool, username: str, filename: str):
+        self.pool = pool
+        self.username = username
+        self.filename = filename
+        self.doc_count = 0
+        self.total_length = 0
+        self.batches = 0
+        self.build_id = self.pool.execute('''
+            INSERT INTO keyword_builds (username, filename, doc_count, total_length, active, created_at)
+            VALUES (?, ?, 0, 0, 0, ?)
+        ''', (username, filename, time.time())).lastrowid
+    
+    def add_documents(self, documents: List[Document]):
+        """Index one batch of chunks in a single transaction"""
+        chunks = []
+        postings = {}
+        for document in documents:
+            terms = Counter(tokenize(document.page_content))
+            length = sum(terms.values())
+            chunk_id = document.metadata.get(METADATA_CHUNK_ID_KEY) or document.id
+            chunks.append((self.build_id, self.doc_count, chunk_id, document.page_content,
+                           json.dumps(document.metadata)))
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append((self.doc_count, frequency, length))
+            self.doc_count += 1
+            self.total_length += length
+        
+        batch = self.batches
+        self.batches += 1
+        
+        with self.pool.connection() as conn:
+            conn.executemany('''
+                INSERT INTO keyword_chunks (build_id, doc_index, chunk_id, text, metadata)
+                VALUES (?, ?, ?, ?, ?)
+            ''', chunks)
+            conn.executemany('''
+                INSERT INTO keyword_postings (build_id, term, batch, entries) VALUES (?, ?, ?, ?)
+            ''', [
+                (self.build_id, term, batch, np.asarray(entries, dtype=np.int32).tobytes())
+                for term, entries in postings.items()
+            ])
+
+class KeywordIndex:
+    """Per (username, filename) BM25 inverted indexes in SQLite.
+    
+    Postings are stored per (build, term, batch) as packed int32
+    (chunk, frequency, chunk length) triples and chunk texts per (build,
+    chunk), so a search reads only the postings of the question's terms
+    and the texts of the top matches.
+    """
+    
+    def __init__(self, db_path: str = KEYWORD_INDEX_DB_PATH, k1: float = 1.5, b: float = 0.75):
+        self.pool = ConnectionPool(db_path)
+        self.k1 = k1
+        self.b = b
+        self.init_database()
+    
+    def init_database(self):
+        """Initialize the SQLite database with builds, chunks and postings tables"""
+        try:
+            with self.pool.connection() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS keyword_builds (
+                        build_id INTEGER PRIMARY KEY,
+                        username TEXT NOT NULL,
+                        filename TEXT NOT NULL,
+                        doc_count INTEGER NOT NULL,
+                        total_length INTEGER NOT NULL,
+                        active INTEGER NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                ''')
+                conn.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_keyword_builds_file ON keyword_builds (username, filename)
+                ''')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS keyword_chunks (
+                        build_id INTEGER NOT NULL,
+                        doc_index INTEGER NOT NULL,
+                        chunk_id TEXT,
+                        text TEXT NOT NULL,
+                        metadata TEXT NOT NULL,
+                        PRIMARY KEY (build_id, doc_index)
+                    )
+                ''')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS keyword_postings (
+                        build_id INTEGER NOT NULL,
+                        term TEXT NOT NULL,
+                        batch INTEGER NOT NULL,
+                        entries BLOB NOT NULL,
+                        PRIMARY KEY (build_id, term, batch)
+                    ) WITHOUT ROWID
+                ''')
+            self._migrate_blobs()
+        except Exception as e:
+            raise Exception(f"Keyword index initialization failed: {str(e)}")
+    
+    def _migrate_blobs(self):
+        """Move indexes stored by earlier versions as one compressed blob per file into the tables"""
+        with self.pool.connection() as conn:
+            found = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'keyword_files'"
+            ).fetchone()
+            files = conn.execute('SELECT username, filename FROM keyword_files').fetchall() if found else []
+        
+        for username, filename in files:
+            row = self.pool.fetchone(
+                'SELECT data FROM keyword_files WHERE username = ? AND filename = ?', (username, filename)
+            )
+            payload = json.loads(zlib.decompress(row[0]))
+            builder = self.builder(username, filename)
+            builder.add_documents([
+                Document(id=chunk_id, page_content=text, metadata=metadata)
+                for chunk_id, text, metadata in zip(payload['ids'], payload['texts'], payload['metadata'])
+            ])
+            del payload
+            self.save(builder)
+        if found:
+            self.pool.execute('DROP TABLE keyword_files')
+    
+    def builder(self, username: str, filename: str) -> KeywordIndexBuilder:
+        """Start a new index of a file; it replaces the current one on save"""
+        return KeywordIndexBuilder(self.pool, username, filename)
+    
+    def _delete_builds(self, conn, build_ids: List[int]):
+        for build_id in build_ids:
+            conn.execute('DELETE FROM keyword_postings WHERE build_id = ?', (build_id,))
+            conn.execute('DELETE FROM keyword_chunks WHERE build_id = ?', (build_id,))
+            conn.execute('DELETE FROM keyword_builds WHERE build_id = ?', (build_id,))
+    
+    def save(self, builder: KeywordIndexBuilder):
+        """Make a finished build the file's index and drop its previous and abandoned builds"""
+        with self.pool.connection() as conn:
+            replaced = [row[0] for row in conn.execute('''
+                SELECT build_id FROM keyword_builds WHERE username = ? AND filename = ? AND build_id != ?
+            ''', (builder.username, builder.filename, builder.build_id))]
+            self._delete_builds(conn, replaced)
+            conn.execute('''
+                UPDATE keyword_builds SET doc_count = ?, total_length = ?, active = 1 WHERE build_id = ?
+            ''', (builder.doc_count, builder.total_length, builder.build_id))
+    
+    def discard(self, builder: KeywordIndexBuilder):
+        """Drop the rows of a build that will not be saved"""
+        with self.pool.connection() as conn:
+            self._delete_builds(conn, [builder.build_id])
+    
+    def add_documents(self, documents: List[Document]):
+        """Index complete files given as lists of chunks"""
+        files = {}
+        for doc in documents:
+            key = (doc.metadata[METADATA_USERNAME_KEY], doc.metadata[METADATA_FILENAME_KEY])
+            files.setdefault(key, []).append(doc)
+        for (username, filename), file_documents in files.items():
+            builder = self.builder(username, filename)
+            builder.add_documents(file_documents)
+            self.save(builder)
+    
+    def search(self, query: str, username: str, filename: Optional[str] = None,
+               top_k: int = HYBRID_CANDIDATES) -> List[Document]:
+        """Return a user's best BM25 matches, within one file when a filename is given.
+        
+        Term statistics are per file, as each file is indexed on its own.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        
+        file_condition = "AND b.filename = ?" if filename else ""
+        term_placeholders = ", ".join("?" for _ in terms)
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'''
+                SELECT p.build_id, p.term, p.entries, b.doc_count, b.total_length
+                FROM keyword_builds AS b
+                JOIN keyword_postings AS p ON p.build_id = b.build_id AND p.term IN ({term_placeholders})
+                WHERE b.username = ? AND b.active = 1 {file_condition}
+            ''', (*terms, username, *([filename] if filename else []))).fetchall()
+            if not rows:
+                return []
+            
+            # Number of chunks of each file that contain each term
+            matches = Counter()
+            for build_id, term, entries, _, _ in rows:
+                matches[(build_id, term)] += len(entries) // 12
+            
+            keys = []
+            contributions = []
+            for build_id, term, entries, doc_count, total_length in rows:
+                postings = np.frombuffer(entries, dtype=np.int32).reshape(-1, 3)
+                frequencies = postings[:, 1].astype(np.float64)
+                found = matches[(build_id, term)]
+                idf = np.log(1 + (doc_count - found + 0.5) / (found + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * postings[:, 2] * doc_count / max(total_length, 1))
+                keys.append((np.int64(build_id) << 32) | postings[:, 0])
+                contributions.append(idf * frequencies * (self.k1 + 1) / (frequencies + norm))
+            
+            chunk_keys, chunk_index = np.unique(np.concatenate(keys), return_inverse=True)
+            scores = np.bincount(chunk_index, weights=np.concatenate(contributions))
+            k = min(top_k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            
+            documents = []
+            for key in chunk_keys[top]:
+                chunk_id, text, metadata = conn.execute('''
+                    SELECT chunk_id, text, metadata FROM keyword_chunks WHERE build_id = ? AND doc_index = ?
+                ''', (int(key >> 32), int(key & 0xffffffff))).fetchone()
+                documents.append(Document(id=chunk_id, page_content=text, metadata=json.loads(metadata)))
+        return documents
+    
+    def delete(self, username: Optional[str] = None, filename: Optional[str] = None):
+        """Drop the indexes of a file, of a user, or of everyone"""
+        with self.pool.connection() as conn:
+            if username and filename:
+                rows = conn.execute(
+                    'SELECT build_id FROM keyword_builds WHERE username = ? AND filename = ?', (username, filename)
+                )
+            elif username:
+                rows = conn.execute('SELECT build_id FROM keyword_builds WHERE username = ?', (username,))
+            else:
+                rows = conn.execute('SELECT build_id FROM keyword_builds')
+            self._delete_builds(conn, [row[0] for row in rows.fetchall()])
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuses dense and BM25 results with reciprocal rank fusion"""
+    
+    dense_retriever: Any
+    keyword_index: Any
+    username: str
+    filename: Optional[str] = None
+    k: int = RETRIEVER_K
+    candidates: int = HYBRID_CANDIDATES
+    rrf_k: int = RRF_K
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense_documents = self.dense_retriever.invoke(query)
+        with get_metrics().span("retrieval.keyword"):
+            keyword_documents = self.keyword_index.search(query, self.username, self.filename, self.candidates)
+        return reciprocal_rank_fusion((dense_documents, keyword_documents), self.k, self.rrf_k)
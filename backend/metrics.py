@@ -0,0 +1,177 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from .config import *
+
+class StageHistogram:
+    """Latency samples for one stage: cumulative Prometheus buckets plus a rolling window"""
+    
+    def __init__(self, buckets=METRICS_BUCKETS, window=METRICS_WINDOW_SIZE):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+    
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+    
+    def percentiles(self) -> dict:
+        """Rolling p50/p95/p99 in milliseconds over the most recent samples"""
+        ordered = sorted(self.recent)
+        
+        def pick(fraction):
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000 if ordered else 0.0
+        
+        return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99)}
+
+class MetricsRegistry:
+    """Process-wide stage timings and counters, exported in Prometheus text format"""
+    
+    def __init__(self, prefix=METRICS_PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, StageHistogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._server = None
+    
+    def observe(self, stage: str, seconds: float):
+        """Record how long one call to a stage took"""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = StageHistogram()
+            histogram.observe(seconds)
+    
+    def increment(self, name: str, value: float = 1):
+        """Add to a counter such as tokens generated or vectors upserted"""
+        if value:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + value
+    
+    @contextmanager
+    def span(self, stage: str):
+        """Time the enclosed block as one call to the stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+    
+    def get_stage_stats(self) -> List[dict]:
+        """Per-stage call counts, mean and rolling percentiles, sorted by stage"""
+        with self._lock:
+            return [
+                {
+                    'stage': stage,
+                    'count': histogram.count,
+                    'mean_ms': histogram.sum / histogram.count * 1000,
+                    **histogram.percentiles()
+                }
+                for stage, histogram in sorted(self._histograms.items())
+            ]
+    
+    def get_counters(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+    
+    def render_prometheus(self) -> str:
+        """Render every histogram and counter in the Prometheus text exposition format"""
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each backend stage.",
+            f"# TYPE {name} histogram"
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+            
+            for counter, value in sorted(self._counters.items()):
+                counter_name = f"{self.prefix}_{counter}_total"
+                lines.append(f"# TYPE {counter_name} counter")
+                lines.append(f"{counter_name} {value}")
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path: str):
+        """Write the metrics to a file, e.g. for the node exporter's textfile collector"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(temp_path, path)
+    
+    def start_http_server(self, port: int, host: str = METRICS_HOST):
+        """Serve /metrics from a daemon thread; later calls are no-ops"""
+        with self._lock:
+            if self._server is not None:
+                return
+            registry = self
+            
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = registry.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                
+                def log_message(self, format, *args):
+                    pass
+            
+            self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics() -> MetricsRegistry:
+    """Get the process-wide metrics registry, starting the exporter on first use if configured"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                registry = MetricsRegistry()
+                if METRICS_PORT:
+                    try:
+                        registry.start_http_server(METRICS_PORT)
+                    except OSError as e:
+                        # Another process (e.g. a second Streamlit server) owns the port
+                        print(f"Metrics endpoint not started on port {METRICS_PORT}: {e}")
+                _metrics = registry
+    return _metrics
+
+def timed(stage: str):
+    """Decorator that times every call to a function or coroutine function as one stage"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_metrics().span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_metrics().span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
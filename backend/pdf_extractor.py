@@ -0,0 +1,258 @@
+import multiprocessing
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Set, Tuple
+from pypdf import PdfReader
+from .config import *
+from .metrics import get_metrics
+
+def is_image_only(page) -> bool:
+    """Check whether a page can hold no extractable text.
+    
+    Text needs a font, either in the page's resources or in a form XObject
+    it draws, so a page without either (a scan, a photo, a blank page) is
+    skipped without running the text extractor.
+    """
+    resources = page.get("/Resources")
+    if resources is None:
+        return True
+    resources = resources.get_object()
+    if resources.get("/Font"):
+        return False
+    xobjects = resources.get("/XObject")
+    if xobjects:
+        for xobject in xobjects.get_object().values():
+            if xobject.get_object().get("/Subtype") == "/Form":
+                return False
+    return True
+
+def extract_pages(reader, start, end, mode=PDF_EXTRACTION_MODE):
+    """Extract the text of pages [start, end) from an open PdfReader.
+    
+    Image-only pages come back as None.
+    """
+    texts = []
+    for i in range(start, end):
+        page = reader.pages[i]
+        if is_image_only(page):
+            texts.append(None)
+        else:
+            texts.append(page.extract_text(extraction_mode=mode) or "")
+    return texts
+
+def extract_page_range(file_path, start, end, mode=PDF_EXTRACTION_MODE):
+    """Extract the text of pages [start, end) of a PDF (runs in a worker process)"""
+    return extract_pages(PdfReader(file_path), start, end, mode)
+
+class PageTextCache:
+    """Disk-backed page text keyed by (file content hash, extraction mode, page number).
+    
+    Re-processing a file, e.g. after changing the chunking settings, reads
+    its pages from here instead of parsing the PDF again. Pages of the least
+    recently used files are evicted beyond max_pages.
+    """
+    
+    def __init__(self, db_path: str = PAGE_CACHE_DB_PATH, max_pages: int = PAGE_CACHE_MAX_PAGES):
+        self.db_path = db_path
+        self.max_pages = max_pages
+        self.init_database()
+    
+    def init_database(self):
+        """Initialize the SQLite database with pages table"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS pages (
+                    content_hash TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (content_hash, mode, page)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_pages_last_used
+                ON pages (last_used)
+            ''')
+            
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            raise Exception(f"Page cache initialization failed: {str(e)}")
+    
+    def get_page_numbers(self, content_hash: str, mode: str = PDF_EXTRACTION_MODE) -> Set[int]:
+        """Get the numbers of a file's cached pages and mark them as recently used"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT page FROM pages WHERE content_hash = ? AND mode = ?
+        ''', (content_hash, mode))
+        pages = {row[0] for row in cursor.fetchall()}
+        
+        if pages:
+            cursor.execute('''
+                UPDATE pages SET last_used = ? WHERE content_hash = ? AND mode = ?
+            ''', (time.time(), content_hash, mode))
+            conn.commit()
+        conn.close()
+        return pages
+    
+    def get_range(self, content_hash: str, start: int, end: int, mode: str = PDF_EXTRACTION_MODE) -> List[str]:
+        """Get the cached texts of pages [start, end), or fewer if some were evicted meanwhile"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT text FROM pages WHERE content_hash = ? AND mode = ? AND page >= ? AND page < ?
+            ORDER BY page
+        ''', (content_hash, mode, start, end))
+        texts = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return texts
+    
+    def put_pages(self, content_hash: str, start: int, texts: List[str], mode: str = PDF_EXTRACTION_MODE):
+        """Store consecutive page texts starting at page start and evict the overflow"""
+        if not texts:
+            return
+        
+        now = time.time()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT OR REPLACE INTO pages (content_hash, mode, page, text, last_used)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(content_hash, mode, start + offset, text, now) for offset, text in enumerate(texts)])
+        
+        cursor.execute('SELECT COUNT(*) FROM pages')
+        overflow = cursor.fetchone()[0] - self.max_pages
+        if overflow > 0:
+            cursor.execute('''
+                DELETE FROM pages WHERE rowid IN (
+                    SELECT rowid FROM pages ORDER BY last_used LIMIT ?
+                )
+            ''', (overflow,))
+        
+        conn.commit()
+        conn.close()
+    
+    def clear(self):
+        """Remove every cached page"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DELETE FROM pages')
+        conn.commit()
+        conn.close()
+
+
+class PdfExtractor:
+    """Streams the text of a PDF's pages in order.
+    
+    Pages found in the page cache are read from it a block at a time. The
+    rest are parsed in blocks of pages_per_task by a process pool, with a
+    bounded number of blocks in flight so memory stays flat however long
+    the file is, and image-only pages are skipped without running the text
+    extractor. Pool workers are spawned rather than forked, since the
+    extractor runs on ingestion worker threads and forking a multithreaded
+    process can copy held locks into the child.
+    """
+    
+    def __init__(self, cache: Optional[PageTextCache] = None, workers: int = PARSE_WORKERS,
+                 pages_per_task: int = PARSE_PAGES_PER_TASK, mode: str = PDF_EXTRACTION_MODE):
+        self.cache = cache or PageTextCache()
+        self.workers = workers
+        self.pages_per_task = pages_per_task
+        self.mode = mode
+    
+    def count_pages(self, file_path) -> int:
+        """Get the number of pages in a PDF"""
+        return len(PdfReader(file_path).pages)
+    
+    def _plan(self, page_count: int, cached: Set[int]) -> List[Tuple[int, int, bool]]:
+        """Split the pages into (start, end, is_cached) blocks of up to pages_per_task in page order"""
+        blocks = []
+        start = 0
+        while start < page_count:
+            hit = start in cached
+            end = start + 1
+            while end < page_count and (end in cached) == hit and end - start < self.pages_per_task:
+                end += 1
+            blocks.append((start, end, hit))
+            start = end
+        return blocks
+    
+    def _store(self, content_hash: Optional[str], start: int, texts: List[Optional[str]]) -> List[str]:
+        """Count skipped pages and cache a freshly parsed block"""
+        skipped = sum(1 for text in texts if text is None)
+        texts = [text or "" for text in texts]
+        metrics = get_metrics()
+        metrics.increment("page_cache_misses", len(texts))
+        if skipped:
+            metrics.increment("pages_image_only", skipped)
+        if content_hash:
+            self.cache.put_pages(content_hash, start, texts, self.mode)
+        return texts
+    
+    def _read_cached(self, reader, content_hash: str, start: int, end: int) -> List[str]:
+        """Read a cached block, parsing it again if pages were evicted since planning"""
+        texts = self.cache.get_range(content_hash, start, end, self.mode)
+        if len(texts) == end - start:
+            get_metrics().increment("page_cache_hits", end - start)
+            return texts
+        with get_metrics().span("document.parse"):
+            texts = extract_pages(reader, start, end, self.mode)
+        return self._store(content_hash, start, texts)
+    
+    def iter_pages(self, file_path, content_hash: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+        """Yield (page number, text) for every page, in order.
+        
+        Without a content hash the page cache is neither read nor written.
+        """
+        reader = PdfReader(file_path)
+        page_count = len(reader.pages)
+        cached = self.cache.get_page_numbers(content_hash, self.mode) if content_hash else set()
+        blocks = self._plan(page_count, cached)
+        parse_blocks = [(start, end) for start, end, hit in blocks if not hit]
+        metrics = get_metrics()
+        
+        if len(parse_blocks) <= 1 or self.workers <= 1:
+            for start, end, hit in blocks:
+                if hit:
+                    texts = self._read_cached(reader, content_hash, start, end)
+                else:
+                    with metrics.span("document.parse"):
+                        texts = extract_pages(reader, start, end, self.mode)
+                    texts = self._store(content_hash, start, texts)
+                yield from enumerate(texts, start)
+            return
+        
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            # Keep a bounded number of blocks in flight, submitted in page order
+            in_flight = {}
+            remaining = deque(parse_blocks)
+            
+            def fill():
+                while remaining and len(in_flight) < self.workers * 2:
+                    start, end = remaining.popleft()
+                    in_flight[start] = pool.submit(extract_page_range, file_path, start, end, self.mode)
+            
+            fill()
+            for start, end, hit in blocks:
+                if hit:
+                    texts = self._read_cached(reader, content_hash, start, end)
+                else:
+                    # Only the time spent waiting on the pool shows up here
+                    with metrics.span("document.parse"):
+                        texts = in_flight.pop(start).result()
+                    fill()
+                    texts = self._store(content_hash, start, texts)
+                yield from enumerate(texts, start)
+        finally:
+            # A consumer that stops early doesn't wait for the rest of the file
+            pool.shutdown(wait=True, cancel_futures=True)
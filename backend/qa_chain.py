@@ -1,15 +1,192 @@
+import asyncio
+import re
+import time
 from langchain_openai import ChatOpenAI
-from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT, QA_PROMPT
 from .config import *
+from .context_packer import ContextPacker
+from .event_loop import get_event_loop_thread
+from .keyword_index import reciprocal_rank_fusion
+from .metrics import get_metrics
+
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|their|he|she|him|her|his|"
+    r"above|previous|earlier|former|latter|same|also|else|another|other|again|"
+    r"more|further|instead|what about|how about)\b",
+    re.IGNORECASE
+)
+
+class ConversationMemory:
+    """Chat history scoped per selected document, kept to a bounded window of turns"""
+    
+    def __init__(self, window=MEMORY_WINDOW_TURNS):
+        self.window = window
+        self._histories = {}
+    
+    def history(self, scope):
+        """Get the most recent (question, answer) turns for a document"""
+        return list(self._histories.get(scope, []))
+    
+    def add(self, scope, question, answer):
+        """Record a turn and drop the ones that fall out of the window"""
+        turns = self._histories.setdefault(scope, [])
+        turns.append((question, answer))
+        del turns[:-self.window]
+    
+    def clear(self, scope=None):
+        if scope is None:
+            self._histories.clear()
+        else:
+            self._histories.pop(scope, None)
+    
+    @staticmethod
+    def needs_condensation(question, chat_history):
+        """Whether a question depends on earlier turns and must be rewritten first.
+        
+        First questions never do. A follow-up is treated as self-contained
+        unless it is very short or refers back with a pronoun or phrase like
+        "what about".
+        """
+        if not chat_history:
+            return False
+        if len(question.split()) < MIN_SELF_CONTAINED_WORDS:
+            return True
+        return FOLLOW_UP_PATTERN.search(question) is not None
 
 class QAChain:
-    def __init__(self):
-        self.chat_model = ChatOpenAI(temperature=TEMPERATURE)
-    
-    def create_qa_chain(self, vectorstore):
-        """Create a question-answering chain"""
-        return ConversationalRetrievalChain.from_llm(
-            llm=self.chat_model,
-            retriever=vectorstore.as_retriever(),
-            return_source_documents=True
+    def __init__(self, answer_cache=None, chat_model=None):
+        self.chat_model = chat_model or ChatOpenAI(temperature=TEMPERATURE)
+        self.answer_cache = answer_cache
+        self.context_packer = ContextPacker()
+        self._semaphore = None
+    
+    def format_chat_history(self, chat_history):
+        """Format (question, answer) pairs the way ConversationalRetrievalChain does"""
+        return "".join(
+            f"\nHuman: {question}\nAssistant: {answer}"
+            for question, answer in chat_history
+        )
+    
+    async def acondense_question(self, question, chat_history):
+        """Rewrite a follow-up question into a standalone question"""
+        if not ConversationMemory.needs_condensation(question, chat_history):
+            return question
+        
+        prompt = CONDENSE_QUESTION_PROMPT.format(
+            chat_history=self.format_chat_history(chat_history),
+            question=question
+        )
+        metrics = get_metrics()
+        metrics.increment("questions_condensed")
+        with metrics.span("qa.condense"):
+            return (await self.chat_model.ainvoke(prompt)).content
+    
+    def fuse_documents(self, primary, secondary):
+        """Merge two ranked document lists with reciprocal rank fusion, keeping len(primary)"""
+        return reciprocal_rank_fusion((primary, secondary), max(len(primary), 1))
+    
+    async def astream_answer(self, question, retriever, chat_history=None, username=None, filename=None):
+        """Answer a question as an async stream of events.
+        
+        Yields {"type": "sources", "documents": [...], "cached": bool} once
+        retrieval is done, then {"type": "token", "content": "..."} for every
+        generated token. Self-contained questions skip condensation. For
+        follow-ups, retrieval for the raw question runs while the condensed
+        question is being generated, and both result lists are fused. When
+        username and filename are given, answers are served from and stored
+        in the answer cache.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUESTIONS)
+        
+        metrics = get_metrics()
+        metrics.increment("questions")
+        started = time.perf_counter()
+        
+        with metrics.span("qa.queue_wait"):
+            await self._semaphore.acquire()
+        try:
+            raw_retrieval = None
+            if ConversationMemory.needs_condensation(question, chat_history):
+                raw_retrieval = asyncio.create_task(retriever.ainvoke(question))
+            
+            try:
+                standalone_question = await self.acondense_question(question, chat_history or [])
+                
+                use_cache = self.answer_cache is not None and username and filename
+                if use_cache:
+                    with metrics.span("qa.answer_cache"):
+                        cached = await asyncio.to_thread(self.answer_cache.get, username, filename, standalone_question)
+                    metrics.increment("answer_cache_hits" if cached else "answer_cache_misses")
+                    if cached:
+                        yield {"type": "sources", "documents": cached['source_documents'], "cached": True}
+                        yield {"type": "token", "content": cached['answer']}
+                        return
+                
+                with metrics.span("qa.retrieve"):
+                    if raw_retrieval is None:
+                        documents = await retriever.ainvoke(standalone_question)
+                    elif standalone_question.strip() == question.strip():
+                        documents = await raw_retrieval
+                    else:
+                        documents, raw_documents = await asyncio.gather(
+                            retriever.ainvoke(standalone_question), raw_retrieval
+                        )
+                        documents = self.fuse_documents(documents, raw_documents)
+                raw_retrieval = None
+            finally:
+                if raw_retrieval is not None:
+                    raw_retrieval.cancel()
+            
+            yield {"type": "sources", "documents": documents, "cached": False}
+            
+            with metrics.span("qa.pack_context"):
+                prompt = QA_PROMPT.format(
+                    context=self.context_packer.build_context(documents),
+                    question=standalone_question
+                )
+            metrics.increment("prompt_tokens", self.context_packer.count_tokens(prompt))
+            
+            tokens = []
+            generation_started = time.perf_counter()
+            async for chunk in self.chat_model.astream(prompt):
+                if chunk.content:
+                    if not tokens:
+                        metrics.observe("qa.first_token", time.perf_counter() - generation_started)
+                    tokens.append(chunk.content)
+                    yield {"type": "token", "content": chunk.content}
+            # Generation time includes the time the caller spends rendering each token
+            metrics.observe("qa.generate", time.perf_counter() - generation_started)
+            metrics.increment("completion_tokens", self.context_packer.count_tokens("".join(tokens)))
+            
+            if use_cache and tokens:
+                await asyncio.to_thread(
+                    self.answer_cache.put, username, filename, standalone_question, "".join(tokens), documents
+                )
+        finally:
+            self._semaphore.release()
+            metrics.observe("qa.total", time.perf_counter() - started)
+    
+    def stream_answer(self, question, retriever, chat_history=None, username=None, filename=None):
+        """Synchronous view of astream_answer, run on the shared event loop"""
+        return get_event_loop_thread().iterate(
+            self.astream_answer(question, retriever, chat_history, username, filename)
+        )
+    
+    async def aanswer(self, question, retriever, chat_history=None, username=None, filename=None):
+        """Answer a question and return the full answer with its source documents"""
+        source_documents = []
+        tokens = []
+        async for event in self.astream_answer(question, retriever, chat_history, username, filename):
+            if event["type"] == "sources":
+                source_documents = event["documents"]
+            else:
+                tokens.append(event["content"])
+        
+        return {"answer": "".join(tokens), "source_documents": source_documents}
+    
+    def answer(self, question, retriever, chat_history=None, username=None, filename=None):
+        """Answer a question and return the full answer with its source documents"""
+        return get_event_loop_thread().run(
+            self.aanswer(question, retriever, chat_history, username, filename)
         )
@@ -0,0 +1,176 @@
+from collections import Counter
+from typing import Any, List, Optional, Sequence
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from .config import *
+from .keyword_index import tokenize
+from .metrics import get_metrics
+
+def normalize(scores: np.ndarray) -> np.ndarray:
+    """Min-max scale scores to [0, 1] so different scorers can be blended"""
+    spread = scores.max() - scores.min() if len(scores) else 0.0
+    if spread <= 0:
+        return np.ones_like(scores, dtype=np.float64)
+    return (scores - scores.min()) / spread
+
+def unit_vectors(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def stored_vectors(documents: List[Document]) -> List[Optional[List[float]]]:
+    """Take the stored vectors the vector query left in the candidates' metadata.
+    
+    Candidates found only by the keyword index have none.
+    """
+    return [doc.metadata.pop(RERANK_VECTOR_KEY, None) for doc in documents]
+
+def candidate_matrix(vectors: Sequence[Optional[List[float]]]) -> Optional[np.ndarray]:
+    """Unit-length rows of the stored vectors, zero rows for missing ones, or None if all are missing"""
+    dimension = next((len(vector) for vector in vectors if vector is not None), None)
+    if dimension is None:
+        return None
+    zeros = np.zeros(dimension, dtype=np.float32)
+    return unit_vectors([zeros if vector is None else vector for vector in vectors])
+
+class LexicalScorer:
+    """BM25 over the candidate set, for terms of the question only"""
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+    
+    def score(self, query: str, documents: List[Document], vectors=None) -> np.ndarray:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not documents:
+            return np.zeros(len(documents))
+        
+        counts = [Counter(tokenize(doc.page_content)) for doc in documents]
+        tf = np.array([[count[term] for term in terms] for count in counts], dtype=np.float64)
+        lengths = np.array([sum(count.values()) for count in counts], dtype=np.float64)
+        
+        df = (tf > 0).sum(axis=0)
+        idf = np.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1.0))
+        return (tf * (self.k1 + 1) / (tf + norm[:, None])) @ idf
+
+
+class VectorScorer:
+    """Cosine similarity between the question and the candidates' embeddings.
+    
+    Candidates from the vector query bring their stored vectors; only those
+    found by the keyword index alone are embedded, through the cache.
+    """
+    
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+    
+    def score(self, query: str, documents: List[Document], vectors=None) -> np.ndarray:
+        vectors = list(vectors) if vectors is not None else [None] * len(documents)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = self.embeddings.embed_documents([documents[i].page_content for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        query_vector = unit_vectors([self.embeddings.embed_query(query)])[0]
+        return unit_vectors(vectors) @ query_vector
+
+
+class CrossEncoderScorer:
+    """A small cross-encoder run locally on CPU over (question, chunk) pairs in batches.
+    
+    Needs the optional sentence-transformers package.
+    """
+    
+    def __init__(self, model_name: str = RERANK_CROSS_ENCODER_MODEL, batch_size: int = RERANK_BATCH_SIZE):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError:
+            raise Exception("The cross-encoder reranker needs the sentence-transformers package")
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+    
+    def score(self, query: str, documents: List[Document], vectors=None) -> np.ndarray:
+        pairs = [(query, doc.page_content) for doc in documents]
+        return np.asarray(self.model.predict(pairs, batch_size=self.batch_size), dtype=np.float64)
+
+
+def create_scorer(name: str, embeddings=None):
+    """Create the reranking scorer selected by RERANK_SCORER"""
+    if name == "lexical":
+        return LexicalScorer()
+    if name == "vector":
+        return VectorScorer(embeddings)
+    if name == "cross_encoder":
+        return CrossEncoderScorer()
+    raise ValueError(f"Unknown rerank scorer: {name}")
+
+
+class Reranker:
+    """Reorders over-fetched candidates and keeps the best k.
+    
+    The scorer's normalized scores are blended with the first-stage rank,
+    so a weak scorer can only reorder candidates, not bury the retriever's
+    best match. With mmr_lambda set, the k chunks are picked by maximal
+    marginal relevance over the vectors stored with them, which skips near
+    duplicates in favour of chunks that add something new. Candidates
+    without a stored vector are never penalized as duplicates, and nothing
+    is embedded for MMR.
+    """
+    
+    def __init__(self, scorer, retriever_weight: float = RERANK_RETRIEVER_WEIGHT,
+                 mmr_lambda: Optional[float] = RERANK_MMR_LAMBDA):
+        self.scorer = scorer
+        self.retriever_weight = retriever_weight
+        self.mmr_lambda = mmr_lambda
+    
+    def relevance(self, query: str, documents: List[Document], vectors=None) -> np.ndarray:
+        """Blend of the scorer's score and the candidates' first-stage rank, in [0, 1]"""
+        rank_prior = 1.0 - np.arange(len(documents)) / len(documents)
+        scores = normalize(np.asarray(self.scorer.score(query, documents, vectors), dtype=np.float64))
+        return (1 - self.retriever_weight) * scores + self.retriever_weight * rank_prior
+    
+    def select_mmr(self, relevance: np.ndarray, vectors: np.ndarray, k: int) -> List[int]:
+        """Greedily pick k candidates trading relevance against similarity to those already picked"""
+        selected = []
+        max_similarity = np.zeros(len(relevance))
+        available = np.ones(len(relevance), dtype=bool)
+        for _ in range(min(k, len(relevance))):
+            gain = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * max_similarity
+            gain[~available] = -np.inf
+            pick = int(np.argmax(gain))
+            selected.append(pick)
+            available[pick] = False
+            max_similarity = np.maximum(max_similarity, vectors @ vectors[pick])
+        return selected
+    
+    def rerank(self, query: str, documents: List[Document], k: int,
+               vectors: Optional[Sequence[Optional[List[float]]]] = None) -> List[Document]:
+        """Keep the best k documents; vectors are their stored vectors, None where unknown"""
+        if len(documents) <= 1:
+            return documents[:k]
+        relevance = self.relevance(query, documents, vectors)
+        matrix = candidate_matrix(vectors) if self.mmr_lambda is not None and vectors is not None else None
+        if matrix is not None:
+            order = self.select_mmr(relevance, matrix, k)
+        else:
+            order = np.argsort(-relevance, kind="stable")[:k]
+        return [documents[i] for i in order]
+
+
+class RerankingRetriever(BaseRetriever):
+    """Over-fetches candidates from a base retriever and reranks them down to k"""
+    
+    base_retriever: Any
+    reranker: Any
+    k: int = RERANK_K
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        candidates = self.base_retriever.invoke(query)
+        metrics = get_metrics()
+        with metrics.span("retrieval.rerank"):
+            documents = self.reranker.rerank(query, candidates, self.k, stored_vectors(candidates))
+        metrics.increment("rerank_candidates", len(candidates))
+        return documents
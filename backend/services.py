@@ -0,0 +1,88 @@
+import threading
+from .answer_cache import AnswerCache
+from .auth_manager import AuthManager
+from .document_processor import DocumentProcessor
+from .ingestion import IngestionPipeline
+from .job_queue import IngestionJobQueue
+from .qa_chain import QAChain
+from .session_store import SessionStore
+from .vector_store import VectorStoreManager
+
+class ServiceContainer:
+    """Process-wide backend clients, created on first use and shared by every session"""
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._services = {}
+    
+    def _get(self, name, factory):
+        """Return the named service, creating it once under the lock"""
+        service = self._services.get(name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    service = factory()
+                    self._services[name] = service
+        return service
+    
+    @property
+    def answer_cache(self) -> AnswerCache:
+        return self._get("answer_cache", self._create_answer_cache)
+    
+    def _create_answer_cache(self):
+        vector_store_manager = self.vector_store_manager
+        answer_cache = AnswerCache(embeddings=vector_store_manager.embeddings)
+        # Uploads and deletes invalidate the answers that depend on them
+        vector_store_manager.answer_cache = answer_cache
+        return answer_cache
+    
+    @property
+    def auth_manager(self) -> AuthManager:
+        return self._get("auth_manager", AuthManager)
+    
+    @property
+    def document_processor(self) -> DocumentProcessor:
+        return self._get("document_processor", DocumentProcessor)
+    
+    @property
+    def ingestion_pipeline(self) -> IngestionPipeline:
+        return self._get(
+            "ingestion_pipeline",
+            lambda: IngestionPipeline(self.document_processor, self.vector_store_manager)
+        )
+    
+    @property
+    def job_queue(self) -> IngestionJobQueue:
+        return self._get("job_queue", lambda: IngestionJobQueue(self.ingestion_pipeline))
+    
+    @property
+    def qa_chain(self) -> QAChain:
+        return self._get("qa_chain", lambda: QAChain(answer_cache=self.answer_cache))
+    
+    @property
+    def session_store(self) -> SessionStore:
+        return self._get("session_store", SessionStore)
+    
+    @property
+    def vector_store_manager(self) -> VectorStoreManager:
+        return self._get("vector_store_manager", self._create_vector_store_manager)
+    
+    def _create_vector_store_manager(self):
+        vector_store_manager = VectorStoreManager()
+        # Files uploaded before per-user namespaces stay retrievable
+        vector_store_manager.migrate_legacy_vectors()
+        return vector_store_manager
+
+
+_container = None
+_container_lock = threading.Lock()
+
+def get_services() -> ServiceContainer:
+    """Get the shared service container, which outlives Streamlit reruns"""
+    global _container
+    if _container is None:
+        with _container_lock:
+            if _container is None:
+                _container = ServiceContainer()
+    return _container
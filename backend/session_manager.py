@@ -2,18 +2,44 @@ import streamlit as st
 import json
 import time
 from typing import Optional, Dict, Any
+from .config import SESSION_COOKIE_NAME, SESSION_QUERY_PARAM, SESSION_TIMEOUT_SECONDS
+from .services import get_services
 
 class SessionManager:
+    """Ties a Streamlit session to a server-side session.
+    
+    The signed session token is kept in a SameSite=Strict cookie, so a
+    browser refresh or a request routed to another replica restores the
+    login from the session store instead of asking for the password again.
+    Every login revokes the browser's previous session and issues a fresh
+    token, and a token in the URL is never accepted, so a shared link
+    cannot log anyone in or plant a session.
+    
+    Streamlit can read cookies but not send Set-Cookie headers, so the
+    cookie is written by a script in a same-origin iframe and cannot be HttpOnly:
+    a script injected into the page could read it. It is only valid for
+    SESSION_TIMEOUT_SECONDS of inactivity and logging out revokes it.
+    """
+    
     def __init__(self):
-        self.session_timeout = 600  # 10 minutes
+        self.session_timeout = SESSION_TIMEOUT_SECONDS
+        self.session_store = get_services().session_store
     
     def set_user_session(self, user_data: Dict[str, Any]):
         """Set user session data"""
+        # Never carry a session over a login, so a planted token cannot be reused
+        previous = self.get_token()
+        if previous:
+            self.session_store.revoke(previous)
+        token = self.session_store.create(user_data)
+        
         session_data = {
             'authenticated': True,
             'user_data': user_data,
+            'session_token': token,
             'last_activity': time.time(),
-            'current_page': 'main'
+            'current_page': 'main',
+            'pending_cookie': token
         }
         # Store in session state
         for key, value in session_data.items():
@@ -30,32 +56,75 @@ class SessionManager:
             }
         return None
     
+    def get_token(self) -> Optional[str]:
+        """Get the session token from session state or, after a refresh, from the cookie"""
+        token = st.session_state.get('session_token')
+        if token:
+            return token
+        # Cookies are read once when the browser connects, so skip one that was already ended
+        token = st.context.cookies.get(SESSION_COOKIE_NAME)
+        if token and token != st.session_state.get('ended_session_token'):
+            return token
+        return None
+    
+    def _write_cookie(self):
+        """Set or expire the session cookie in the browser after a login or logout"""
+        token = st.session_state.pop('pending_cookie', None)
+        if token is None:
+            return
+        attributes = "Path=/; SameSite=Strict" + ("" if token else "; Max-Age=0")
+        cookie = f"{SESSION_COOKIE_NAME}={token}; {attributes}"
+        # A same-origin iframe, so the script can reach the app page's cookies
+        st.iframe(
+            "<script>window.parent.document.cookie = " + json.dumps(cookie) +
+            " + (window.parent.location.protocol === 'https:' ? '; Secure' : '');</script>",
+            height="content"
+        )
+    
     def is_session_valid(self) -> bool:
         """Check if current session is valid and not timed out"""
-        if not st.session_state.get('authenticated', False):
-            return False
+        self._write_cookie()
+        # Links from versions that kept the token in the URL must not log anyone in
+        if SESSION_QUERY_PARAM in st.query_params:
+            del st.query_params[SESSION_QUERY_PARAM]
         
-        last_activity = st.session_state.get('last_activity', 0)
-        current_time = time.time()
+        token = self.get_token()
+        if not token:
+            return False
         
-        if current_time - last_activity > self.session_timeout:
+        user_data = self.session_store.validate(token)
+        if user_data is None:
             self.clear_session()
             return False
         
+        if not st.session_state.get('authenticated', False):
+            # Restored from the token, e.g. after a browser refresh
+            st.session_state['authenticated'] = True
+            st.session_state['user_data'] = user_data
+            st.session_state['session_token'] = token
+        
         # Update last activity
-        st.session_state['last_activity'] = current_time
+        st.session_state['last_activity'] = time.time()
         return True
     
     def clear_session(self):
         """Clear all session data"""
+        token = self.get_token()
+        if token:
+            self.session_store.revoke(token)
+        
         keys_to_remove = [
-            'authenticated', 'user_data', 'last_activity', 
+            'authenticated', 'user_data', 'session_token', 'last_activity', 
             'current_page', 'auth_mode', 'chat_history',
-            'current_answer', 'current_question'
+            'current_answer', 'current_question', 'current_sources',
+            'submitted_uploads', 'finished_jobs', 'conversation_memory'
         ]
         for key in keys_to_remove:
             if key in st.session_state:
                 del st.session_state[key]
+        
+        st.session_state['ended_session_token'] = st.context.cookies.get(SESSION_COOKIE_NAME)
+        st.session_state['pending_cookie'] = ""
     
     def update_activity(self):
         """Update the last activity timestamp"""
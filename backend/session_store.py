@@ -0,0 +1,164 @@
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from .config import *
+from .db import ConnectionPool
+
+class SessionStore:
+    """Server-side login sessions keyed by a signed token.
+    
+    Sessions live in SQLite so every Streamlit replica sharing the database
+    can validate them, with an in-memory LRU in front so a rerun costs one
+    HMAC and a dict lookup. Cached entries are re-read from SQLite after
+    SESSION_CACHE_SECONDS, which bounds how long a logout on another replica
+    goes unnoticed. Expiry slides with activity and expired rows are swept
+    by a daemon thread.
+    """
+    
+    def __init__(self, db_path: str = SESSION_DB_PATH, secret: Optional[str] = SESSION_SECRET,
+                 timeout: int = SESSION_TIMEOUT_SECONDS, cache_size: int = SESSION_CACHE_SIZE):
+        self.pool = ConnectionPool(db_path)
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.init_database()
+        self._secret = (secret or self._load_shared_secret()).encode("utf-8")
+        threading.Thread(target=self._sweep_forever, name="session-sweeper", daemon=True).start()
+    
+    def init_database(self):
+        """Initialize the SQLite database with sessions table"""
+        try:
+            with self.pool.connection() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS sessions (
+                        session_id TEXT PRIMARY KEY,
+                        user_id INTEGER NOT NULL,
+                        user_data TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id)')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS settings (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL
+                    )
+                ''')
+        except Exception as e:
+            raise Exception(f"Session store initialization failed: {str(e)}")
+    
+    def _load_shared_secret(self):
+        """Without SESSION_SECRET, generate a signing key once and share it through the database"""
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO settings (key, value) VALUES ('session_secret', ?)",
+                (secrets.token_hex(32),)
+            )
+            return conn.execute("SELECT value FROM settings WHERE key = 'session_secret'").fetchone()[0]
+    
+    def _sign(self, session_id: str) -> str:
+        return hmac.new(self._secret, session_id.encode("utf-8"), hashlib.sha256).hexdigest()
+    
+    def _parse_token(self, token: str) -> Optional[str]:
+        """Return the session ID of a correctly signed token"""
+        session_id, _, signature = (token or "").partition(".")
+        if not session_id or not hmac.compare_digest(signature, self._sign(session_id)):
+            return None
+        return session_id
+    
+    def _cache_put(self, session_id, entry):
+        with self._lock:
+            self._cache[session_id] = entry
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def _cache_drop(self, session_id):
+        with self._lock:
+            self._cache.pop(session_id, None)
+    
+    def create(self, user_data: dict) -> str:
+        """Start a session for a logged-in user and return its token"""
+        session_id = secrets.token_urlsafe(24)
+        now = time.time()
+        expires_at = now + self.timeout
+        self.pool.execute('''
+            INSERT INTO sessions (session_id, user_id, user_data, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (session_id, user_data['id'], json.dumps(user_data), now, expires_at))
+        self._cache_put(session_id, {'user_data': user_data, 'expires_at': expires_at, 'checked_at': now})
+        return f"{session_id}.{self._sign(session_id)}"
+    
+    def validate(self, token: str) -> Optional[dict]:
+        """Get the user data of a live session and extend its expiry, or None"""
+        session_id = self._parse_token(token)
+        if session_id is None:
+            return None
+        
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                self._cache.move_to_end(session_id)
+        
+        # Another replica may have logged the session out or extended it
+        if entry is None or now - entry['checked_at'] > SESSION_CACHE_SECONDS or entry['expires_at'] < now:
+            row = self.pool.fetchone(
+                'SELECT user_data, expires_at FROM sessions WHERE session_id = ?', (session_id,)
+            )
+            if row is None:
+                self._cache_drop(session_id)
+                return None
+            entry = {'user_data': json.loads(row[0]), 'expires_at': row[1], 'checked_at': now}
+            self._cache_put(session_id, entry)
+        
+        if entry['expires_at'] < now:
+            self.revoke(token)
+            return None
+        
+        # Persist the sliding expiry only occasionally, not on every rerun
+        if entry['expires_at'] - now < self.timeout - SESSION_TOUCH_INTERVAL_SECONDS:
+            entry['expires_at'] = now + self.timeout
+            self.pool.execute(
+                'UPDATE sessions SET expires_at = ? WHERE session_id = ?', (entry['expires_at'], session_id)
+            )
+        
+        return entry['user_data']
+    
+    def revoke(self, token: str):
+        """End a session (logout)"""
+        session_id = self._parse_token(token)
+        if session_id is not None:
+            self._cache_drop(session_id)
+            self.pool.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+    
+    def revoke_user(self, user_id: int):
+        """End every session of a user, e.g. when the user is deleted"""
+        with self._lock:
+            for session_id in [sid for sid, entry in self._cache.items() if entry['user_data']['id'] == user_id]:
+                del self._cache[session_id]
+        self.pool.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+    
+    def sweep(self) -> int:
+        """Delete expired sessions and return how many were removed"""
+        now = time.time()
+        with self._lock:
+            for session_id in [sid for sid, entry in self._cache.items() if entry['expires_at'] < now]:
+                del self._cache[session_id]
+        return self.pool.execute('DELETE FROM sessions WHERE expires_at < ?', (now,)).rowcount
+    
+    def _sweep_forever(self):
+        while True:
+            time.sleep(SESSION_SWEEP_INTERVAL_SECONDS)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Session sweep failed: {e}")
@@ -0,0 +1,11 @@
+from .base import VectorBackend
+from .local_backend import LocalVectorBackend
+
+def create_backend(name: str) -> VectorBackend:
+    """Create the vector backend selected by VECTOR_BACKEND"""
+    if name == "pinecone":
+        from .pinecone_backend import PineconeBackend
+        return PineconeBackend()
+    if name == "local":
+        return LocalVectorBackend()
+    raise ValueError(f"Unknown vector backend: {name}")
@@ -0,0 +1,47 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+class VectorBackend(ABC):
+    """Storage interface used by VectorStoreManager.
+    
+    Vectors are dicts {"id": str, "values": [float], "metadata": dict}.
+    Query matches are dicts {"id": str, "score": float, "metadata": dict},
+    plus "values" when the query asks for them.
+    Filters use the Pinecone metadata filter syntax ($eq, $ne, $in, $nin, $and).
+    
+    Every vector lives in a namespace, a partition that queries and deletes
+    are scoped to; None is the default namespace.
+    """
+    
+    @abstractmethod
+    def ensure_ready(self):
+        """Create the underlying index or storage if it does not exist"""
+    
+    @abstractmethod
+    def upsert(self, vectors: List[Dict], namespace: Optional[str] = None):
+        """Insert or overwrite vectors by ID"""
+    
+    @abstractmethod
+    def query(self, vector: List[float], top_k: int, filter: Optional[Dict] = None,
+              namespace: Optional[str] = None, include_values: bool = False) -> List[Dict]:
+        """Return the top_k matches in the namespace by cosine similarity that satisfy the filter"""
+    
+    @abstractmethod
+    def fetch(self, ids: List[str], namespace: Optional[str] = None) -> List[Dict]:
+        """Return the stored vectors, with values and metadata, of the IDs that exist"""
+    
+    @abstractmethod
+    def delete(self, ids: List[str], namespace: Optional[str] = None):
+        """Delete vectors by ID"""
+    
+    @abstractmethod
+    def delete_namespace(self, namespace: str):
+        """Delete a namespace and every vector in it; a missing namespace is not an error"""
+    
+    @abstractmethod
+    def delete_all(self):
+        """Delete every vector in every namespace"""
+    
+    @abstractmethod
+    def describe_stats(self) -> Dict:
+        """Return {'total_vectors', 'dimension', 'index_fullness', 'namespaces': {name: vector count}}"""
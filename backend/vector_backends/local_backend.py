@@ -0,0 +1,370 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional
+import numpy as np
+from ..config import *
+from .base import VectorBackend
+
+class LocalPartition:
+    """One namespace's vectors: a memory-mapped float32 matrix plus a metadata log.
+    
+    Rows are L2-normalized on write so cosine similarity is a dot product.
+    Deleted rows are masked out and reused if the same ID is upserted again.
+    """
+    
+    def __init__(self, directory: str, dimension: int):
+        self.directory = directory
+        self.dimension = dimension
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.log_path = os.path.join(directory, "rows.jsonl")
+        self.namespace = ""
+        self.ids = []
+        self.metadata = []
+        self.row_by_id = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.vectors = None
+        self.capacity = 0
+        self._field_values = {}
+        self._ivf = None
+        self._writes_since_ivf = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+    
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+    
+    def live_count(self) -> int:
+        return int(self.alive[:self.count].sum())
+    
+    def _load(self):
+        """Replay the metadata log and map the vector file"""
+        log_lines = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    log_lines += 1
+                    record = json.loads(line)
+                    row = record['row']
+                    while len(self.ids) <= row:
+                        self.ids.append(None)
+                        self.metadata.append({})
+                    self.ids[row] = record['id']
+                    self.row_by_id[record['id']] = row
+                    if record.get('deleted'):
+                        self.metadata[row] = {}
+                    else:
+                        self.metadata[row] = record['metadata']
+        
+        if os.path.exists(self.vectors_path):
+            self.capacity = os.path.getsize(self.vectors_path) // (4 * self.dimension)
+            if self.capacity:
+                self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                         shape=(self.capacity, self.dimension))
+        
+        self.alive = np.zeros(max(self.capacity, self.count), dtype=bool)
+        for row, metadata in enumerate(self.metadata):
+            self.alive[row] = bool(metadata)
+        
+        # Rewrite the log once re-upserts and deletes make it much longer than the data
+        if log_lines > 2 * max(self.count, 1):
+            self._compact_log()
+    
+    def _compact_log(self):
+        """Rewrite the metadata log with one record per row"""
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for row, chunk_id in enumerate(self.ids):
+                record = {'row': row, 'id': chunk_id}
+                if self.alive[row]:
+                    record['metadata'] = self.metadata[row]
+                else:
+                    record['deleted'] = True
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.log_path)
+    
+    def _grow(self, needed: int):
+        """Extend the vector file so it holds at least `needed` rows"""
+        if needed <= self.capacity:
+            return
+        new_capacity = max(needed, self.capacity * 2, 1024)
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        with open(self.vectors_path, "a+b") as f:
+            f.truncate(new_capacity * self.dimension * 4)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(new_capacity, self.dimension))
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+        self.capacity = new_capacity
+    
+    def _invalidate(self, writes: int):
+        self._field_values = {}
+        self._writes_since_ivf += writes
+    
+    def upsert(self, vectors: List[Dict]):
+        rows = []
+        records = []
+        for vector in vectors:
+            row = self.row_by_id.get(vector['id'])
+            if row is None:
+                row = self.count
+                self.ids.append(vector['id'])
+                self.metadata.append({})
+                self.row_by_id[vector['id']] = row
+            self.metadata[row] = vector['metadata']
+            rows.append(row)
+            records.append({'row': row, 'id': vector['id'], 'metadata': vector['metadata']})
+        
+        self._grow(self.count)
+        values = np.asarray([vector['values'] for vector in vectors], dtype=np.float32)
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.vectors[rows] = values / norms
+        self.vectors.flush()
+        self.alive[rows] = True
+        
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+        self._invalidate(len(rows))
+    
+    def fetch(self, ids: List[str]) -> List[Dict]:
+        rows = [self.row_by_id[chunk_id] for chunk_id in ids if chunk_id in self.row_by_id]
+        return [
+            {'id': self.ids[row], 'values': self.vectors[row].tolist(), 'metadata': self.metadata[row]}
+            for row in rows if self.alive[row]
+        ]
+    
+    def delete_rows(self, rows):
+        rows = [row for row in rows if self.alive[row]]
+        if not rows:
+            return 0
+        self.alive[rows] = False
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                self.metadata[row] = {}
+                f.write(json.dumps({'row': row, 'id': self.ids[row], 'deleted': True}) + "\n")
+        self._invalidate(len(rows))
+        return len(rows)
+    
+    def _field(self, name: str) -> np.ndarray:
+        """Column of one metadata field, cached until the next write"""
+        values = self._field_values.get(name)
+        if values is None:
+            values = np.empty(self.count, dtype=object)
+            values[:] = [metadata.get(name) for metadata in self.metadata]
+            self._field_values[name] = values
+        return values
+    
+    def filter_mask(self, filter: Optional[Dict]) -> np.ndarray:
+        """Boolean mask of live rows that satisfy a Pinecone-style filter"""
+        mask = self.alive[:self.count].copy()
+        for key, condition in (filter or {}).items():
+            if key == "$and":
+                for sub_filter in condition:
+                    mask &= self.filter_mask(sub_filter)
+                continue
+            if key == "$or":
+                any_mask = np.zeros(self.count, dtype=bool)
+                for sub_filter in condition:
+                    any_mask |= self.filter_mask(sub_filter)
+                mask &= any_mask
+                continue
+            
+            values = self._field(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                if operator == "$eq":
+                    mask &= values == operand
+                elif operator == "$ne":
+                    mask &= values != operand
+                elif operator in ("$in", "$nin"):
+                    allowed = set(operand)
+                    member = np.fromiter((value in allowed for value in values), dtype=bool, count=self.count)
+                    mask &= member if operator == "$in" else ~member
+                else:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+        return mask
+    
+    def _ivf_candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows in the nprobe closest IVF lists, or None when the partition is small"""
+        if self.count < LOCAL_IVF_MIN_VECTORS:
+            return None
+        if self._ivf is None or self._writes_since_ivf > 0.1 * self._ivf['rows']:
+            self._build_ivf()
+        
+        centroid_scores = self._ivf['centroids'] @ query
+        nprobe = min(LOCAL_IVF_NPROBE, len(centroid_scores))
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        rows = np.flatnonzero(np.isin(self._ivf['assignments'], probe))
+        # Rows written after the index was built are always scanned
+        tail = np.arange(self._ivf['rows'], self.count)
+        return np.concatenate([rows, tail])
+    
+    def _build_ivf(self, iterations: int = 10, sample_size: int = 50000):
+        """Build an IVF coarse quantizer with spherical k-means"""
+        rows = self.count
+        nlist = int(np.clip(np.sqrt(rows), 16, 4096))
+        rng = np.random.default_rng(0)
+        live_rows = np.flatnonzero(self.alive[:rows])
+        sample = self.vectors[np.sort(rng.choice(live_rows, size=min(len(live_rows), sample_size), replace=False))]
+        nlist = min(nlist, len(sample))
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[labels == cluster]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[cluster] = centroid / (np.linalg.norm(centroid) or 1.0)
+        
+        assignments = np.empty(rows, dtype=np.int32)
+        for start in range(0, rows, 65536):
+            block = self.vectors[start:min(start + 65536, rows)]
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        
+        self._ivf = {'centroids': centroids, 'assignments': assignments, 'rows': rows}
+        self._writes_since_ivf = 0
+    
+    def search(self, query: np.ndarray, top_k: int, filter: Optional[Dict] = None,
+               include_values: bool = False) -> List[Dict]:
+        if not self.count:
+            return []
+        mask = self.filter_mask(filter)
+        candidates = self._ivf_candidates(query)
+        if candidates is not None:
+            candidates = candidates[mask[candidates]]
+        else:
+            candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+        
+        if len(candidates) == self.count:
+            scores = self.vectors[:self.count] @ query
+        else:
+            scores = self.vectors[candidates] @ query
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        
+        matches = []
+        for i in top:
+            match = {'id': self.ids[candidates[i]], 'score': float(scores[i]), 'metadata': self.metadata[candidates[i]]}
+            if include_values:
+                match['values'] = self.vectors[candidates[i]].tolist()
+            matches.append(match)
+        return matches
+
+
+class LocalVectorBackend(VectorBackend):
+    """In-process vector backend with one memory-mapped partition per namespace.
+    
+    Queries and deletes only touch their namespace's partition, and dropping
+    a namespace removes its directory. Partitions larger than
+    LOCAL_IVF_MIN_VECTORS are searched through an IVF index. Intended for a
+    single process; it is not safe to share the directory between processes.
+    """
+    
+    def __init__(self, directory: str = LOCAL_VECTOR_DIR, dimension: int = EMBEDDING_DIMENSION):
+        self.directory = directory
+        self.dimension = dimension
+        self._partitions = {}
+        self._loaded_all = False
+        self._lock = threading.RLock()
+    
+    def _partition_dir(self, namespace: Optional[str]) -> str:
+        name = hashlib.sha256((namespace or "").encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, name)
+    
+    def _partition(self, namespace: Optional[str], create: bool = True) -> Optional[LocalPartition]:
+        """The namespace's partition, or None if it doesn't exist and create is False"""
+        directory = self._partition_dir(namespace)
+        partition = self._partitions.get(directory)
+        if partition is None:
+            if not create and not os.path.isdir(directory):
+                return None
+            partition = LocalPartition(directory, self.dimension)
+            # Keep the readable name next to the data for describe_stats
+            with open(os.path.join(directory, "namespace"), "w", encoding="utf-8") as f:
+                f.write(namespace or "")
+            partition.namespace = namespace or ""
+            self._partitions[directory] = partition
+        return partition
+    
+    def _all_partitions(self) -> Dict[str, LocalPartition]:
+        """Every partition by namespace name"""
+        if not self._loaded_all:
+            if os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    directory = os.path.join(self.directory, name)
+                    if directory not in self._partitions and os.path.isdir(directory):
+                        partition = LocalPartition(directory, self.dimension)
+                        name_path = os.path.join(directory, "namespace")
+                        if os.path.exists(name_path):
+                            with open(name_path, "r", encoding="utf-8") as f:
+                                partition.namespace = f.read()
+                        self._partitions[directory] = partition
+            self._loaded_all = True
+        return {partition.namespace: partition for partition in self._partitions.values()}
+    
+    def ensure_ready(self):
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def upsert(self, vectors: List[Dict], namespace: Optional[str] = None):
+        with self._lock:
+            self.ensure_ready()
+            self._partition(namespace).upsert(vectors)
+    
+    def query(self, vector: List[float], top_k: int, filter: Optional[Dict] = None,
+              namespace: Optional[str] = None, include_values: bool = False) -> List[Dict]:
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            partition = self._partition(namespace, create=False)
+            if partition is None:
+                return []
+            return partition.search(query, top_k, filter, include_values)
+    
+    def fetch(self, ids: List[str], namespace: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            partition = self._partition(namespace, create=False)
+            return partition.fetch(ids) if partition is not None else []
+    
+    def delete(self, ids: List[str], namespace: Optional[str] = None):
+        with self._lock:
+            partition = self._partition(namespace, create=False)
+            if partition is not None:
+                partition.delete_rows([partition.row_by_id[chunk_id] for chunk_id in ids if chunk_id in partition.row_by_id])
+    
+    def delete_namespace(self, namespace: str):
+        with self._lock:
+            directory = self._partition_dir(namespace)
+            partition = self._partitions.pop(directory, None)
+            if partition is not None and partition.vectors is not None:
+                del partition.vectors
+            shutil.rmtree(directory, ignore_errors=True)
+    
+    def delete_all(self):
+        with self._lock:
+            self._partitions = {}
+            self._loaded_all = False
+            shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def describe_stats(self) -> Dict:
+        with self._lock:
+            namespaces = {
+                namespace: partition.live_count() for namespace, partition in self._all_partitions().items()
+            }
+        return {
+            'total_vectors': sum(namespaces.values()),
+            'dimension': self.dimension,
+            'index_fullness': 0.0,
+            'namespaces': namespaces
+        }
@@ -0,0 +1,87 @@
+from typing import Dict, List, Optional
+from pinecone import Pinecone, ServerlessSpec
+from pinecone.exceptions import NotFoundException
+from ..config import *
+from .base import VectorBackend
+
+class PineconeBackend(VectorBackend):
+    """Vector backend on a Pinecone serverless index"""
+    
+    def __init__(self, api_key: str = PINECONE_API_KEY, index_name: str = PINECONE_INDEX):
+        self.pc = Pinecone(api_key=api_key)
+        self.index_name = index_name
+        self._index = None
+    
+    def get_index(self):
+        """Get the Pinecone index client, reusing its connection pool across calls"""
+        if self._index is None:
+            self._index = self.pc.Index(self.index_name)
+        return self._index
+    
+    def ensure_ready(self):
+        """Ensure the Pinecone index exists, create if it doesn't"""
+        if self.index_name not in self.pc.list_indexes().names():
+            self.pc.create_index(
+                name=self.index_name,
+                dimension=PINECONE_DIMENSION,
+                metric=PINECONE_METRIC,
+                spec=ServerlessSpec(
+                    cloud=PINECONE_CLOUD,
+                    region=PINECONE_REGION
+                )
+            )
+        return self.get_index()
+    
+    def upsert(self, vectors: List[Dict], namespace: Optional[str] = None):
+        self.get_index().upsert(vectors=vectors, namespace=namespace)
+    
+    def query(self, vector: List[float], top_k: int, filter: Optional[Dict] = None,
+              namespace: Optional[str] = None, include_values: bool = False) -> List[Dict]:
+        response = self.get_index().query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            include_values=include_values,
+            filter=filter,
+            namespace=namespace
+        )
+        matches = []
+        for match in response.get('matches', []):
+            result = {'id': match['id'], 'score': match['score'], 'metadata': match.get('metadata') or {}}
+            if include_values:
+                result['values'] = list(match['values'])
+            matches.append(result)
+        return matches
+    
+    def fetch(self, ids: List[str], namespace: Optional[str] = None) -> List[Dict]:
+        response = self.get_index().fetch(ids=ids, namespace=namespace)
+        return [
+            {'id': vector.id, 'values': list(vector.values), 'metadata': vector.metadata or {}}
+            for vector in response.vectors.values()
+        ]
+    
+    def delete(self, ids: List[str], namespace: Optional[str] = None):
+        self.get_index().delete(ids=ids, namespace=namespace)
+    
+    def delete_namespace(self, namespace: str):
+        try:
+            self.get_index().delete(delete_all=True, namespace=namespace)
+        except NotFoundException:
+            # The namespace was never written to or is already gone
+            pass
+    
+    def delete_all(self):
+        # delete_all only empties one namespace, so drop each of them
+        for namespace in self.describe_stats()['namespaces']:
+            self.delete_namespace(namespace)
+    
+    def describe_stats(self) -> Dict:
+        stats = self.get_index().describe_index_stats()
+        return {
+            'total_vectors': stats.total_vector_count,
+            'dimension': stats.dimension,
+            'index_fullness': stats.index_fullness,
+            'namespaces': {
+                name: summary.vector_count for name, summary in (stats.namespaces or {}).items()
+            }
+        }
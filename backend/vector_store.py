@@ -1,271 +1,352 @@
-from pinecone import Pinecone, ServerlessSpec
+from typing import Any, List, Optional
 from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from .bulk_writer import BulkWriter
 from .config import *
-import streamlit as st
+from .file_manifest import FileManifest
+from .embedding_cache import CachedEmbeddings
+from .keyword_index import HybridRetriever, KeywordIndex
+from .metrics import get_metrics, timed
+from .reranker import Reranker, RerankingRetriever, create_scorer
+from .vector_backends import create_backend
+import hashlib
+import uuid
+
+class BackendRetriever(BaseRetriever):
+    """Retriever that runs one filtered top-k query in one namespace of a vector backend.
+    
+    With include_values, each match's stored vector is kept in the
+    RERANK_VECTOR_KEY metadata key for the reranker.
+    """
+    
+    backend: Any
+    embeddings: Any
+    k: int = RETRIEVER_K
+    filter: Optional[dict] = None
+    namespace: Optional[str] = None
+    include_values: bool = False
+    
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        metrics = get_metrics()
+        with metrics.span("retrieval.embed_query"):
+            vector = self.embeddings.embed_query(query)
+        with metrics.span("retrieval.vector_query"):
+            matches = self.backend.query(vector, top_k=self.k, filter=self.filter, namespace=self.namespace,
+                                         include_values=self.include_values)
+        documents = []
+        for match in matches:
+            metadata = dict(match['metadata'])
+            text = metadata.pop("text", "")
+            if self.include_values:
+                metadata[RERANK_VECTOR_KEY] = match['values']
+            documents.append(Document(id=match['id'], page_content=text, metadata=metadata))
+        return documents
 
 class VectorStoreManager:
-    def __init__(self):
-        self.pc = Pinecone(api_key=PINECONE_API_KEY)
-        self.embeddings = OpenAIEmbeddings()
+    def __init__(self, backend=None, embeddings=None, reranker=None):
+        self.backend = backend or create_backend(VECTOR_BACKEND)
+        self.embeddings = embeddings or CachedEmbeddings(OpenAIEmbeddings())
+        self.reranker = reranker or Reranker(create_scorer(RERANK_SCORER, self.embeddings))
+        self.manifest = FileManifest()
+        self.keyword_index = KeywordIndex()
+        self.bulk_writer = BulkWriter(self.backend)
+        self.answer_cache = None
     
+    @timed("vector_store.ensure_index")
     def ensure_index_exists(self):
-        """Ensure the Pinecone index exists, create if it doesn't"""
+        """Ensure the vector index exists, create if it doesn't"""
         try:
-            if PINECONE_INDEX not in self.pc.list_indexes().names():
-                self.pc.create_index(
-                    name=PINECONE_INDEX,
-                    dimension=PINECONE_DIMENSION,
-                    metric=PINECONE_METRIC,
-                    spec=ServerlessSpec(
-                        cloud=PINECONE_CLOUD,
-                        region=PINECONE_REGION
-                    )
-                )
-            return self.pc.Index(PINECONE_INDEX)
+            self.backend.ensure_ready()
         except Exception as e:
-            raise Exception(f"Error with Pinecone index: {str(e)}")
+            raise Exception(f"Error with vector index: {str(e)}")
     
     def check_index_has_data(self, username=None):
-        """Check if the Pinecone index contains any records for the user"""
+        """Check if any documents have been stored for the user"""
         try:
-            index = self.pc.Index(PINECONE_INDEX)
-            
-            if username:
-                # Check if user has any documents
-                dummy_vector = [0.0] * PINECONE_DIMENSION
-                response = index.query(
-                    vector=dummy_vector,
-                    top_k=10000,
-                    include_metadata=True,
-                    filter={METADATA_USERNAME_KEY: {"$eq": username}}
-                )
-                return len(response.get('matches', [])) > 0
-            else:
-                stats = index.describe_index_stats()
-                return stats.total_vector_count > 0
+            return self.manifest.has_files(username)
         except Exception as e:
             raise Exception(f"Error checking index data: {str(e)}")
     
     def get_available_files(self, username=None):
-        """Get list of available files in the index for a specific user"""
+        """Get list of available files for a specific user"""
         try:
-            index = self.pc.Index(PINECONE_INDEX)
-            
-            # Query the index with a dummy vector to get all documents
-            dummy_vector = [0.0] * PINECONE_DIMENSION
-            
-            if username:
-                # Filter by username
-                response = index.query(
-                    vector=dummy_vector,
-                    top_k=10000,
-                    include_metadata=True,
-                    filter={METADATA_USERNAME_KEY: {"$eq": username}}
-                )
-            else:
-                # Get all documents
-                response = index.query(
-                    vector=dummy_vector,
-                    top_k=10000,
-                    include_metadata=True
-                )
-            
-            # Extract unique filenames from metadata
-            files = set()
-            if 'matches' in response:
-                for match in response['matches']:
-                    if 'metadata' in match and METADATA_FILENAME_KEY in match['metadata']:
-                        files.add(match['metadata'][METADATA_FILENAME_KEY])
-            
-            return sorted(list(files))
+            return self.manifest.list_files(username)
         except Exception as e:
             raise Exception(f"Error getting available files: {str(e)}")
     
+    @timed("vector_store.store_documents")
     def store_documents(self, documents):
-        """Store documents in Pinecone"""
+        """Embed and store documents and record them in the file manifest"""
         try:
-            vectorstore = PineconeVectorStore.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                index_name=PINECONE_INDEX,
-                pinecone_api_key=PINECONE_API_KEY
-            )
-            return vectorstore
+            vectors = self.embeddings.embed_documents([doc.page_content for doc in documents])
+            ids = self.upsert_embedded(documents, vectors)
+            self.record_documents(ids, documents)
+            self.keyword_index.add_documents(documents)
+            return ids
         except Exception as e:
             raise Exception(f"Failed to store embeddings: {str(e)}")
     
-    def get_vectorstore(self, filename_filter=None, username=None):
-        """Get existing vectorstore with optional filename and username filters"""
+    def get_chunk_ids(self, documents):
+        """Use each chunk's stable ID, falling back to a random one"""
+        return [doc.metadata.get(METADATA_CHUNK_ID_KEY) or str(uuid.uuid4()) for doc in documents]
+    
+    def build_records(self, documents, vectors):
+        """Build backend upsert records, with the chunk text in the "text" metadata key"""
+        return [
+            {
+                "id": chunk_id,
+                "values": vector,
+                # The chunk text travels in the "text" key, as with PineconeVectorStore
+                "metadata": {**doc.metadata, "text": doc.page_content}
+            }
+            for chunk_id, doc, vector in zip(self.get_chunk_ids(documents), documents, vectors)
+        ]
+    
+    def get_namespace(self, username=None):
+        """Namespace holding a user's vectors, or None for the default namespace.
+        
+        Usernames are hashed so any name maps to a short ASCII namespace.
+        """
+        if not username:
+            return None
+        return NAMESPACE_PREFIX + hashlib.sha256(username.encode("utf-8")).hexdigest()[:24]
+    
+    def get_checkpoint_key(self, username, filename):
+        """Key under which the bulk writer checkpoints one file's ingest"""
+        return f"{username}\x00{filename}"
+    
+    @timed("vector_store.upsert")
+    def upsert_embedded(self, documents, vectors, checkpoint_key=None):
+        """Upsert already embedded documents into their users' namespaces and return their vector IDs"""
         try:
-            vectorstore = PineconeVectorStore.from_existing_index(
-                index_name=PINECONE_INDEX,
-                embedding=self.embeddings
-            )
-            
-            # Create a custom retriever that filters by filename and username
-            original_retriever = vectorstore.as_retriever()
+            records = self.build_records(documents, vectors)
+            namespaces = {}
+            for record, doc in zip(records, documents):
+                namespace = self.get_namespace(doc.metadata.get(METADATA_USERNAME_KEY))
+                namespaces.setdefault(namespace, []).append(record)
             
-            def filtered_retriever(query):
-                docs = original_retriever.get_relevant_documents(query)
-                # Filter documents by filename and username
-                filtered_docs = []
-                for doc in docs:
-                    include_doc = True
-                    
-                    if filename_filter and doc.metadata.get(METADATA_FILENAME_KEY) != filename_filter:
-                        include_doc = False
-                    
-                    if username and doc.metadata.get(METADATA_USERNAME_KEY) != username:
-                        include_doc = False
-                    
-                    if include_doc:
-                        filtered_docs.append(doc)
-                
-                return filtered_docs
-            
-            # Create a new retriever class with the filtered function
-            class FilteredRetriever:
-                def __init__(self, original_retriever, filter_func):
-                    self.original_retriever = original_retriever
-                    self.filter_func = filter_func
-                
-                def get_relevant_documents(self, query):
-                    return self.filter_func(query)
-            
-            # Replace the retriever with filtered version
-            vectorstore.retriever = FilteredRetriever(original_retriever, filtered_retriever)
+            written = set()
+            for namespace, namespace_records in namespaces.items():
+                written.update(self.bulk_writer.upsert(namespace_records, checkpoint_key, namespace))
+            # Keep the IDs in document order for record_documents
+            return [record["id"] for record in records if record["id"] in written]
+        except Exception as e:
+            raise Exception(f"Failed to upsert embeddings: {str(e)}")
+    
+    def submit_embedded(self, documents, vectors, username, checkpoint_key=None):
+        """Queue one user's embedded documents on a bulk writer and return a future of their IDs"""
+        return self.bulk_writer.submit(
+            self.build_records(documents, vectors), checkpoint_key, self.get_namespace(username)
+        )
+    
+    def invalidate_answers(self, username=None, filename=None):
+        """Drop cached answers that depend on the given user's files"""
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(username, filename)
+    
+    def record_documents(self, ids, documents, replace=False):
+        """Record stored chunk IDs in the manifest, grouped per uploaded file"""
+        files = {}
+        for chunk_id, doc in zip(ids, documents):
+            key = (doc.metadata[METADATA_USERNAME_KEY], doc.metadata[METADATA_FILENAME_KEY])
+            if key not in files:
+                files[key] = {'chunk_ids': [], 'metadata': doc.metadata}
+            files[key]['chunk_ids'].append(chunk_id)
+        
+        for (username, filename), entry in files.items():
+            self.manifest.record_file(
+                username,
+                filename,
+                entry['chunk_ids'],
+                upload_time=entry['metadata'].get(METADATA_UPLOAD_TIME_KEY),
+                content_hash=entry['metadata'].get(METADATA_CONTENT_HASH_KEY),
+                replace=replace
+            )
+            self.invalidate_answers(username, filename)
+    
+    def build_metadata_filter(self, filename_filter=None):
+        """Build a Pinecone metadata filter for the given filename.
+        
+        Users are separated by namespace, so there is no username condition.
+        """
+        metadata_filter = {}
+        if filename_filter:
+            metadata_filter[METADATA_FILENAME_KEY] = {"$eq": filename_filter}
+        return metadata_filter or None
+    
+    def get_retriever(self, filename_filter=None, username=None, k=None, hybrid=HYBRID_RETRIEVAL,
+                      rerank=RERANK_ENABLED):
+        """Get a retriever that queries the user's namespace, filtered by filename.
+        
+        With hybrid retrieval, the vector results are fused with the user's
+        BM25 keyword index so exact codes and identifiers are not missed.
+        With reranking, RERANK_CANDIDATES chunks are fetched and reranked
+        down to k, which defaults to RERANK_K instead of RETRIEVER_K.
+        """
+        try:
+            k = k or (RERANK_K if rerank else RETRIEVER_K)
+            fetch_k = max(k, RERANK_CANDIDATES) if rerank else k
+            use_hybrid = hybrid and username
+            dense_retriever = BackendRetriever(
+                backend=self.backend,
+                embeddings=self.embeddings,
+                k=max(fetch_k, HYBRID_CANDIDATES) if use_hybrid else fetch_k,
+                filter=self.build_metadata_filter(filename_filter),
+                namespace=self.get_namespace(username),
+                include_values=rerank
+            )
+            retriever = dense_retriever
+            if use_hybrid:
+                retriever = HybridRetriever(
+                    dense_retriever=dense_retriever,
+                    keyword_index=self.keyword_index,
+                    username=username,
+                    filename=filename_filter,
+                    k=fetch_k,
+                    candidates=max(fetch_k, HYBRID_CANDIDATES)
+                )
+            if not rerank:
+                return retriever
             
-            return vectorstore
+            return RerankingRetriever(base_retriever=retriever, reranker=self.reranker, k=k)
         except Exception as e:
-            raise Exception(f"Error getting vectorstore: {str(e)}")
+            raise Exception(f"Error getting retriever: {str(e)}")
     
+    @timed("vector_store.stats")
     def get_database_stats(self):
-        """Get database statistics"""
+        """Get database statistics.
+        
+        Per-user totals come from the manifest's stats table, which is kept
+        up to date on every upload and delete, so this does not scan the index.
+        """
         try:
-            index = self.pc.Index(PINECONE_INDEX)
-            stats = index.describe_index_stats()
-            
-            # Get user statistics by querying all documents
-            user_stats = {}
-            try:
-                # Query all documents to get user distribution
-                dummy_vector = [0.0] * PINECONE_DIMENSION
-                response = index.query(
-                    vector=dummy_vector,
-                    top_k=10000,
-                    include_metadata=True
-                )
-                
-                if 'matches' in response:
-                    for match in response['matches']:
-                        if 'metadata' in match and METADATA_USERNAME_KEY in match['metadata']:
-                            username = match['metadata'][METADATA_USERNAME_KEY]
-                            if username not in user_stats:
-                                user_stats[username] = 0
-                            user_stats[username] += 1
-            except Exception as e:
-                st.warning(f"Could not retrieve user statistics: {str(e)}")
+            stats = self.backend.describe_stats()
+            user_stats = self.manifest.get_user_stats()
+            namespaces = stats.get('namespaces', {})
+            for username, user in user_stats.items():
+                # The vector count of the user's namespace, when the backend reports it
+                user['vectors'] = namespaces.get(self.get_namespace(username), user['vectors'])
             
             return {
-                'total_vectors': stats.total_vector_count,
-                'total_dimension': stats.dimension,
-                'index_fullness': stats.index_fullness,
-                'user_stats': user_stats
+                'total_vectors': stats['total_vectors'],
+                'total_dimension': stats['dimension'],
+                'index_fullness': stats['index_fullness'],
+                'total_files': sum(user['files'] for user in user_stats.values()),
+                'total_bytes': sum(user['bytes'] for user in user_stats.values()),
+                'user_stats': user_stats,
+                'embedding_cache': self.embeddings.cache.get_stats(),
+                'answer_cache': self.answer_cache.get_stats() if self.answer_cache else None
             }
         except Exception as e:
             raise Exception(f"Error getting database stats: {str(e)}")
     
+    def get_file_stats(self, username, limit=ADMIN_FILES_PAGE_SIZE, offset=0):
+        """Get one page of a user's files with their chunk counts and sizes"""
+        try:
+            return self.manifest.get_file_stats(username, limit=limit, offset=offset)
+        except Exception as e:
+            raise Exception(f"Error getting file stats: {str(e)}")
+    
+    @timed("vector_store.clear")
     def clear_database(self):
-        """Clear all data from the Pinecone database"""
+        """Clear all data from the vector database"""
         try:
-            index = self.pc.Index(PINECONE_INDEX)
-            
-            # First, let's check what's actually in the index
-            print(f"Attempting to clear index: {PINECONE_INDEX}")
+            print(f"Attempting to clear the {type(self.backend).__name__} index")
             
             # Get index stats before deletion
-            stats_before = index.describe_index_stats()
-            print(f"Vectors before deletion: {stats_before.total_vector_count}")
+            vectors_before = self.backend.describe_stats()['total_vectors']
+            print(f"Vectors before deletion: {vectors_before}")
             
-            if stats_before.total_vector_count == 0:
+            if vectors_before == 0:
                 print("No vectors to delete")
-                return 0
-            
-            # Try the delete_all method first
-            try:
-                print("Attempting delete_all operation...")
-                index.delete(delete_all=True)
+            else:
+                print("Dropping every namespace...")
+                self.backend.delete_all()
                 print("delete_all operation completed")
-            except Exception as delete_error:
-                print(f"delete_all failed: {delete_error}")
-                
-                # Fallback: delete by querying all vectors
-                print("Falling back to manual deletion...")
-                dummy_vector = [0.0] * PINECONE_DIMENSION
-                
-                # Query all vectors
-                response = index.query(
-                    vector=dummy_vector,
-                    top_k=10000,
-                    include_metadata=True
-                )
-                
-                vector_ids = []
-                if 'matches' in response:
-                    for match in response['matches']:
-                        if 'id' in match:
-                            vector_ids.append(match['id'])
-                
-                print(f"Found {len(vector_ids)} vectors to delete")
-                
-                if vector_ids:
-                    # Delete in batches of 1000
-                    batch_size = 1000
-                    for i in range(0, len(vector_ids), batch_size):
-                        batch = vector_ids[i:i + batch_size]
-                        print(f"Deleting batch {i//batch_size + 1}: {len(batch)} vectors")
-                        index.delete(ids=batch)
+            
+            # The local stores are cleared even when the index reports no
+            # vectors, e.g. after a wiped data dir or while stats lag behind
+            self.manifest.clear()
+            self.bulk_writer.pop_checkpoints()
+            self.keyword_index.delete()
+            self.invalidate_answers()
+            
+            if vectors_before == 0:
+                return 0
             
             # Verify deletion
-            stats_after = index.describe_index_stats()
-            print(f"Vectors after deletion: {stats_after.total_vector_count}")
+            vectors_after = self.backend.describe_stats()['total_vectors']
+            print(f"Vectors after deletion: {vectors_after}")
             
-            return stats_before.total_vector_count - stats_after.total_vector_count
+            return vectors_before - vectors_after
             
         except Exception as e:
             print(f"Error in clear_database: {e}")
             raise Exception(f"Error clearing database: {str(e)}")
     
-    def delete_user_documents(self, username):
-        """Delete all documents for a specific user"""
+    @timed("vector_store.migrate")
+    def migrate_legacy_vectors(self):
+        """Move vectors stored before per-user namespaces into their users' namespaces.
+        
+        Earlier versions kept every user's vectors in the default namespace.
+        The manifest lists each file's chunk IDs, so they are fetched from
+        there in batches, upserted into the user's namespace and deleted from
+        the default one. Does nothing once the default namespace is empty, so
+        it is safe to run on every start. Returns the number of vectors moved.
+        """
         try:
-            index = self.pc.Index(PINECONE_INDEX)
-            
-            # Query to get all vectors for the user
-            dummy_vector = [0.0] * PINECONE_DIMENSION
-            response = index.query(
-                vector=dummy_vector,
-                top_k=10000,
-                include_metadata=True,
-                filter={METADATA_USERNAME_KEY: {"$eq": username}}
-            )
+            if not self.manifest.has_files():
+                return 0
+            if not self.backend.describe_stats().get('namespaces', {}).get("", 0):
+                return 0
             
-            # Extract vector IDs to delete
-            vector_ids = []
-            if 'matches' in response:
-                for match in response['matches']:
-                    if 'id' in match:
-                        vector_ids.append(match['id'])
+            moved = 0
+            for username in self.manifest.get_user_stats():
+                namespace = self.get_namespace(username)
+                for filename in self.manifest.list_files(username):
+                    chunk_ids = self.manifest.get_chunk_ids(username, filename)
+                    for i in range(0, len(chunk_ids), UPSERT_BATCH_SIZE):
+                        vectors = self.backend.fetch(chunk_ids[i:i + UPSERT_BATCH_SIZE])
+                        if not vectors:
+                            continue
+                        self.backend.upsert(vectors, namespace=namespace)
+                        self.backend.delete([vector['id'] for vector in vectors])
+                        moved += len(vectors)
             
-            # Delete the vectors
-            if vector_ids:
-                index.delete(ids=vector_ids)
+            if moved:
+                print(f"Moved {moved} vectors into per-user namespaces")
+            return moved
+        except Exception as e:
+            raise Exception(f"Error migrating vectors to namespaces: {str(e)}")
+    
+    @timed("vector_store.delete")
+    def delete_vectors(self, vector_ids, username=None):
+        """Delete vectors by ID in batches from the user's namespace"""
+        namespace = self.get_namespace(username)
+        for i in range(0, len(vector_ids), DELETE_BATCH_SIZE):
+            self.backend.delete(vector_ids[i:i + DELETE_BATCH_SIZE], namespace=namespace)
+        get_metrics().increment("vectors_deleted", len(vector_ids))
+    
+    @timed("vector_store.delete_user")
+    def delete_user_documents(self, username):
+        """Delete all documents for a specific user by dropping the user's namespace"""
+        try:
+            namespace = self.get_namespace(username)
+            namespaces = self.backend.describe_stats().get('namespaces', {})
+            vector_count = namespaces.get(namespace, 0)
+            # Dropping the namespace also removes chunks of interrupted ingests
+            self.backend.delete_namespace(namespace)
+            if namespaces.get("", 0):
+                # Chunks stored before per-user namespaces that were not migrated yet
+                self.delete_vectors(self.manifest.get_chunk_ids(username))
+            get_metrics().increment("vectors_deleted", vector_count)
+            self.bulk_writer.pop_checkpoints(self.get_checkpoint_key(username, ""))
+            self.manifest.delete_files(username)
+            self.keyword_index.delete(username)
+            self.invalidate_answers(username)
             
-            return len(vector_ids)
+            return vector_count
         except Exception as e:
             raise Exception(f"Error deleting user documents: {str(e)}")
-
-    def clear_cache(self):
-        """Clear the cached file list"""
-        self._cached_files = None
@@ -0,0 +1,65 @@
+"""Offline stand-ins for the OpenAI embedding and chat models."""
+import hashlib
+import time
+from typing import Any, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic bag-of-words vectors with a simulated per-request latency.
+
+    Texts sharing words get similar vectors, so retrieval results are
+    meaningful enough to exercise ranking and filtering.
+    """
+
+    def __init__(self, dimension: int = 1536, latency_seconds: float = 0.0):
+        self.dimension = dimension
+        self.latency_seconds = latency_seconds
+        self.model = "fake-embeddings"
+        self.calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in text.lower().split():
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimension] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self.latency_seconds)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that streams a fixed answer after a simulated first-token delay"""
+
+    answer: str = "This is a benchmark answer generated without calling a model."
+    first_token_seconds: float = 0.0
+    token_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.first_token_seconds + self.token_seconds * len(self.answer.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_seconds)
+        for word in self.answer.split(" "):
+            time.sleep(self.token_seconds)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
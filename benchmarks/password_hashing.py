@@ -0,0 +1,69 @@
+"""Measure login throughput against scrypt cost parameters.
+
+For each n (with the configured r and p) this times one hash, then runs
+concurrent logins through AuthManager with the given number of hashing
+workers, so PASSWORD_SCRYPT_N and PASSWORD_HASH_WORKERS can be sized for
+the hardware. Memory per in-flight hash is 128 * n * r bytes.
+
+    python -m benchmarks.password_hashing --logins 200 --clients 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.auth_manager import AuthManager  # noqa: E402
+from backend.config import PASSWORD_HASH_WORKERS, PASSWORD_SCRYPT_P, PASSWORD_SCRYPT_R  # noqa: E402
+
+
+def measure(workdir, n, r, p, workers, logins, clients):
+    auth_manager = AuthManager(
+        os.path.join(workdir, f"users-{n}-{workers}.db"),
+        scrypt_n=n, scrypt_r=r, scrypt_p=p, hash_workers=workers
+    )
+    auth_manager.register_user("benchmark", "benchmark@example.com", "benchmark-password")
+
+    start = time.perf_counter()
+    auth_manager.hash_password("benchmark-password")
+    hash_ms = (time.perf_counter() - start) * 1000
+
+    def login(_):
+        success, message, _ = auth_manager.login_user("benchmark", "benchmark-password")
+        assert success, message
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        start = time.perf_counter()
+        list(pool.map(login, range(logins)))
+        seconds = time.perf_counter() - start
+
+    return hash_ms, logins / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, nargs="+", default=[2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15],
+                        help="scrypt CPU/memory cost values to try")
+    parser.add_argument("-r", type=int, default=PASSWORD_SCRYPT_R, help="scrypt block size")
+    parser.add_argument("-p", type=int, default=PASSWORD_SCRYPT_P, help="scrypt parallelism")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, PASSWORD_HASH_WORKERS}),
+                        help="hashing pool sizes to try")
+    parser.add_argument("--logins", type=int, default=100, help="logins per measurement")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent login callers")
+    args = parser.parse_args()
+
+    print(f"{'n':>8} {'r':>3} {'p':>3} {'memory':>9} {'workers':>8} {'hash ms':>9} {'logins/s':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.n:
+            for workers in args.workers:
+                hash_ms, logins_per_second = measure(workdir, n, args.r, args.p, workers, args.logins, args.clients)
+                memory_mb = 128 * n * args.r / (1024 * 1024)
+                print(f"{n:>8} {args.r:>3} {args.p:>3} {memory_mb:>7.0f}MB {workers:>8} "
+                      f"{hash_ms:>9.1f} {logins_per_second:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
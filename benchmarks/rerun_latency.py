@@ -0,0 +1,83 @@
+"""Measure the client setup cost of one Streamlit rerun of the main page.
+
+"before" rebuilds the clients the way the interfaces did on every rerun
+(AuthManager, two VectorStoreManagers, QAChain, DocumentProcessor).
+"after" builds the same interfaces on top of the shared service container.
+
+Clients are constructed with placeholder API keys; no network calls are made.
+
+    python -m benchmarks.rerun_latency --reruns 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("PINECONE_API_KEY", "benchmark")
+os.environ.setdefault("PINECONE_INDEX", "benchmark")
+
+
+def rerun_before():
+    from backend.auth_manager import AuthManager
+    from backend.document_processor import DocumentProcessor
+    from backend.qa_chain import QAChain
+    from backend.session_manager import SessionManager
+    from backend.vector_store import VectorStoreManager
+
+    # AuthInterface
+    AuthManager()
+    SessionManager()
+    # ChatInterface
+    VectorStoreManager()
+    QAChain()
+    # UploadInterface
+    DocumentProcessor()
+    VectorStoreManager()
+
+
+def rerun_after():
+    from frontend.auth_interface import AuthInterface
+    from frontend.chat_interface import ChatInterface
+    from frontend.upload_interface import UploadInterface
+
+    AuthInterface()
+    ChatInterface()
+    UploadInterface()
+
+
+def measure(rerun, reruns):
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        rerun()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name, timings):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:>7}: first {timings[0]:8.2f} ms | median {statistics.median(timings):8.3f} ms | p95 {p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        # Warm imports so both modes only pay for client construction
+        import backend.services  # noqa: F401
+        import frontend.chat_interface  # noqa: F401
+
+        report("before", measure(rerun_before, args.reruns))
+        report("after", measure(rerun_after, args.reruns))
+
+
+if __name__ == "__main__":
+    main()
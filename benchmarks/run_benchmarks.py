@@ -0,0 +1,295 @@
+"""Offline benchmark of ingestion, retrieval and QA.
+
+Runs the real DocumentProcessor, IngestionPipeline, VectorStoreManager and
+QAChain against a synthetic PDF, with fake embedding and chat models and the
+local vector backend, so no API keys or network are needed. Results are
+printed and saved as JSON for comparison across commits.
+
+    python -m benchmarks.run_benchmarks --pages 200 --queries 200
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings  # noqa: E402
+from benchmarks.synthetic_pdf import WORDS, write_pdf  # noqa: E402
+
+QUESTIONS = [
+    "What does error code E-{page:04d}{line:02d} mean?",
+    "How do I reset the device firmware?",
+    "Which warranty clause covers sensor replacement?",
+    "What is the maintenance schedule for the network?",
+]
+
+
+def percentiles(samples_ms):
+    ordered = sorted(samples_ms)
+
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def bench_parse(processor, pdf_path, page_count):
+    from langchain_community.document_loaders import PyPDFLoader
+
+    content_hash = processor.compute_file_hash(pdf_path)
+    start = time.perf_counter()
+    pages = list(processor.iter_pages(pdf_path, content_hash))
+    parse_seconds = time.perf_counter() - start
+
+    # The second pass is served from the page cache
+    start = time.perf_counter()
+    list(processor.iter_pages(pdf_path, content_hash))
+    cached_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    PyPDFLoader(pdf_path).load()
+    baseline_seconds = time.perf_counter() - start
+
+    return pages, {
+        "pages": page_count,
+        "pages_per_s": page_count / parse_seconds,
+        "cached_pages_per_s": page_count / cached_seconds,
+        "pypdfloader_pages_per_s": page_count / baseline_seconds,
+    }
+
+
+def best_seconds(fn, runs=3):
+    """Fastest of a few runs, so one-off warm-up costs don't decide a comparison"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return result, best
+
+
+def bench_split(processor, pages):
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from backend.config import CHUNK_OVERLAP, CHUNK_TOKENS, METADATA_PAGE_KEY
+
+    # The previous per-page splitter, at about the same size in characters
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_TOKENS * 4, chunk_overlap=CHUNK_OVERLAP)
+    chars = sum(len(page.page_content) for page in pages)
+    chunks, seconds = best_seconds(lambda: list(processor.chunker.iter_chunks(pages)))
+    baseline_chunks, baseline_seconds = best_seconds(lambda: splitter.split_documents(pages))
+
+    # A page of text without separators, e.g. a base64 blob or a table dump
+    blob = [Document(page_content="A" * 200000, metadata={METADATA_PAGE_KEY: 0})]
+    _, blob_seconds = best_seconds(lambda: list(processor.chunker.iter_chunks(blob)))
+    _, blob_baseline_seconds = best_seconds(lambda: splitter.split_documents(blob))
+
+    return chunks, {
+        "chunks": len(chunks),
+        "chunks_per_s": len(chunks) / seconds,
+        "chars_per_s": chars / seconds,
+        "recursive_splitter_chunks": len(baseline_chunks),
+        "recursive_splitter_chunks_per_s": len(baseline_chunks) / baseline_seconds,
+        "recursive_splitter_chars_per_s": chars / baseline_seconds,
+        "unbroken_chars_per_s": 200000 / blob_seconds,
+        "recursive_splitter_unbroken_chars_per_s": 200000 / blob_baseline_seconds,
+    }
+
+
+def bench_embed_and_upsert(chunks, embeddings, workdir):
+    from backend.embedding_cache import CachedEmbeddings, EmbeddingCache
+    from backend.vector_backends.local_backend import LocalVectorBackend
+
+    texts = [chunk.page_content for chunk in chunks]
+    cached = CachedEmbeddings(embeddings, EmbeddingCache(os.path.join(workdir, "embed_bench.db")))
+
+    start = time.perf_counter()
+    vectors = cached.embed_documents(texts)
+    cold_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached.embed_documents(texts)
+    warm_seconds = time.perf_counter() - start
+
+    backend = LocalVectorBackend(os.path.join(workdir, "upsert_bench"), dimension=embeddings.dimension)
+    records = [
+        {"id": f"chunk-{i}", "values": vector, "metadata": {"username": "bench", "filename": "bench.pdf"}}
+        for i, vector in enumerate(vectors)
+    ]
+    start = time.perf_counter()
+    for i in range(0, len(records), 100):
+        backend.upsert(records[i:i + 100])
+    upsert_seconds = time.perf_counter() - start
+
+    return {
+        "embed_cold_chunks_per_s": len(texts) / cold_seconds,
+        "embed_cached_chunks_per_s": len(texts) / warm_seconds,
+        "upsert_vectors_per_s": len(records) / upsert_seconds,
+    }
+
+
+def bench_ingest(pipeline, pdf_path):
+    start = time.perf_counter()
+    progress = pipeline.run(pdf_path, "manual.pdf", "bench", 1)
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "chunks": progress["chunks"],
+        "chunks_per_s": progress["chunks"] / seconds,
+        "pages_per_s": progress["pages_total"] / seconds,
+    }
+
+
+def make_questions(count, page_count):
+    questions = []
+    for i in range(count):
+        template = QUESTIONS[i % len(QUESTIONS)]
+        questions.append(template.format(page=i % page_count, line=i % 60 + 1) + f" ({WORDS[i % len(WORDS)]})")
+    return questions
+
+
+def bench_retrieval(manager, questions):
+    retriever = manager.get_retriever(filename_filter="manual.pdf", username="bench")
+    timings = []
+    for question in questions:
+        start = time.perf_counter()
+        retriever.invoke(question)
+        timings.append((time.perf_counter() - start) * 1000)
+    return percentiles(timings)
+
+
+def bench_rerank(manager, page_count, count):
+    """Hit rate and context size of error-code questions with and without reranking"""
+    from backend.context_packer import ContextPacker
+
+    packer = ContextPacker()
+    codes = [(f"E-{i % page_count:04d}{i % 60 + 1:02d}", i) for i in range(count)]
+    results = {}
+    for hybrid in (False, True):
+        for rerank in (False, True):
+            retriever = manager.get_retriever(filename_filter="manual.pdf", username="bench",
+                                              hybrid=hybrid, rerank=rerank)
+            hits, tokens, timings = 0, 0, []
+            for code, i in codes:
+                question = f"What does error code {code} mean? ({WORDS[i % len(WORDS)]})"
+                start = time.perf_counter()
+                documents = retriever.invoke(question)
+                timings.append((time.perf_counter() - start) * 1000)
+                hits += any(code in doc.page_content for doc in documents)
+                tokens += sum(packer.count_tokens(doc.page_content) for doc in documents)
+            results[f"{'hybrid' if hybrid else 'dense'}{'_rerank' if rerank else ''}"] = {
+                "hit_rate": hits / len(codes),
+                "context_tokens": tokens / len(codes),
+                "p50_ms": percentiles(timings)["p50_ms"],
+            }
+    return results
+
+
+def bench_answers(qa_chain, manager, questions):
+    retriever = manager.get_retriever(filename_filter="manual.pdf", username="bench")
+    first_token = []
+    total = []
+    for question in questions:
+        start = time.perf_counter()
+        for event in qa_chain.stream_answer(question, retriever):
+            if event["type"] == "token" and len(first_token) < len(total) + 1:
+                first_token.append((time.perf_counter() - start) * 1000)
+        total.append((time.perf_counter() - start) * 1000)
+    return {"time_to_first_token": percentiles(first_token), "total": percentiles(total)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200, help="pages in the synthetic PDF")
+    parser.add_argument("--image-every", type=int, default=0,
+                        help="make every nth page an image-only page, like a scan")
+    parser.add_argument("--queries", type=int, default=200, help="questions for the latency runs")
+    parser.add_argument("--dimension", type=int, default=1536, help="embedding dimension")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="simulated latency per embedding request")
+    parser.add_argument("--llm-first-token-ms", type=float, default=0.0, help="simulated LLM time to first token")
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results"),
+                        help="directory for the JSON results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Manifest, caches and indexes use relative paths; keep them out of the repo
+        os.chdir(workdir)
+
+        from backend.document_processor import DocumentProcessor
+        from backend.embedding_cache import CachedEmbeddings, EmbeddingCache
+        from backend.ingestion import IngestionPipeline
+        from backend.qa_chain import QAChain
+        from backend.vector_backends.local_backend import LocalVectorBackend
+        from backend.vector_store import VectorStoreManager
+
+        pdf_path = write_pdf(os.path.join(workdir, "manual.pdf"), args.pages, image_every=args.image_every)
+        embeddings = FakeEmbeddings(args.dimension, args.embed_latency_ms / 1000)
+        processor = DocumentProcessor()
+        manager = VectorStoreManager(
+            backend=LocalVectorBackend(os.path.join(workdir, "vector_data"), dimension=args.dimension),
+            embeddings=CachedEmbeddings(embeddings, EmbeddingCache(os.path.join(workdir, "embeddings.db")))
+        )
+        qa_chain = QAChain(chat_model=FakeChatModel(first_token_seconds=args.llm_first_token_ms / 1000))
+        questions = make_questions(args.queries, args.pages)
+
+        results = {"config": vars(args)}
+        pages, results["parse"] = bench_parse(processor, pdf_path, args.pages)
+        chunks, results["split"] = bench_split(processor, pages)
+        results["embed_upsert"] = bench_embed_and_upsert(chunks, FakeEmbeddings(args.dimension, args.embed_latency_ms / 1000), workdir)
+        del pages, chunks
+        # Measure ingestion with a cold page cache
+        processor.extractor.cache.clear()
+        results["ingest"] = bench_ingest(IngestionPipeline(processor, manager), pdf_path)
+        results["retrieval"] = bench_retrieval(manager, questions)
+        results["rerank"] = bench_rerank(manager, args.pages, args.queries)
+        results["answer"] = bench_answers(qa_chain, manager, questions)
+        results["peak_rss_mb"] = peak_rss_mb()
+
+    results["meta"] = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+    print(json.dumps(results, indent=2))
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{datetime.now():%Y%m%d-%H%M%S}-{results['meta']['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {path}")
+
+
+if __name__ == "__main__":
+    main()
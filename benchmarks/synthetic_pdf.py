@@ -0,0 +1,68 @@
+"""Write text PDFs of configurable size without extra dependencies."""
+import random
+
+WORDS = (
+    "system warranty clause section device error code reset install configure "
+    "network policy user account report invoice payment schedule maintenance "
+    "safety manual procedure voltage sensor firmware update release note"
+).split()
+
+
+def _page_stream(page: int, lines: int, rng: random.Random) -> bytes:
+    rows = []
+    for line in range(lines):
+        words = " ".join(rng.choice(WORDS) for _ in range(10))
+        rows.append(f"(Page {page + 1} line {line + 1}: {words} ref E-{page:04d}{line:02d}.) '")
+    return ("BT /F1 9 Tf 36 806 Td 11 TL " + " ".join(rows) + " ET").encode("latin-1")
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 60, seed: int = 0, image_every: int = 0) -> str:
+    """Write a PDF with `pages` pages of Helvetica text and return its path.
+
+    With image_every=n, every nth page is a full-page image with no text,
+    like a scanned page.
+    """
+    rng = random.Random(seed)
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+
+    def add(number: int, body: bytes):
+        offsets[number] = len(out)
+        out.extend(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    page_objects = [4 + 2 * i for i in range(pages)]
+    add(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{number} 0 R" for number in page_objects)
+    add(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    add(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    image = 4 + 2 * pages
+    for page in range(pages):
+        if image_every and page % image_every == image_every - 1:
+            resources = f"<< /XObject << /Im1 {image} 0 R >> >>"
+            stream = b"q 612 0 0 842 0 0 cm /Im1 Do Q"
+        else:
+            resources = "<< /Font << /F1 3 0 R >> >>"
+            stream = _page_stream(page, lines_per_page, rng)
+        add(4 + 2 * page, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources {resources} /Contents {5 + 2 * page} 0 R >>"
+        ).encode())
+        add(5 + 2 * page, f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+    # A 64x64 grey scan shared by every image page
+    pixels = bytes(rng.randrange(256) for _ in range(64 * 64))
+    add(image, (
+        f"<< /Type /XObject /Subtype /Image /Width 64 /Height 64 /ColorSpace /DeviceGray "
+        f"/BitsPerComponent 8 /Length {len(pixels)} >>\nstream\n"
+    ).encode() + pixels + b"\nendstream")
+
+    xref = len(out)
+    total = 4 + 2 * pages
+    out.extend(f"xref\n0 {total + 1}\n0000000000 65535 f \n".encode())
+    for number in range(1, total + 1):
+        out.extend(f"{offsets[number]:010d} 00000 n \n".encode())
+    out.extend(f"trailer\n<< /Size {total + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
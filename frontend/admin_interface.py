@@ -1,13 +1,14 @@
 import streamlit as st
-from backend.auth_manager import AuthManager
-from backend.vector_store import VectorStoreManager
-from backend.qa_chain import QAChain
+from backend.config import ADMIN_FILES_PAGE_SIZE, ADMIN_USERS_PAGE_SIZE, METRICS_PORT
+from backend.metrics import get_metrics
+from backend.services import get_services
 
 class AdminInterface:
     def __init__(self):
-        self.auth_manager = AuthManager()
-        self.vector_store_manager = VectorStoreManager()
-        self.qa_chain = QAChain()
+        services = get_services()
+        self.auth_manager = services.auth_manager
+        self.vector_store_manager = services.vector_store_manager
+        self.session_store = services.session_store
     
     def render(self):
         """Render the admin interface"""
@@ -20,31 +21,49 @@ class AdminInterface:
             st.error("Access denied. Admin privileges required.")
             return
         
+        # Load the statistics once per render; every tab is rendered on each rerun
+        user_counts = self.auth_manager.get_user_counts()
+        try:
+            stats = self.vector_store_manager.get_database_stats()
+            stats_error = None
+        except Exception as e:
+            stats, stats_error = None, str(e)
+        
         # Admin tabs
-        tab1, tab2, tab3 = st.tabs(["User Management", "Database Management", "System Info"])
+        tab1, tab2, tab3, tab4 = st.tabs(["User Management", "Database Management", "System Info", "Metrics"])
         
         with tab1:
-            self.render_user_management()
+            self.render_user_management(user_counts)
         
         with tab2:
-            self.render_database_management()
+            if stats is None:
+                st.error(f"Error accessing database: {stats_error}")
+            else:
+                self.render_database_management(stats)
         
         with tab3:
-            self.render_system_info()
+            self.render_system_info(user_counts, stats, stats_error)
+        
+        with tab4:
+            self.render_metrics()
     
-    def render_user_management(self):
+    def render_user_management(self, user_counts):
         """Render user management section"""
         st.subheader("User Management")
         
-        # Get all users
-        users = self.auth_manager.get_all_users()
-        
-        if not users:
+        if not user_counts['total']:
             st.info("No users found.")
             return
         
+        # Load one page of users at a time
+        page_count = max(1, -(-user_counts['total'] // ADMIN_USERS_PAGE_SIZE))
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+        users = self.auth_manager.get_all_users(
+            limit=ADMIN_USERS_PAGE_SIZE, offset=(page - 1) * ADMIN_USERS_PAGE_SIZE
+        )
+        
         # Display users in a table
-        st.write("**Registered Users:**")
+        st.write(f"**Registered Users:** {user_counts['total']}")
         
         for user in users:
             with st.expander(f" {user['username']} ({user['email']})"):
@@ -65,6 +84,7 @@ class AdminInterface:
                         if st.button(f"Delete {user['username']}", key=f"delete_{user['id']}"):
                             success, message = self.auth_manager.delete_user(user['id'])
                             if success:
+                                self.session_store.revoke_user(user['id'])
                                 st.success(message)
                                 st.rerun()
                             else:
@@ -72,15 +92,12 @@ class AdminInterface:
                     else:
                         st.write("**Current User**")
     
-    def render_database_management(self):
+    def render_database_management(self, stats):
         """Render database management section"""
         st.subheader("Database Management")
         st.write("Manage the Pinecone vector database")
         
         try:
-            # Get database statistics
-            stats = self.vector_store_manager.get_database_stats()
-            
             # Display statistics
             col1, col2, col3 = st.columns(3)
             
@@ -93,10 +110,14 @@ class AdminInterface:
             with col3:
                 st.metric("Index Fullness", f"{stats['index_fullness']:.2%}")
             
-            # User statistics
+            # User statistics, with each user's files loaded one page at a time
             st.write("**Documents by User:**")
-            for username, count in stats['user_stats'].items():
-                st.write(f"- {username}: {count} documents")
+            for username, user_stats in stats['user_stats'].items():
+                with st.expander(
+                    f"{username}: {user_stats['files']} files, {user_stats['vectors']} chunks, "
+                    f"{user_stats['bytes'] / (1024 * 1024):.1f} MB"
+                ):
+                    self.render_file_stats(username, user_stats['files'])
             
             st.write("---")
             
@@ -141,6 +162,30 @@ class AdminInterface:
         except Exception as e:
             st.error(f"Error accessing database: {str(e)}")
     
+    def render_file_stats(self, username, file_count):
+        """Render one page of a user's files with their chunk counts and sizes"""
+        page_count = max(1, -(-file_count // ADMIN_FILES_PAGE_SIZE))
+        page = 1
+        if page_count > 1:
+            page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1,
+                                   step=1, key=f"files_page_{username}")
+        files = self.vector_store_manager.get_file_stats(
+            username, limit=ADMIN_FILES_PAGE_SIZE, offset=(page - 1) * ADMIN_FILES_PAGE_SIZE
+        )
+        st.dataframe(
+            [
+                {
+                    'File': file['filename'],
+                    'Chunks': file['vectors'],
+                    'Size (MB)': round(file['bytes'] / (1024 * 1024), 2),
+                    'Uploaded': file['upload_time']
+                }
+                for file in files
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+    
     def render_delete_dialog(self, stats):
         """Render the database deletion confirmation dialog"""
         # Create a modal-like dialog using columns and containers
@@ -220,19 +265,17 @@ class AdminInterface:
                             st.error(f"❌ Error clearing database: {str(e)}")
                             st.session_state.show_delete_dialog = False
     
-    def render_system_info(self):
+    def render_system_info(self, user_counts, stats, stats_error=None):
         """Render system information"""
         st.subheader("System Information")
         
-        # Get system stats
-        users = self.auth_manager.get_all_users()
-        admin_count = sum(1 for user in users if user['is_admin'])
-        regular_user_count = len(users) - admin_count
+        admin_count = user_counts['admins']
+        regular_user_count = user_counts['total'] - admin_count
         
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Total Users", len(users))
+            st.metric("Total Users", user_counts['total'])
         
         with col2:
             st.metric("Admin Users", admin_count)
@@ -251,11 +294,67 @@ class AdminInterface:
         """)
         
         # Database information
+        if stats is None:
+            st.warning(f"Could not retrieve database information: {stats_error}")
+            return
+        
         try:
-            stats = self.vector_store_manager.get_database_stats()
             st.write("**Database Information:**")
             st.write(f"- Total vectors: {stats['total_vectors']}")
+            st.write(f"- Files: {stats['total_files']} ({stats['total_bytes'] / (1024 * 1024):.1f} MB ingested)")
             st.write(f"- Vector dimension: {stats['total_dimension']}")
             st.write(f"- Index fullness: {stats['index_fullness']:.2%}")
+            
+            cache_stats = stats['embedding_cache']
+            st.write("**Embedding Cache:**")
+            st.write(f"- Cached vectors: {cache_stats['entries']} / {cache_stats['max_entries']}")
+            st.write(f"- Hits: {cache_stats['hits']}, misses: {cache_stats['misses']} ({cache_stats['hit_rate']:.1%} hit rate)")
+            
+            answer_stats = stats['answer_cache']
+            if answer_stats:
+                st.write("**Answer Cache:**")
+                st.write(f"- Cached answers: {answer_stats['entries']} / {answer_stats['max_entries']}")
+                st.write(f"- Hits: {answer_stats['hits']}, misses: {answer_stats['misses']} ({answer_stats['hit_rate']:.1%} hit rate)")
         except Exception as e:
             st.warning(f"Could not retrieve database information: {str(e)}")
+    
+    def render_metrics(self):
+        """Render rolling latency percentiles per backend stage and the counters"""
+        st.subheader("Metrics")
+        metrics = get_metrics()
+        
+        stage_stats = metrics.get_stage_stats()
+        if not stage_stats:
+            st.info("No timings recorded yet.")
+        else:
+            st.write("**Stage Latency (ms, most recent calls):**")
+            st.dataframe(
+                [
+                    {
+                        'Stage': stage['stage'],
+                        'Calls': stage['count'],
+                        'Mean': round(stage['mean_ms'], 1),
+                        'p50': round(stage['p50_ms'], 1),
+                        'p95': round(stage['p95_ms'], 1),
+                        'p99': round(stage['p99_ms'], 1)
+                    }
+                    for stage in stage_stats
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        counters = metrics.get_counters()
+        if counters:
+            st.write("**Counters:**")
+            for name, value in counters.items():
+                st.write(f"- {name.replace('_', ' ').capitalize()}: {value:,.0f}")
+        
+        if METRICS_PORT:
+            st.caption(f"Prometheus endpoint: http://<host>:{METRICS_PORT}/metrics")
+        st.download_button(
+            "⬇️ Download Prometheus Metrics",
+            data=metrics.render_prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain"
+        )
@@ -1,11 +1,11 @@
 import streamlit as st
 import time
-from backend.auth_manager import AuthManager
+from backend.services import get_services
 from backend.session_manager import SessionManager
 
 class AuthInterface:
     def __init__(self):
-        self.auth_manager = AuthManager()
+        self.auth_manager = get_services().auth_manager
         self.session_manager = SessionManager()
     
     def render_login(self):
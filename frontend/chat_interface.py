@@ -1,11 +1,13 @@
 import streamlit as st
-from backend.vector_store import VectorStoreManager
-from backend.qa_chain import QAChain
+from backend.config import METADATA_END_PAGE_KEY, METADATA_FILENAME_KEY, METADATA_PAGE_KEY
+from backend.qa_chain import ConversationMemory
+from backend.services import get_services
 
 class ChatInterface:
     def __init__(self):
-        self.vector_store_manager = VectorStoreManager()
-        self.qa_chain = QAChain()
+        services = get_services()
+        self.vector_store_manager = services.vector_store_manager
+        self.qa_chain = services.qa_chain
     
     def render(self):
         """Render the chat interface"""
@@ -24,6 +26,10 @@ class ChatInterface:
         if "chat_history" not in st.session_state:
             st.session_state.chat_history = []
         
+        # The model only sees a bounded window of turns about the selected document
+        if "conversation_memory" not in st.session_state:
+            st.session_state.conversation_memory = ConversationMemory()
+        
         # Initialize session state for current answer
         if "current_answer" not in st.session_state:
             st.session_state.current_answer = None
@@ -80,13 +86,12 @@ class ChatInterface:
             st.error(f"Error getting available files: {str(e)}")
             return
         
-        # Initialize vectorstore with file filter and user filter
+        # Initialize retriever with file filter and user filter
         try:
-            vectorstore = self.vector_store_manager.get_vectorstore(
+            retriever = self.vector_store_manager.get_retriever(
                 filename_filter=selected_file, 
                 username=username
             )
-            qa_chain = self.qa_chain.create_qa_chain(vectorstore)
             
             # Create a container for the input and button
             input_container = st.container()
@@ -112,13 +117,29 @@ class ChatInterface:
             
             # Process the question when the send button is clicked
             if send_button and question:
-                with st.spinner("Thinking..."):
-                    result = qa_chain({"question": question, "chat_history": st.session_state.chat_history})
-                    st.session_state.chat_history.append((question, result["answer"]))
-                    # Store current question and answer for display
-                    st.session_state.current_question = question
-                    st.session_state.current_answer = result["answer"]
-                    st.rerun()
+                st.write("---")
+                st.markdown(f"**Q:** {question}")
+                
+                events = self.qa_chain.stream_answer(
+                    question,
+                    retriever,
+                    st.session_state.conversation_memory.history(selected_file),
+                    username=username,
+                    filename=selected_file
+                )
+                with st.spinner("Searching documents..."):
+                    sources = next(events)["documents"]
+                
+                # Render tokens as they arrive
+                answer = st.write_stream(event["content"] for event in events)
+                
+                st.session_state.chat_history.append((question, answer))
+                st.session_state.conversation_memory.add(selected_file, question, answer)
+                # Store current question and answer for display
+                st.session_state.current_question = question
+                st.session_state.current_answer = answer
+                st.session_state.current_sources = sources
+                st.rerun()
             
             # Display only the current answer
             if st.session_state.current_answer:
@@ -127,6 +148,21 @@ class ChatInterface:
                 st.markdown(f"**Q:** {st.session_state.current_question}")
                 st.markdown(f"**A:** {st.session_state.current_answer}")
                 
+                sources = st.session_state.get("current_sources") or []
+                if sources:
+                    with st.expander(f"Sources ({len(sources)})"):
+                        for doc in sources:
+                            page = doc.metadata.get(METADATA_PAGE_KEY)
+                            end_page = doc.metadata.get(METADATA_END_PAGE_KEY, page)
+                            if isinstance(page, (int, float)) and isinstance(end_page, (int, float)) and end_page > page:
+                                location = f", pages {int(page) + 1}-{int(end_page) + 1}"
+                            elif isinstance(page, (int, float)):
+                                location = f", page {int(page) + 1}"
+                            else:
+                                location = ""
+                            st.markdown(f"**{doc.metadata.get(METADATA_FILENAME_KEY, 'Document')}{location}**")
+                            st.caption(doc.page_content[:300])
+                
                 # Show chat history expander only if there are more than one conversation
                 if len(st.session_state.chat_history) > 1:
                     with st.expander(f"View Chat History ({len(st.session_state.chat_history)} conversations)"):
@@ -4,6 +4,7 @@ from .upload_interface import UploadInterface
 from .auth_interface import AuthInterface
 from .admin_interface import AdminInterface
 from backend.config import *
+from backend.metrics import timed
 from backend.session_manager import SessionManager
 
 # Set page config at the very beginning - this must be the first Streamlit command
@@ -13,6 +14,7 @@ st.set_page_config(
     layout="wide"
 )
 
+@timed("ui.rerun")
 def main():
     # Initialize session manager
     session_manager = SessionManager()
@@ -22,7 +24,7 @@ def main():
         st.error("Please set your OPENAI_API_KEY in the .env file")
         return
     
-    if not PINECONE_API_KEY:
+    if VECTOR_BACKEND == "pinecone" and not PINECONE_API_KEY:
         st.error("Please set your PINECONE_API_KEY in the .env file")
         return
     
@@ -1,12 +1,13 @@
 import streamlit as st
-import os
-from backend.document_processor import DocumentProcessor
-from backend.vector_store import VectorStoreManager
+from datetime import datetime
+from backend.config import JOB_POLL_INTERVAL_SECONDS
+from backend.services import get_services
 
 class UploadInterface:
     def __init__(self):
-        self.document_processor = DocumentProcessor()
-        self.vector_store_manager = VectorStoreManager()
+        services = get_services()
+        self.document_processor = services.document_processor
+        self.job_queue = services.job_queue
     
     def render(self):
         """Render the upload interface"""
@@ -22,53 +23,72 @@ class UploadInterface:
         username = user_data.get("username", "")
         user_id = user_data.get("id", "")
         
+        # Uploads already handed to the queue in this session
+        if "submitted_uploads" not in st.session_state:
+            st.session_state.submitted_uploads = {}
+        
         # File uploader
         uploaded_file = st.file_uploader("Choose a PDF file", type="pdf", key="file_uploader")
         
         if uploaded_file is not None:
-            try:
-                # Validate file size
-                self.document_processor.validate_file_size(uploaded_file.size)
-                
-                # Save uploaded file temporarily
-                temp_file_path = f"temp_{uploaded_file.name}"
-                with open(temp_file_path, "wb") as f:
-                    f.write(uploaded_file.getvalue())
-                
+            # The uploader keeps its file across reruns, so submit each upload once
+            upload_key = getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+            
+            if upload_key not in st.session_state.submitted_uploads:
                 try:
-                    with st.spinner("Processing PDF..."):
-                        chunks = self.document_processor.process_pdf(
-                            temp_file_path, 
-                            uploaded_file.name, 
-                            username, 
-                            user_id
-                        )
+                    # Validate file size
+                    self.document_processor.validate_file_size(uploaded_file.size)
                     
-                    with st.spinner("Connecting..."):
-                        self.vector_store_manager.ensure_index_exists()
-                    
-                    with st.spinner("Storing file info..."):
-                        # Store the documents in the vector store
-                        self.vector_store_manager.store_documents(chunks)
-                        
-                        # Set a flag to indicate successful upload
-                        st.session_state.file_uploaded = True
-                        st.session_state.last_upload_time = st.session_state.get("last_upload_time", 0) + 1
-                        
-                        st.success(f"✅ Document '{uploaded_file.name}' uploaded successfully and is now ready for querying!")
-                        
-                        # Show a message to switch to the chat tab
-                        st.info("Switch to the 'Ask Questions' tab to start querying your document!")
+                    job_id = self.job_queue.submit(uploaded_file, uploaded_file.name, username, user_id)
+                    st.session_state.submitted_uploads[upload_key] = job_id
+                    st.info(f"📥 '{uploaded_file.name}' was queued for processing. You can keep using the app while it runs.")
                 
+                except ValueError as e:
+                    st.error(str(e))
                 except Exception as e:
                     st.error(f"An error occurred: {str(e)}")
-                
-                finally:
-                    # Clean up temporary file
-                    if os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
+        
+        self.render_jobs(username)
+    
+    @st.fragment(run_every=JOB_POLL_INTERVAL_SECONDS)
+    def render_jobs(self, username):
+        """Render the user's recent upload jobs, polling for status changes"""
+        jobs = self.job_queue.list_jobs(username)
+        if not jobs:
+            return
+        
+        st.write("**Recent Uploads:**")
+        
+        if "finished_jobs" not in st.session_state:
+            st.session_state.finished_jobs = set()
+        
+        for job in jobs:
+            progress = job['progress']
+            created = datetime.fromtimestamp(job['created_at']).strftime("%Y-%m-%d %H:%M")
             
-            except ValueError as e:
-                st.error(str(e))
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
+            with st.container(border=True):
+                st.write(f"**{job['filename']}** · {created}")
+                
+                if job['status'] == "succeeded":
+                    st.success(
+                        f"✅ Ready for querying · {progress.get('chunks', 0)} chunks "
+                        f"({progress.get('unchanged', 0)} unchanged, {progress.get('deleted', 0)} removed)"
+                    )
+                    # Let the chat tab pick up the new file on its next run
+                    if job['id'] not in st.session_state.finished_jobs:
+                        st.session_state.finished_jobs.add(job['id'])
+                        st.session_state.file_uploaded = True
+                elif job['status'] == "failed":
+                    st.error(f"❌ Failed after {job['attempts']} attempts: {job['error']}")
+                else:
+                    pages_total = max(progress.get('pages_total', 0), 1)
+                    st.progress(
+                        min(progress.get('pages_parsed', 0) / pages_total, 1.0),
+                        text=f"{job['stage'].capitalize()}..."
+                    )
+                    st.caption(
+                        f"Parsed {progress.get('pages_parsed', 0)}/{progress.get('pages_total', 0)} pages · "
+                        f"{progress.get('chunks', 0)} chunks · {progress.get('embedded', 0)} embedded · "
+                        f"{progress.get('upserted', 0)} stored"
+                        + (f" · attempt {job['attempts']}, last error: {job['error']}" if job['error'] else "")
+                    )
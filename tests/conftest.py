@@ -0,0 +1,49 @@
+"""Shared fixtures: every test runs in its own directory with the local backend and fake models."""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from benchmarks.fakes import FakeEmbeddings  # noqa: E402
+from benchmarks.synthetic_pdf import write_pdf  # noqa: E402
+
+DIMENSION = 64
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Manifest, caches and indexes use relative paths
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def manager(workdir):
+    from backend.embedding_cache import CachedEmbeddings, EmbeddingCache
+    from backend.vector_backends.local_backend import LocalVectorBackend
+    from backend.vector_store import VectorStoreManager
+
+    return VectorStoreManager(
+        backend=LocalVectorBackend(str(workdir / "vector_data"), dimension=DIMENSION),
+        embeddings=CachedEmbeddings(FakeEmbeddings(DIMENSION), EmbeddingCache(str(workdir / "embeddings.db")))
+    )
+
+
+@pytest.fixture
+def pipeline(manager):
+    from backend.document_processor import DocumentProcessor
+    from backend.ingestion import IngestionPipeline
+    from backend.pdf_extractor import PdfExtractor
+
+    return IngestionPipeline(DocumentProcessor(extractor=PdfExtractor(workers=1)), manager)
+
+
+@pytest.fixture
+def make_pdf(workdir):
+    def make(name, pages=4, seed=0):
+        return write_pdf(str(workdir / name), pages, lines_per_page=20, seed=seed)
+    return make
@@ -0,0 +1,69 @@
+from langchain_core.documents import Document
+
+from backend.chunker import PAGE_SEPARATOR, TokenChunker
+from backend.config import METADATA_END_PAGE_KEY, METADATA_PAGE_KEY, METADATA_START_INDEX_KEY
+
+
+def make_pages(count):
+    pages = []
+    for page in range(count):
+        lines = [f"Section {page}.{line}: the sensor {line} reports error E-{page:04d}{line:02d}." for line in range(12)]
+        text = "\n".join(lines[:6]) + "\n\n" + " ".join(lines[6:])
+        pages.append(Document(page_content=text, metadata={METADATA_PAGE_KEY: page}))
+    return pages
+
+
+def page_offsets(pages):
+    offsets, position = [], 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page.page_content) + len(PAGE_SEPARATOR)
+    return offsets
+
+
+def test_chunk_offsets_point_at_their_text():
+    pages = make_pages(6)
+    text = "".join(page.page_content + PAGE_SEPARATOR for page in pages)
+    offsets = page_offsets(pages)
+    chunker = TokenChunker(chunk_tokens=40, overlap_tokens=10)
+
+    chunks = list(chunker.iter_chunks(iter(pages)))
+
+    assert len(chunks) > len(pages)
+    for chunk in chunks:
+        start = offsets[chunk.metadata[METADATA_PAGE_KEY]] + chunk.metadata[METADATA_START_INDEX_KEY]
+        end = start + len(chunk.page_content)
+        assert text[start:end] == chunk.page_content
+        last_page = max(page for page, offset in enumerate(offsets) if offset < end)
+        assert chunk.metadata[METADATA_END_PAGE_KEY] == last_page
+
+
+def test_chunks_stay_within_budget_and_leave_no_gaps():
+    pages = make_pages(4)
+    text = "".join(page.page_content + PAGE_SEPARATOR for page in pages)
+    offsets = page_offsets(pages)
+    chunker = TokenChunker(chunk_tokens=40, overlap_tokens=20)
+
+    chunks = list(chunker.iter_chunks(iter(pages)))
+
+    assert all(chunker._count_many([chunk.page_content])[0] <= 40 for chunk in chunks)
+    starts = [offsets[chunk.metadata[METADATA_PAGE_KEY]] + chunk.metadata[METADATA_START_INDEX_KEY] for chunk in chunks]
+    overlapping = 0
+    for start, previous_start, previous in zip(starts[1:], starts, chunks):
+        previous_end = previous_start + len(previous.page_content)
+        # A chunk starts inside the previous one, or right after it
+        assert previous_start < start and not text[previous_end:start].strip()
+        overlapping += start < previous_end
+    assert overlapping
+
+
+def test_text_without_separators_is_cut_into_pieces():
+    blob = "A" * 5000
+    chunker = TokenChunker(chunk_tokens=40, overlap_tokens=0)
+
+    chunks = list(chunker.iter_chunks([Document(page_content=blob, metadata={METADATA_PAGE_KEY: 0})]))
+
+    assert "".join(chunk.page_content for chunk in chunks) == blob
+    assert [chunk.metadata[METADATA_START_INDEX_KEY] for chunk in chunks] == [
+        sum(len(chunk.page_content) for chunk in chunks[:i]) for i in range(len(chunks))
+    ]
@@ -0,0 +1,56 @@
+from langchain_core.documents import Document
+
+from backend.chunker import PAGE_SEPARATOR, TokenChunker
+from backend.config import (METADATA_END_PAGE_KEY, METADATA_FILENAME_KEY, METADATA_PAGE_KEY,
+                            METADATA_START_INDEX_KEY)
+from backend.context_packer import ContextPacker
+
+
+def make_pages(count, filename="manual.pdf"):
+    return [
+        Document(
+            page_content=" ".join(f"Page {page} step {line}: tighten bolt {page}-{line} firmly." for line in range(8)),
+            metadata={METADATA_FILENAME_KEY: filename, METADATA_PAGE_KEY: page}
+        )
+        for page in range(count)
+    ]
+
+
+def test_neighbours_across_a_page_break_merge_into_one_span():
+    pages = make_pages(3)
+    text = "".join(page.page_content + PAGE_SEPARATOR for page in pages)
+    chunks = list(TokenChunker(chunk_tokens=60, overlap_tokens=30).iter_chunks(iter(pages)))
+    index = next(
+        i for i, (chunk, following) in enumerate(zip(chunks, chunks[1:]))
+        if following.metadata[METADATA_PAGE_KEY] != chunk.metadata[METADATA_PAGE_KEY]
+        and following.page_content[:30] in chunk.page_content
+    )
+    first, second = chunks[index], chunks[index + 1]
+
+    spans = ContextPacker().merge_spans([second, first])
+
+    assert len(spans) == 1
+    span = spans[0]
+    start = text.index(first.page_content)
+    assert span.page_content == text[start:start + len(span.page_content)]
+    assert span.page_content.endswith(second.page_content)
+    assert span.metadata[METADATA_PAGE_KEY] == first.metadata[METADATA_PAGE_KEY]
+    assert span.metadata[METADATA_START_INDEX_KEY] == first.metadata[METADATA_START_INDEX_KEY]
+    assert span.metadata[METADATA_END_PAGE_KEY] == second.metadata[METADATA_END_PAGE_KEY]
+
+
+def test_other_files_and_distant_pages_are_not_merged():
+    text = "Replace the sensor filter every six months and log the date."
+    documents = [
+        Document(page_content=text, metadata={METADATA_FILENAME_KEY: "a.pdf", METADATA_PAGE_KEY: 0}),
+        Document(page_content=text, metadata={METADATA_FILENAME_KEY: "b.pdf", METADATA_PAGE_KEY: 0}),
+        Document(page_content=text, metadata={METADATA_FILENAME_KEY: "a.pdf", METADATA_PAGE_KEY: 9}),
+        Document(page_content=text, metadata={METADATA_FILENAME_KEY: "a.pdf", METADATA_PAGE_KEY: 1}),
+    ]
+
+    spans = ContextPacker().merge_spans(documents)
+
+    assert [(span.metadata[METADATA_FILENAME_KEY], span.metadata[METADATA_PAGE_KEY]) for span in spans] == [
+        ("a.pdf", 0), ("b.pdf", 0), ("a.pdf", 9)
+    ]
+    assert spans[0].metadata[METADATA_END_PAGE_KEY] == 1
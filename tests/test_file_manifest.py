@@ -0,0 +1,54 @@
+import sqlite3
+
+from backend.file_manifest import FileManifest
+
+
+def test_stats_follow_uploads_and_deletes(workdir):
+    manifest = FileManifest()
+
+    manifest.record_file("alice", "a.pdf", ["a1", "a2"], size_bytes=100)
+    manifest.record_file("alice", "b.pdf", ["b1"], size_bytes=50)
+    manifest.record_file("bob", "c.pdf", ["c1", "c2", "c3"], size_bytes=10)
+    assert manifest.get_user_stats() == {
+        "alice": {"files": 2, "vectors": 3, "bytes": 150},
+        "bob": {"files": 1, "vectors": 3, "bytes": 10},
+    }
+
+    # Appending and replacing chunks update the counts; size_bytes keeps its value when not given
+    manifest.record_file("alice", "a.pdf", ["a2", "a3"])
+    assert manifest.get_user_stats()["alice"] == {"files": 2, "vectors": 4, "bytes": 150}
+    manifest.record_file("alice", "a.pdf", ["a4"], replace=True, size_bytes=70)
+    assert manifest.get_user_stats()["alice"] == {"files": 2, "vectors": 2, "bytes": 120}
+
+    assert manifest.delete_files("alice", "b.pdf") == 1
+    assert manifest.get_user_stats()["alice"] == {"files": 1, "vectors": 1, "bytes": 70}
+    # A user's row goes away with their last file
+    manifest.delete_files("bob")
+    assert "bob" not in manifest.get_user_stats()
+
+
+def test_stats_are_backfilled_for_older_manifests(workdir):
+    conn = sqlite3.connect("manifest.db")
+    conn.execute('''
+        CREATE TABLE files (
+            username TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            chunk_ids TEXT NOT NULL,
+            chunk_count INTEGER NOT NULL,
+            upload_time TEXT,
+            content_hash TEXT,
+            PRIMARY KEY (username, filename)
+        )
+    ''')
+    conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?, NULL, NULL)", [
+        ("alice", "a.pdf", '["a1", "a2"]', 2),
+        ("alice", "b.pdf", '["b1"]', 1),
+    ])
+    conn.commit()
+    conn.close()
+
+    manifest = FileManifest()
+
+    assert manifest.get_user_stats() == {"alice": {"files": 2, "vectors": 3, "bytes": 0}}
+    manifest.record_file("alice", "c.pdf", ["c1"], size_bytes=5)
+    assert manifest.get_user_stats() == {"alice": {"files": 3, "vectors": 4, "bytes": 5}}
@@ -0,0 +1,77 @@
+import pytest
+
+from backend.job_queue import IngestionJobQueue
+from tests.test_job_queue import wait_for
+
+
+def namespace_vectors(manager, username):
+    return manager.backend.describe_stats()['namespaces'].get(manager.get_namespace(username), 0)
+
+
+def ingest(pipeline, path, filename="doc.pdf", username="alice"):
+    return pipeline.run(path, filename, username, 1)
+
+
+def test_reupload_embeds_only_changed_chunks(pipeline, manager, make_pdf):
+    first = ingest(pipeline, make_pdf("v0.pdf", pages=4, seed=0))
+    again = ingest(pipeline, make_pdf("v0.pdf", pages=4, seed=0))
+
+    assert first['embedded'] == first['chunks'] > 0
+    assert again['embedded'] == 0 and again['unchanged'] == again['chunks']
+    assert namespace_vectors(manager, "alice") == first['chunks']
+
+
+def test_reupload_deletes_vanished_chunks(pipeline, manager, make_pdf):
+    ingest(pipeline, make_pdf("v0.pdf", pages=4, seed=0))
+    second = ingest(pipeline, make_pdf("v1.pdf", pages=3, seed=1))
+
+    stored = manager.manifest.get_file("alice", "doc.pdf")
+    assert second['deleted'] > 0
+    assert len(stored['chunk_ids']) == second['chunks']
+    assert namespace_vectors(manager, "alice") == second['chunks']
+
+
+def test_concurrent_reuploads_leave_no_orphans(pipeline, manager, make_pdf):
+    ingest(pipeline, make_pdf("v0.pdf", seed=0))
+    queue = IngestionJobQueue(pipeline, workers=2)
+    job_ids = []
+    for name, seed in (("v1.pdf", 1), ("v2.pdf", 2)):
+        with open(make_pdf(name, seed=seed), "rb") as source:
+            job_ids.append(queue.submit(source, "doc.pdf", "alice", 1))
+
+    jobs = wait_for(queue, job_ids, timeout=60)
+
+    assert [job['status'] for job in jobs] == ['succeeded', 'succeeded']
+    stored = manager.manifest.get_file("alice", "doc.pdf")
+    assert stored['content_hash'] == pipeline.document_processor.compute_file_hash(make_pdf("v2.pdf", seed=2))
+    assert namespace_vectors(manager, "alice") == len(stored['chunk_ids'])
+    assert manager.bulk_writer.get_checkpoint(manager.get_checkpoint_key("alice", "doc.pdf")) == set()
+
+
+def test_failed_ingest_resumes_from_checkpoint(pipeline, manager, make_pdf, monkeypatch):
+    monkeypatch.setattr("backend.ingestion.EMBED_BATCH_SIZE", 4)
+    manager.bulk_writer.max_retries = 0
+    upsert = manager.backend.upsert
+    calls = []
+
+    def flaky_upsert(vectors, namespace=None):
+        calls.append(len(vectors))
+        if len(calls) == 3:
+            raise ConnectionError("index unavailable")
+        upsert(vectors, namespace=namespace)
+
+    monkeypatch.setattr(manager.backend, "upsert", flaky_upsert)
+    path = make_pdf("v0.pdf", pages=8)
+    with pytest.raises(Exception, match="index unavailable"):
+        ingest(pipeline, path)
+
+    checkpoint_key = manager.get_checkpoint_key("alice", "doc.pdf")
+    written = manager.bulk_writer.get_checkpoint(checkpoint_key)
+    assert written and namespace_vectors(manager, "alice") == len(written)
+
+    monkeypatch.setattr(manager.backend, "upsert", upsert)
+    resumed = ingest(pipeline, path)
+
+    assert resumed['embedded'] == resumed['chunks'] - len(written)
+    assert namespace_vectors(manager, "alice") == resumed['chunks']
+    assert manager.bulk_writer.get_checkpoint(checkpoint_key) == set()
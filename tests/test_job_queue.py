@@ -0,0 +1,115 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from backend.job_queue import IngestionJobQueue
+
+
+class RecordingPipeline:
+    """Pipeline stand-in that records how many runs overlap per file"""
+
+    def __init__(self, seconds=0.05, fail_first=0):
+        self.seconds = seconds
+        self.fail_first = fail_first
+        self.lock = threading.Lock()
+        self.running = {}
+        self.max_running = {}
+        self.runs = []
+
+    def run(self, file_path, filename, username, user_id, progress_callback=None):
+        key = (username, filename)
+        with self.lock:
+            self.running[key] = self.running.get(key, 0) + 1
+            self.max_running[key] = max(self.max_running.get(key, 0), self.running[key])
+            self.runs.append((key, file_path))
+            failing = self.fail_first > 0
+            self.fail_first -= 1
+        time.sleep(self.seconds)
+        with self.lock:
+            self.running[key] -= 1
+        if failing:
+            raise RuntimeError("temporary failure")
+        return {'stage': 'done'}
+
+
+def wait_for(queue, job_ids, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        jobs = [queue.get_job(job_id) for job_id in job_ids]
+        if all(job['status'] in ('succeeded', 'failed') for job in jobs):
+            return jobs
+        time.sleep(0.01)
+    pytest.fail("jobs did not finish")
+
+
+def submit(queue, filename, username="alice"):
+    with open(__file__, "rb") as source:
+        return queue.submit(source, filename, username, 1)
+
+
+def test_jobs_for_one_file_run_one_at_a_time_in_order(workdir):
+    pipeline = RecordingPipeline()
+    queue = IngestionJobQueue(pipeline, workers=4)
+    job_ids = [submit(queue, "doc.pdf") for _ in range(3)]
+
+    jobs = wait_for(queue, job_ids)
+
+    assert [job['status'] for job in jobs] == ['succeeded'] * 3
+    assert pipeline.max_running[("alice", "doc.pdf")] == 1
+    assert [file_path for _, file_path in pipeline.runs] == [job['file_path'] for job in jobs]
+
+
+def test_jobs_for_different_files_run_concurrently(workdir):
+    pipeline = RecordingPipeline(seconds=0.2)
+    queue = IngestionJobQueue(pipeline, workers=2)
+    job_ids = [submit(queue, "a.pdf"), submit(queue, "b.pdf")]
+
+    start = time.time()
+    wait_for(queue, job_ids)
+
+    assert time.time() - start < 0.35
+
+
+def test_retried_job_keeps_its_turn(workdir, monkeypatch):
+    monkeypatch.setattr("backend.job_queue.INGEST_RETRY_BACKOFF_SECONDS", 0.01)
+    pipeline = RecordingPipeline(fail_first=1)
+    queue = IngestionJobQueue(pipeline, workers=2)
+    job_ids = [submit(queue, "doc.pdf"), submit(queue, "doc.pdf")]
+
+    first, second = wait_for(queue, job_ids)
+
+    assert first['attempts'] == 2 and first['status'] == 'succeeded'
+    assert second['status'] == 'succeeded'
+    assert pipeline.max_running[("alice", "doc.pdf")] == 1
+    assert [file_path for _, file_path in pipeline.runs] == [first['file_path']] * 2 + [second['file_path']]
+
+
+def test_stalled_running_job_does_not_block_the_file(workdir):
+    pipeline = RecordingPipeline()
+    queue = IngestionJobQueue(pipeline, workers=2)
+    stalled = submit(queue, "doc.pdf")
+    wait_for(queue, [stalled])
+    # As if its worker died mid-run long ago
+    conn = sqlite3.connect(queue.db_path)
+    conn.execute("UPDATE jobs SET status = 'running', updated_at = 0 WHERE id = ?", (stalled,))
+    conn.commit()
+    conn.close()
+
+    assert wait_for(queue, [submit(queue, "doc.pdf")])[0]['status'] == 'succeeded'
+
+
+def test_backoff_does_not_hold_a_worker(workdir, monkeypatch):
+    monkeypatch.setattr("backend.job_queue.INGEST_RETRY_BACKOFF_SECONDS", 0.5)
+    pipeline = RecordingPipeline(seconds=0.01, fail_first=1)
+    queue = IngestionJobQueue(pipeline, workers=1)
+    retried = submit(queue, "a.pdf")
+    while queue.get_job(retried)['stage'] != 'retrying':
+        time.sleep(0.01)
+
+    other = wait_for(queue, [submit(queue, "b.pdf", username="bob")])[0]
+
+    assert queue.get_job(retried)['status'] == 'queued'
+    assert wait_for(queue, [retried])[0]['updated_at'] > other['updated_at']
+    assert queue.get_job(retried)['status'] == 'succeeded'
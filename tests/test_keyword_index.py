@@ -0,0 +1,64 @@
+import sqlite3
+
+from langchain_core.documents import Document
+
+from backend.config import METADATA_CHUNK_ID_KEY, METADATA_FILENAME_KEY, METADATA_USERNAME_KEY
+from backend.keyword_index import KeywordIndex, reciprocal_rank_fusion
+
+
+def chunk(chunk_id, text, filename="doc.pdf", username="alice"):
+    return Document(page_content=text, metadata={
+        METADATA_CHUNK_ID_KEY: chunk_id, METADATA_FILENAME_KEY: filename, METADATA_USERNAME_KEY: username
+    })
+
+
+def build(index, chunks, batch_size=2):
+    builder = index.builder("alice", "doc.pdf")
+    for i in range(0, len(chunks), batch_size):
+        builder.add_documents(chunks[i:i + batch_size])
+    return builder
+
+
+def test_search_ranks_exact_codes_across_batches(workdir):
+    index = KeywordIndex()
+    chunks = [chunk(f"c{i}", f"general maintenance text number {i}") for i in range(5)]
+    chunks.append(chunk("code", "error E-0042 means the sensor failed"))
+    index.save(build(index, chunks))
+
+    results = index.search("What does E-0042 mean?", "alice")
+
+    assert results[0].id == "code"
+    assert results[0].page_content == "error E-0042 means the sensor failed"
+    assert results[0].metadata[METADATA_FILENAME_KEY] == "doc.pdf"
+
+
+def test_previous_build_serves_until_save_and_is_then_dropped(workdir):
+    index = KeywordIndex()
+    index.save(build(index, [chunk("old", "firmware reset procedure")]))
+    builder = build(index, [chunk("new", "firmware update procedure")])
+
+    assert [doc.id for doc in index.search("firmware", "alice")] == ["old"]
+    index.save(builder)
+    assert [doc.id for doc in index.search("firmware", "alice")] == ["new"]
+    conn = sqlite3.connect("keyword_index.db")
+    assert conn.execute("SELECT COUNT(*) FROM keyword_builds").fetchone()[0] == 1
+
+
+def test_discarded_build_leaves_no_rows(workdir):
+    index = KeywordIndex()
+    index.discard(build(index, [chunk("a", "network policy"), chunk("b", "voltage sensor")]))
+
+    conn = sqlite3.connect("keyword_index.db")
+    for table in ("keyword_builds", "keyword_chunks", "keyword_postings"):
+        assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+    assert index.search("network", "alice") == []
+
+
+def test_fusion_favours_documents_in_both_lists_and_keeps_the_first_copy():
+    dense = [Document(id="a", page_content="a", metadata={"from": "dense"}), chunk("b", "b"), chunk("c", "c")]
+    keyword = [chunk("c", "c"), Document(page_content="a", metadata={METADATA_CHUNK_ID_KEY: "a"}), chunk("d", "d")]
+
+    fused = reciprocal_rank_fusion((dense, keyword), 3)
+
+    assert [doc.page_content for doc in fused] == ["a", "c", "b"]
+    assert fused[0].metadata == {"from": "dense"}
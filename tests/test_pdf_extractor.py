@@ -0,0 +1,45 @@
+from pypdf import PdfReader
+
+from backend.pdf_extractor import PageTextCache, PdfExtractor, extract_pages
+
+
+def expected_pages(path):
+    return [text or "" for text in extract_pages(PdfReader(path), 0, len(PdfReader(path).pages))]
+
+
+def test_parallel_extraction_matches_serial_and_fills_the_cache(workdir, make_pdf):
+    path = make_pdf("manual.pdf", pages=6)
+    cache = PageTextCache()
+    extractor = PdfExtractor(cache=cache, workers=2, pages_per_task=2)
+
+    assert [text for _, text in extractor.iter_pages(path, "hash")] == expected_pages(path)
+    assert cache.get_page_numbers("hash") == set(range(6))
+
+
+def test_partly_cached_file_reads_cached_blocks_and_parses_the_rest(workdir, make_pdf):
+    path = make_pdf("manual.pdf", pages=6)
+    cache = PageTextCache()
+    pages = expected_pages(path)
+    cache.put_pages("hash", 0, ["cached 0", "cached 1"])
+    extractor = PdfExtractor(cache=cache, workers=1, pages_per_task=4)
+
+    texts = [text for _, text in extractor.iter_pages(path, "hash")]
+
+    assert texts == ["cached 0", "cached 1"] + pages[2:]
+
+
+def test_pages_evicted_after_planning_are_parsed_again(workdir, make_pdf, monkeypatch):
+    path = make_pdf("manual.pdf", pages=4)
+    cache = PageTextCache()
+    cache.put_pages("hash", 0, ["cached"] * 4)
+    extractor = PdfExtractor(cache=cache, workers=1)
+    get_page_numbers = cache.get_page_numbers
+
+    def evict_after_listing(*args):
+        numbers = get_page_numbers(*args)
+        cache.clear()
+        return numbers
+
+    monkeypatch.setattr(cache, "get_page_numbers", evict_after_listing)
+
+    assert [text for _, text in extractor.iter_pages(path, "hash")] == expected_pages(path)
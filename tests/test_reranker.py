@@ -0,0 +1,31 @@
+from backend.config import RERANK_VECTOR_KEY
+from backend.reranker import LexicalScorer, Reranker
+from langchain_core.documents import Document
+
+
+def test_rerank_uses_stored_vectors_without_embedding(manager, pipeline, make_pdf):
+    pipeline.run(make_pdf("manual.pdf", pages=6), "manual.pdf", "alice", 1)
+
+    def fail(texts):
+        raise AssertionError(f"embedded {len(texts)} candidates while reranking")
+
+    manager.embeddings.embed_documents = fail
+    for hybrid in (False, True):
+        retriever = manager.get_retriever(filename_filter="manual.pdf", username="alice", hybrid=hybrid, rerank=True)
+        documents = retriever.invoke("What does error code E-000301 mean?")
+
+        assert documents
+        assert all(RERANK_VECTOR_KEY not in doc.metadata for doc in documents)
+
+
+def test_mmr_skips_duplicates_and_keeps_candidates_without_vectors():
+    documents = [Document(id=str(i), page_content=text) for i, text in enumerate((
+        "reset the sensor firmware", "reset the sensor firmware", "reset the sensor firmware now", "reset the sensor"
+    ))]
+    vectors = [[1.0, 0.0], [1.0, 0.0], None, [0.0, 1.0]]
+    reranker = Reranker(LexicalScorer(), retriever_weight=0.5, mmr_lambda=0.5)
+
+    picked = [doc.id for doc in reranker.rerank("reset sensor firmware", documents, 3, vectors)]
+
+    # The second copy of the first chunk loses to the chunks that add something new
+    assert sorted(picked) == ["0", "2", "3"]
@@ -0,0 +1,64 @@
+import pytest
+
+from backend.config import SESSION_CACHE_SECONDS
+from backend.session_store import SessionStore
+
+USER = {"id": 7, "username": "alice", "is_admin": False}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("backend.session_store.time.time", lambda: now[0])
+    return now
+
+
+def test_session_slides_with_activity_and_expires_when_idle(workdir, clock):
+    store = SessionStore(secret="test", timeout=600)
+    token = store.create(USER)
+
+    clock[0] += 500
+    assert store.validate(token) == USER
+    # The validation above extended the session past its original expiry
+    clock[0] += 500
+    assert store.validate(token) == USER
+
+    clock[0] += 601
+    assert store.validate(token) is None
+    assert SessionStore(secret="test", timeout=600).validate(token) is None
+
+
+def test_tampered_tokens_are_rejected(workdir, clock):
+    store = SessionStore(secret="test")
+    token = store.create(USER)
+    session_id, _, signature = token.partition(".")
+
+    assert store.validate(f"{session_id}.{'0' * len(signature)}") is None
+    assert store.validate(session_id) is None
+    assert SessionStore(secret="other").validate(token) is None
+
+
+def test_revoked_sessions_are_rejected_on_every_replica(workdir, clock):
+    first, second = SessionStore(secret="test"), SessionStore(secret="test")
+    token, other = first.create(USER), first.create(USER)
+    assert second.validate(token) == USER
+
+    first.revoke(token)
+    assert first.validate(token) is None
+    # The other replica notices once its cached entry is older than SESSION_CACHE_SECONDS
+    clock[0] += SESSION_CACHE_SECONDS + 1
+    assert second.validate(token) is None
+
+    first.revoke_user(USER["id"])
+    assert first.validate(other) is None
+
+
+def test_sweep_deletes_expired_sessions(workdir, clock):
+    store = SessionStore(secret="test", timeout=600)
+    store.create(USER)
+    clock[0] += 300
+    live = store.create(USER)
+
+    clock[0] += 400
+    assert store.sweep() == 1
+    assert store.validate(live) == USER
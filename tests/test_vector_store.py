@@ -0,0 +1,59 @@
+from langchain_core.documents import Document
+
+from backend.config import METADATA_CHUNK_ID_KEY, METADATA_FILENAME_KEY, METADATA_USERNAME_KEY
+
+
+def store_legacy(manager, username, filename, count):
+    """Store chunks the way versions before per-user namespaces did"""
+    documents = [
+        Document(page_content=f"{filename} chunk {i} about firmware", metadata={
+            METADATA_CHUNK_ID_KEY: f"{username}-{filename}-{i}",
+            METADATA_FILENAME_KEY: filename,
+            METADATA_USERNAME_KEY: username,
+        })
+        for i in range(count)
+    ]
+    vectors = manager.embeddings.embed_documents([doc.page_content for doc in documents])
+    manager.backend.upsert(manager.build_records(documents, vectors))
+    manager.record_documents([doc.metadata[METADATA_CHUNK_ID_KEY] for doc in documents], documents)
+
+
+def namespaces(manager):
+    return manager.backend.describe_stats()['namespaces']
+
+
+def test_migration_moves_legacy_vectors_into_user_namespaces(manager):
+    store_legacy(manager, "alice", "a.pdf", 3)
+    store_legacy(manager, "bob", "b.pdf", 2)
+
+    assert manager.migrate_legacy_vectors() == 5
+    assert namespaces(manager).get("", 0) == 0
+    assert namespaces(manager)[manager.get_namespace("alice")] == 3
+    assert namespaces(manager)[manager.get_namespace("bob")] == 2
+    retriever = manager.get_retriever("a.pdf", "alice", hybrid=False, rerank=False)
+    assert {doc.metadata[METADATA_FILENAME_KEY] for doc in retriever.invoke("firmware")} == {"a.pdf"}
+    assert manager.migrate_legacy_vectors() == 0
+
+
+def test_deleting_a_user_removes_unmigrated_legacy_vectors(manager):
+    store_legacy(manager, "alice", "a.pdf", 3)
+    store_legacy(manager, "bob", "b.pdf", 2)
+
+    manager.delete_user_documents("alice")
+
+    assert namespaces(manager)[""] == 2
+    assert manager.get_available_files("alice") == []
+
+
+def test_deleting_a_missing_namespace_is_not_an_error(manager):
+    manager.backend.delete_namespace(manager.get_namespace("nobody"))
+
+
+def test_clearing_an_empty_index_still_clears_local_state(manager, pipeline, make_pdf):
+    pipeline.run(make_pdf("manual.pdf"), "manual.pdf", "alice", 1)
+    # The vectors are already gone, e.g. a wiped data dir
+    manager.backend.delete_all()
+
+    assert manager.clear_database() == 0
+    assert not manager.manifest.has_files()
+    assert manager.keyword_index.search("firmware", "alice", "manual.pdf", 5) == []